@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# Guest Book Application - Command Line Start-up Benchmark
+# This script measures how long the headless commands take from a cold start.
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from generate_book import write_book
+
+# Modules a command must not import, with the reason they are avoided
+HEAVY_MODULES = {
+    "tkinter": "needs a display and takes long to initialize",
+    "csv": "only needed by CSV exports",
+    "gzip": "only needed by compressed books and exports",
+    "cProfile": "only needed while profiling"
+}
+
+def best_time(command, repeat):
+    """Return the fastest of repeat runs of command in seconds"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL, cwd=ROOT)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+def imported_modules(arguments):
+    """Return the modules that running main.py with arguments imports"""
+    script = (
+        "import sys, main\n"
+        f"sys.argv = ['main.py'] + {arguments!r}\n"
+        "try:\n"
+        "    main.main()\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "sys.stderr.write(' '.join(sys.modules))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], check=True, cwd=ROOT,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    return set(result.stderr.split())
+
+def main():
+    """Time each command and check that none of them imports the GUI"""
+    parser = argparse.ArgumentParser(description="Measure the cold start of the headless commands")
+    parser.add_argument("--entries", type=int, default=1000, help="size of the generated book")
+    parser.add_argument("--repeat", type=int, default=10, help="runs per command, the fastest counts")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        book = os.path.join(directory, "book.json")
+        write_book(book, args.entries)
+        commands = {
+            "python -c pass": [sys.executable, "-c", "pass"],
+            "import data_handler": [sys.executable, "-c", "import data_handler"],
+            "main.py --help": [sys.executable, "main.py", "--help"],
+            "stats": [sys.executable, "main.py", "--file", book, "stats"],
+            "filter": [sys.executable, "main.py", "--file", book, "filter", "2023-06-01", "2023-06-30"],
+            "search": [sys.executable, "main.py", "--file", book, "search", "lovely", "--limit", "10"],
+            "export jsonl": [sys.executable, "main.py", "--file", book, "export", "-"]
+        }
+
+        baseline = None
+        print(f"Cold start with a {args.entries:,} entry book, best of {args.repeat}:")
+        for name, command in commands.items():
+            seconds = best_time(command, args.repeat)
+            baseline = seconds if baseline is None else baseline
+            print(f"  {name:<22} {seconds * 1000:7.1f} ms  (+{(seconds - baseline) * 1000:.1f} ms)")
+
+        failed = False
+        for arguments in (["--file", book, "stats"], ["--file", book, "export", "-"]):
+            loaded = imported_modules(arguments)
+            for module, reason in HEAVY_MODULES.items():
+                if module in loaded:
+                    print(f"{' '.join(arguments[2:])} imports {module}, which {reason}")
+                    failed = True
+        if failed:
+            sys.exit(1)
+        print("No command imports " + ", ".join(HEAVY_MODULES))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# Guest Book Application - Entry Memory Benchmark
+# This script measures how many bytes each entry costs in memory, as dicts and as compact entries.
+
+import argparse
+import gc
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from data_handler import DataHandler
+from entry import Entry
+from json_stream import iter_json_array
+
+def make_book(count, visitors):
+    """Return the JSON text of a book where a limited set of visitors sign repeatedly"""
+    rng = random.Random(42)
+    entries = [
+        {
+            "id": i + 1,
+            "name": f"Visitor {rng.randrange(visitors)}",
+            "message": f"Lovely evening, thank you! ({rng.randrange(10 ** 6)})",
+            "date": f"2023-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} "
+                    f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}"
+        }
+        for i in range(count)
+    ]
+    return json.dumps(entries, indent=4)
+
+def retained(build):
+    """Return the object build() returns and the bytes it keeps alive"""
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    result = build()
+    gc.collect()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, after - before
+
+def main():
+    """Print the per-entry memory cost of each representation"""
+    parser = argparse.ArgumentParser(description="Measure the memory cost per guest book entry")
+    parser.add_argument("--entries", type=int, default=100000, help="number of entries to generate")
+    parser.add_argument("--visitors", type=int, default=2000, help="number of distinct visitor names")
+    args = parser.parse_args()
+    
+    text = make_book(args.entries, args.visitors)
+    raw = text.encode()
+    
+    def as_dicts():
+        return list(iter_json_array(io.BytesIO(raw)))
+    
+    def as_entries():
+        return [Entry.from_dict(data) for data in iter_json_array(io.BytesIO(raw))]
+    
+    print(f"{args.entries:,} entries, {args.visitors:,} distinct visitors")
+    results = {}
+    for label, build in (("dict entries", as_dicts), ("compact Entry objects", as_entries)):
+        entries, size = retained(build)
+        results[label] = size / len(entries)
+        print(f"{label:<32} {size / len(entries):8.1f} bytes/entry")
+        del entries
+    
+    # The whole handler, including the search and date indexes
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "guestbook.json")
+        with open(path, 'w') as file:
+            file.write(text)
+        for compact in (False, True):
+            handler, size = retained(lambda: DataHandler(path, compact_entries=compact))
+            label = f"DataHandler(compact_entries={compact})"
+            print(f"{label:<32} {size / len(handler.entries):8.1f} bytes/entry (with indexes)")
+            del handler
+    
+    saving = 1 - results["compact Entry objects"] / results["dict entries"]
+    print(f"Compact entries save {saving:.0%} of the per-entry memory")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# Guest Book Application - Load Memory Benchmark
+# This script measures peak memory and time of the different ways to load a guest book.
+
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from data_handler import DataHandler
+from json_stream import iter_json_array
+
+def write_book(path, count):
+    """Write a guest book with count entries in the application's format"""
+    entries = [
+        {
+            "id": i + 1,
+            "name": f"Guest {i % 5000}",
+            "message": f"Thanks for having us, message number {i}!",
+            "date": f"2023-{i % 12 + 1:02d}-{i % 28 + 1:02d} 12:{i % 60:02d}:00"
+        }
+        for i in range(count)
+    ]
+    with open(path, 'w') as file:
+        json.dump(entries, file, indent=4)
+
+# Loading with the date index (but not the search index) may take this many
+# times as long as json.load; inserting entries one by one in date order
+# made it grow with the square of the book size
+MAX_LOAD_SLOWDOWN = 10
+
+def measure(label, func):
+    """Run func, print its wall time and peak traced memory and return the time"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<34} {elapsed:8.2f} s {peak / 1024 / 1024:10.1f} MiB peak")
+    return elapsed
+
+def main():
+    """Compare json.load, the streaming parser and DataHandler.load_data"""
+    parser = argparse.ArgumentParser(description="Measure peak memory of loading a guest book")
+    parser.add_argument("--entries", type=int, default=200000, help="number of entries to generate")
+    parser.add_argument("--file", help="existing guest book to load instead of a generated one")
+    parser.add_argument("--max-slowdown", type=float, default=MAX_LOAD_SLOWDOWN,
+                        help="fail if loading without the search index takes this many times json.load")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.file
+        if not path:
+            path = os.path.join(directory, "guestbook.json")
+            write_book(path, args.entries)
+        print(f"{path}: {os.path.getsize(path) / 1024 / 1024:.1f} MiB")
+        
+        def json_load():
+            with open(path, 'rb') as file:
+                return len(json.load(file))
+        
+        def stream_discard():
+            with open(path, 'rb') as file:
+                return sum(1 for _ in iter_json_array(file))
+        
+        def stream_keep():
+            with open(path, 'rb') as file:
+                return len(list(iter_json_array(file)))
+        
+        baseline = measure("json.load (whole file)", json_load)
+        measure("iter_json_array (parse only)", stream_discard)
+        measure("iter_json_array (keep entries)", stream_keep)
+        load = measure("DataHandler.load_data (date index)",
+                       lambda: len(DataHandler(path, lazy_search_index=True).entries))
+        measure("DataHandler.load_data (+indexes)", lambda: len(DataHandler(path).entries))
+    
+    if load > baseline * args.max_slowdown:
+        print(f"REGRESSION: load_data took {load / baseline:.1f} times as long as json.load "
+              f"(allowed {args.max_slowdown:g})")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# Guest Book Application - Parallel Processing Benchmark
+# This script measures how the process pool scales with cores and the book size where it starts to pay off.
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from data_handler import DataHandler
+from exporter import export_entries
+from importer import import_file
+from parallel import ParallelPool
+from query_cache import search_matcher
+from search_index import SearchIndex
+from generate_book import write_book
+
+# A common word, so the scan returns many entries to merge back in order
+QUERY = "wedding"
+
+def best_time(func, repeat):
+    """Return the fastest of repeat runs of func in seconds"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+def operations(handler, directory, jsonl_path, pool):
+    """Return name -> function for each operation, run serially when pool is None"""
+    entries = handler.get_all_entries()
+    export_path = os.path.join(directory, "export.csv.gz")
+    matches = search_matcher(QUERY)
+    
+    def scan():
+        if pool is None:
+            return [entry for entry in entries if matches(entry)]
+        return pool.search(entries, QUERY)
+    
+    def build_index():
+        index = SearchIndex()
+        if pool is None:
+            index.build(entries)
+        else:
+            index.merge_postings(entries, pool.trigram_postings(entries))
+    
+    def import_jsonl():
+        target = DataHandler(os.path.join(directory, "import.json"), load=False, auto_save=False,
+                             compact_entries=True, lazy_search_index=True)
+        import_file(target, jsonl_path, pool=pool)
+    
+    return {
+        "search scan": scan,
+        "index build": build_index,
+        "export csv.gz": lambda: export_entries(entries, export_path, pool=pool),
+        "import jsonl": import_jsonl
+    }
+
+def main():
+    """Time every operation serially and with pools of several sizes"""
+    parser = argparse.ArgumentParser(description="Measure the scaling of the parallel processing path")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000],
+                        help="book sizes to measure")
+    cores = os.cpu_count() or 1
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1))),
+                        help="worker counts to measure")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement, the fastest counts")
+    args = parser.parse_args()
+    
+    # Started once and kept, so start-up is not counted against any size;
+    # min_entries is 0 so the pools work on the small books too
+    pools = {workers: ParallelPool(workers, min_entries=0) for workers in args.workers}
+    crossover = {}
+    print(f"{cores} cores, best of {args.repeat}; times in ms, speed-up over serial in brackets")
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            for count in args.sizes:
+                book_path = os.path.join(directory, f"book_{count}.json")
+                jsonl_path = os.path.join(directory, f"book_{count}.jsonl")
+                write_book(book_path, count)
+                handler = DataHandler(book_path, auto_save=False, compact_entries=True,
+                                      lazy_search_index=True)
+                export_entries(handler.get_all_entries(), jsonl_path)
+                
+                print(f"\n{count:,} entries:")
+                print(f"  {'operation':<14} {'serial':>9}" + "".join(f" {f'{w} workers':>18}" for w in args.workers))
+                serial = {name: best_time(func, args.repeat)
+                          for name, func in operations(handler, directory, jsonl_path, None).items()}
+                timings = {}
+                for workers, pool in pools.items():
+                    for name, func in operations(handler, directory, jsonl_path, pool).items():
+                        func()   # warms up the worker processes
+                        timings[name, workers] = best_time(func, args.repeat)
+                
+                for name, seconds in serial.items():
+                    line = f"  {name:<14} {seconds * 1000:9.1f}"
+                    for workers in args.workers:
+                        parallel = timings[name, workers]
+                        line += f" {parallel * 1000:9.1f} ({seconds / parallel:4.1f}x)"
+                        if parallel < seconds and name not in crossover:
+                            crossover[name] = (count, workers)
+                    print(line)
+    finally:
+        for pool in pools.values():
+            pool.shutdown()
+    
+    print("\nSmallest measured book where a pool beats the serial path:")
+    for name in ("search scan", "index build", "export csv.gz", "import jsonl"):
+        if name in crossover:
+            count, workers = crossover[name]
+            print(f"  {name:<14} {count:>10,} entries with {workers} workers")
+        else:
+            print(f"  {name:<14} {'never':>10} at the measured sizes")
+    print("parallel.PARALLEL_MIN_ENTRIES decides when DataHandler uses its pool")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# Guest Book Application - Partitioned Storage Benchmark
+# This script compares start-up time and memory of single-file and partitioned guest books.
+
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from data_handler import DataHandler
+from partitions import PartitionedDataHandler, partition_book
+from generate_book import write_book
+
+def measure_open(factory):
+    """Return the handler built by factory, the seconds it took and its peak memory while loading"""
+    gc.collect()
+    start = time.perf_counter()
+    handler = factory()
+    seconds = time.perf_counter() - start
+    
+    # Memory is measured in a second run, as tracemalloc slows loading down
+    gc.collect()
+    tracemalloc.start()
+    factory().close()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return handler, seconds, peak
+
+def main():
+    """Split generated books into partitions and compare opening them"""
+    parser = argparse.ArgumentParser(description="Compare single-file and partitioned guest books")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 500000],
+                        help="book sizes to compare")
+    parser.add_argument("--active", type=int, default=3, help="partitions loaded on start-up")
+    args = parser.parse_args()
+    
+    options = {"journal": True, "auto_save": False, "compact_entries": True}
+    with tempfile.TemporaryDirectory() as directory:
+        for count in args.sizes:
+            json_path = os.path.join(directory, f"book_{count}.json")
+            parts_path = os.path.join(directory, f"book_{count}")
+            write_book(json_path, count)
+            partition_book(json_path, parts_path)
+            
+            single, single_seconds, single_bytes = measure_open(lambda: DataHandler(json_path, **options))
+            parts, parts_seconds, parts_bytes = measure_open(
+                lambda: PartitionedDataHandler(parts_path, active_partitions=args.active, **options))
+            print(f"{count:>9,} entries: single file {single_seconds * 1000:8.1f} ms {single_bytes / 1e6:7.1f} MB; "
+                  f"partitioned {parts_seconds * 1000:7.1f} ms {parts_bytes / 1e6:6.1f} MB "
+                  f"({len(parts.get_all_entries()):,} active entries)")
+            
+            # A date filter on an old month opens just that partition
+            start = time.perf_counter()
+            found = parts.filter_by_date("2019-03-01", "2019-03-31")
+            print(f"{'':>18} filter on an old month: {(time.perf_counter() - start) * 1000:.1f} ms "
+                  f"for {len(found):,} entries")
+            single.close()
+            parts.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# Guest Book Application - Synthetic Guest Book Generator
+# This script writes deterministic guest books of any size for the benchmarks.
+
+import argparse
+import datetime
+import json
+import random
+
+FIRST_NAMES = [
+    "Anna", "Ben", "Carla", "David", "Emma", "Felix", "Greta", "Hannah", "Ivan", "Julia",
+    "Karl", "Lena", "Max", "Nina", "Oscar", "Paula", "Quentin", "Rosa", "Stefan", "Tina",
+    "Uwe", "Vera", "Walter", "Xenia", "Yusuf", "Zoe", "María", "José", "Chloé", "Søren"
+]
+LAST_NAMES = [
+    "Smith", "Müller", "Garcia", "Rossi", "Kowalski", "Nguyen", "Schmidt", "Jansen",
+    "Dubois", "Silva", "Novak", "Andersen", "Fischer", "Weber", "Lopez", "Meyer"
+]
+OPENINGS = [
+    "Thank you for", "We loved", "What a wonderful", "Congratulations on", "So happy to share",
+    "Many thanks for", "Unforgettable", "Best wishes for"
+]
+SUBJECTS = [
+    "the party", "the wedding", "a lovely evening", "the anniversary", "the opening night",
+    "the concert", "your hospitality", "the birthday celebration", "the delicious cake"
+]
+CLOSINGS = [
+    "!", ".", " - see you soon!", ". All the best!", ", it was great.", " :)",
+    ". We will definitely come back next year with the whole family."
+]
+
+# Most books span a few years and most visitors sign in the evening
+START_DATE = datetime.datetime(2019, 1, 1)
+DAYS = 5 * 365
+
+def generate_entries(count, seed=0):
+    """Yield count entries with realistic names, messages and dates
+    
+    The same count and seed always give the same entries. A few regular
+    visitors sign very often while most names appear once or twice
+    (a Zipf-like distribution), messages range from a few words to a
+    few sentences, and dates cluster on weekends and in the evening.
+    Entries are produced one at a time, so even ten million of them
+    never have to be held in memory.
+    """
+    rng = random.Random(seed)
+    regulars = [f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}" for _ in range(50)]
+    for entry_id in range(1, count + 1):
+        if rng.random() < 0.3:
+            name = regulars[min(int(rng.paretovariate(1.2)) - 1, len(regulars) - 1)]
+        else:
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+            if rng.random() < 0.5:
+                name += f" {rng.randrange(1000)}"
+        
+        message = f"{rng.choice(OPENINGS)} {rng.choice(SUBJECTS)}{rng.choice(CLOSINGS)}"
+        if rng.random() < 0.2:
+            message += f" {rng.choice(OPENINGS)} {rng.choice(SUBJECTS)}{rng.choice(CLOSINGS)}"
+        
+        day = START_DATE + datetime.timedelta(days=rng.randrange(DAYS))
+        if day.weekday() < 5 and rng.random() < 0.6:
+            # Move most weekday entries to the following weekend
+            day += datetime.timedelta(days=5 - day.weekday())
+        hour = min(23, max(8, int(rng.gauss(19, 3))))
+        date = day.replace(hour=hour, minute=rng.randrange(60), second=rng.randrange(60))
+        
+        yield {
+            "id": entry_id,
+            "name": name,
+            "message": message,
+            "date": date.strftime("%Y-%m-%d %H:%M:%S")
+        }
+
+def write_book(file_path, count, seed=0):
+    """Write a guest book JSON file in the application's format, one entry at a time"""
+    with open(file_path, 'w', encoding='utf-8') as file:
+        file.write("[")
+        for i, entry in enumerate(generate_entries(count, seed)):
+            file.write(",\n    " if i else "\n    ")
+            file.write(json.dumps(entry))
+        file.write("\n]" if count else "]")
+
+def main():
+    """Write a synthetic guest book"""
+    parser = argparse.ArgumentParser(description="Write a deterministic synthetic guest book")
+    parser.add_argument("file", help="JSON file to write")
+    parser.add_argument("--entries", type=int, default=100000, help="number of entries (1k to 10M)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args()
+    write_book(args.file, args.entries, args.seed)
+
+if __name__ == "__main__":
+    main()
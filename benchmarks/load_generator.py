@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# Guest Book Application - Load Generator
+# This script drives the HTTP API with concurrent clients and checks throughput and p99 latency.
+
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from data_handler import DataHandler
+
+WORDS = ["lovely", "evening", "thanks", "wedding", "party", "congrats", "cake", "music"]
+
+def seed_book(file_path, count):
+    """Write a guest book with count entries for the server to start from"""
+    rng = random.Random(42)
+    handler = DataHandler(file_path, journal=True, auto_save=False, load=False)
+    handler.add_entries(
+        {
+            "name": f"Visitor {i}",
+            "message": " ".join(rng.choice(WORDS) for _ in range(6)),
+            "date": f"2023-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 12:00:00"
+        }
+        for i in range(count)
+    )
+    handler.save_data()
+
+def free_port():
+    """Return a TCP port nothing listens on right now"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server(file_path):
+    """Start `main.py serve` in a subprocess and wait until it accepts connections"""
+    port = free_port()
+    process = subprocess.Popen([
+        sys.executable, os.path.join(ROOT, "main.py"), "serve",
+        "--file", file_path, "--port", str(port), "--quiet"
+    ], stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return process, f"http://127.0.0.1:{port}"
+        except OSError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("the server did not start")
+
+def next_request(rng, write_ratio):
+    """Return (operation, method, path, body) for a random request"""
+    if rng.random() < write_ratio:
+        body = {"name": f"Tablet {rng.randrange(100)}", "message": " ".join(rng.sample(WORDS, 4))}
+        return "add", "POST", "/entries", json.dumps(body).encode()
+    choice = rng.random()
+    if choice < 0.5:
+        return "list", "GET", f"/entries?offset={rng.randrange(1000)}&limit=50", None
+    if choice < 0.8:
+        return "search", "GET", f"/entries?q={rng.choice(WORDS)}&limit=50", None
+    month = rng.randint(1, 12)
+    return "filter", "GET", f"/entries?start=2023-{month:02d}-01&end=2023-{month:02d}-07&limit=50", None
+
+def client(url, deadline, write_ratio, seed, latencies, errors):
+    """Send requests over one keep-alive connection until the deadline"""
+    rng = random.Random(seed)
+    parts = urlsplit(url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+    while time.monotonic() < deadline:
+        operation, method, path, body = next_request(rng, write_ratio)
+        headers = {"Content-Type": "application/json"} if body else {}
+        start = time.perf_counter()
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            ok = response.status < 400
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            ok = False
+        elapsed = time.perf_counter() - start
+        if ok:
+            latencies.setdefault(operation, []).append(elapsed)
+        else:
+            errors.append(operation)
+    connection.close()
+
+def percentile(values, fraction):
+    """Return the value below which the given fraction of the sorted values fall"""
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def main():
+    """Run the load and report throughput and latency per operation"""
+    parser = argparse.ArgumentParser(description="Generate load against the guest book HTTP API")
+    parser.add_argument("--url", help="server to test; by default a server is started on a seeded book")
+    parser.add_argument("--entries", type=int, default=50000, help="entries in the seeded book")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent connections")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run")
+    parser.add_argument("--write-ratio", type=float, default=0.2, help="fraction of requests that add entries")
+    parser.add_argument("--min-rps", type=float, default=0, help="fail below this many requests per second")
+    parser.add_argument("--max-p99-ms", type=float, default=0, help="fail above this p99 latency")
+    args = parser.parse_args()
+    
+    process = None
+    with tempfile.TemporaryDirectory() as directory:
+        url = args.url
+        if url is None:
+            file_path = os.path.join(directory, "guestbook_data.json")
+            seed_book(file_path, args.entries)
+            process, url = start_server(file_path)
+        
+        try:
+            latencies, errors = {}, []
+            deadline = time.monotonic() + args.duration
+            threads = [
+                threading.Thread(target=client, args=(url, deadline, args.write_ratio, i, latencies, errors))
+                for i in range(args.clients)
+            ]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+    
+    everything = sorted(value for values in latencies.values() for value in values)
+    if not everything:
+        print("No request succeeded")
+        sys.exit(1)
+    rps = len(everything) / elapsed
+    p99 = percentile(everything, 0.99) * 1000
+    
+    print(f"{len(everything)} requests in {elapsed:.1f} s with {args.clients} clients: "
+          f"{rps:.0f} req/s, {len(errors)} errors")
+    for operation, values in sorted(latencies.items()):
+        values.sort()
+        print(f"  {operation:<7} {len(values):>7}  p50 {percentile(values, 0.5) * 1000:7.2f} ms"
+              f"  p99 {percentile(values, 0.99) * 1000:7.2f} ms")
+    print(f"  {'all':<7} {len(everything):>7}  p50 {percentile(everything, 0.5) * 1000:7.2f} ms"
+          f"  p99 {p99:7.2f} ms")
+    
+    failed = bool(errors)
+    if args.min_rps and rps < args.min_rps:
+        print(f"Throughput {rps:.0f} req/s is below the target of {args.min_rps:.0f}")
+        failed = True
+    if args.max_p99_ms and p99 > args.max_p99_ms:
+        print(f"p99 latency {p99:.2f} ms is above the target of {args.max_p99_ms:.2f} ms")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# Guest Book Application - Benchmark Runner
+# This script times and memory-profiles the hot paths on synthetic books and checks them for regressions.
+
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from data_handler import DataHandler
+from sqlite_handler import migrate_json_to_sqlite, SQLiteDataHandler
+from generate_book import write_book
+from sort_index import SORT_KEYS
+
+THRESHOLDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "thresholds.json")
+
+# Searches for a regular visitor, a common word, a rare word and a miss
+SEARCHES = ["josé fischer", "wedding", "anniversary :)", "no such visitor"]
+# Date filters for a busy month, a single day and several years
+DATE_FILTERS = [("2021-06-01", "2021-06-30"), ("2022-12-24", "2022-12-24"), ("2019-01-01", "2022-12-31")]
+
+# Rows of a sorted view that are read, about one screen of the entry list
+SORTED_ROWS = 50
+
+# Each mutation benchmark runs this many operations and reports the mean
+MUTATIONS = 200
+
+
+def measure(func, repeat, memory=True):
+    """Return the best time of func over repeat runs and, optionally, its peak memory
+    
+    The memory run is separate because tracemalloc slows Python down.
+    """
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    
+    result = {"seconds": min(times), "runs": repeat}
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        base, _ = tracemalloc.get_traced_memory()
+        func()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result["peak_bytes"] = peak - base
+        result["retained_bytes"] = current - base
+    return result
+
+def open_handler(file_path, backend):
+    """Open a guest book the way the benchmarked configuration does"""
+    if backend == "sqlite":
+        return SQLiteDataHandler(file_path)
+    # The GUI configuration: journal, batched saves and compact entries
+    return DataHandler(file_path, journal=True, auto_save=False, compact_entries=True)
+
+def forget_queries(handler):
+    """Empty the query cache, so searches are timed from scratch"""
+    cache = getattr(handler, "query_cache", None)
+    if cache is not None:
+        cache.clear()
+
+def bench_refresh(handler, repeat):
+    """Time GuestBookApp.refresh_entries on a hidden window, or explain why it cannot run"""
+    try:
+        import tkinter
+        from guestbook import GuestBookApp
+        root = tkinter.Tk()
+        root.destroy()
+    except Exception as e:
+        # Tk needs a display; there is no way to draw a Treeview without one
+        return {"skipped": f"no display for Tk ({e})"}
+    
+    # The window works on the benchmark book, never the user's guestbook_data.json
+    app = GuestBookApp(handler)
+    app.root.withdraw()
+    
+    def refresh():
+        app.refresh_entries()
+        app.root.update_idletasks()
+    try:
+        return measure(refresh, repeat)
+    finally:
+        handler.unsubscribe(app.on_data_changed)
+        app.io_worker.shutdown()
+        app.search_worker.shutdown()
+        app.root.destroy()
+
+def run_size(directory, count, backend, repeat, seed):
+    """Run every benchmark on a book of count entries and return the results"""
+    json_path = os.path.join(directory, f"book_{count}.json")
+    if not os.path.exists(json_path):
+        write_book(json_path, count, seed)
+    file_path = json_path
+    if backend == "sqlite":
+        file_path = os.path.join(directory, f"book_{count}.db")
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        migrate_json_to_sqlite(json_path, file_path)
+    
+    results = {}
+    handlers = []
+    
+    def load():
+        handlers.append(open_handler(file_path, backend))
+    results["load_data"] = measure(load, repeat)
+    handler = handlers[-1]
+    del handlers[:-1]
+    gc.collect()
+    
+    def search():
+        for query in SEARCHES:
+            forget_queries(handler)
+            len(handler.search_entries(query))
+    results["search_entries"] = measure(search, repeat)
+    results["search_entries"]["queries"] = len(SEARCHES)
+    
+    def filter_dates():
+        for start, end in DATE_FILTERS:
+            forget_queries(handler)
+            len(handler.filter_by_date(start, end))
+    results["filter_by_date"] = measure(filter_dates, repeat)
+    results["filter_by_date"]["queries"] = len(DATE_FILTERS)
+    
+    def sort():
+        matches = handler.search_entries(SEARCHES[1])
+        for column in SORT_KEYS:
+            handler.sort_entries(column, True)[:SORTED_ROWS]
+            len(handler.sort_entries(column, False, matches))
+        handler.top_visitors(10)
+    # The first sort of a column builds its index, which the GUI does once
+    results["sort_index_build"] = measure(sort, 1, memory=False)
+    results["sort_entries"] = measure(sort, repeat)
+    results["sort_entries"]["columns"] = len(SORT_KEYS)
+    
+    rng = random.Random(seed)
+    
+    def add():
+        for i in range(MUTATIONS):
+            handler.add_entry(f"Benchmark Visitor {i}", "Thanks for the lovely evening!", "2023-06-01 19:00:00")
+        handler.flush()
+    results["add_entry"] = measure(add, repeat)
+    results["add_entry"]["operations"] = MUTATIONS
+    
+    def delete():
+        entries = handler.get_all_entries()
+        for entry_id in [entries[rng.randrange(len(entries))]['id'] for _ in range(MUTATIONS)]:
+            handler.delete_entry(entry_id)
+        handler.flush()
+    results["delete_entry"] = measure(delete, repeat)
+    results["delete_entry"]["operations"] = MUTATIONS
+    
+    results["save_data"] = measure(handler.save_data, repeat)
+    
+    csv_path = os.path.join(directory, "export.csv")
+    results["export_to_csv"] = measure(lambda: handler.export_to_csv(csv_path), repeat)
+    os.remove(csv_path)
+    
+    results["refresh_entries"] = bench_refresh(handler, repeat)
+    handler.close()
+    return results
+
+def git_commit():
+    """Return the current commit of the repository, if there is one"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def check_regressions(results, baseline, thresholds):
+    """Return a message for every hot path that got slower than its threshold allows
+    
+    thresholds maps benchmark names to the slowdown factor allowed
+    against the baseline run, with "default" for the others.
+    """
+    failures = []
+    for size, benchmarks in results["results"].items():
+        for name, result in benchmarks.items():
+            before = baseline.get("results", {}).get(size, {}).get(name)
+            if before is None or "seconds" not in result or "seconds" not in before:
+                continue
+            allowed = thresholds.get(name, thresholds.get("default", 1.5))
+            # Very short timings are mostly noise
+            floor = thresholds.get("min_seconds", 0.001)
+            if result["seconds"] > max(before["seconds"], floor) * allowed:
+                failures.append(f"{name} on {size} entries: {result['seconds'] * 1000:.1f} ms, "
+                                f"baseline {before['seconds'] * 1000:.1f} ms (allowed x{allowed})")
+    return failures
+
+def main():
+    """Run the suite, store the results as JSON and compare them with a baseline"""
+    parser = argparse.ArgumentParser(description="Benchmark the guest book hot paths")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="book sizes to benchmark (1k to 10M)")
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json", help="storage engine")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark, the best counts")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic books")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="results of an earlier run to check for regressions")
+    parser.add_argument("--thresholds", default=THRESHOLDS_PATH, help="allowed slowdown per benchmark")
+    args = parser.parse_args()
+    
+    results = {
+        "meta": {
+            "date": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": args.backend,
+            "seed": args.seed
+        },
+        "results": {}
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        for count in args.sizes:
+            print(f"{count:,} entries:")
+            size_results = run_size(directory, count, args.backend, args.repeat, args.seed)
+            results["results"][str(count)] = size_results
+            for name, result in size_results.items():
+                if "skipped" in result:
+                    print(f"  {name:<16} skipped: {result['skipped']}")
+                    continue
+                per = result.get("queries") or result.get("operations") or 1
+                line = f"  {name:<16} {result['seconds'] * 1000:10.2f} ms"
+                if per > 1:
+                    line += f" ({result['seconds'] * 1000 / per:.3f} ms each)"
+                if "peak_bytes" in result:
+                    # One-off runs, like building an index, have no memory run
+                    line += f"  peak {result['peak_bytes'] / 1e6:8.1f} MB"
+                print(line)
+    
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=4)
+    
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        thresholds = {}
+        if args.thresholds and os.path.exists(args.thresholds):
+            with open(args.thresholds) as file:
+                thresholds = json.load(file)
+        failures = check_regressions(results, baseline, thresholds)
+        for failure in failures:
+            print(f"REGRESSION: {failure}")
+        if failures:
+            sys.exit(1)
+        print("No regressions against the baseline")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# Guest Book Application - Shared Writers Stress Test
+# This script runs several processes that write to one shared guest book and checks that no entry is lost.
+
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from data_handler import DataHandler
+
+def writer(file_path, worker, count, journal, compact_threshold):
+    """Add count entries, delete some of our own, and flush now and then"""
+    rng = random.Random(worker)
+    # Odd workers save every change, even ones batch them like the GUI does
+    handler = DataHandler(file_path, journal=journal, shared=True,
+                          auto_save=worker % 2 == 1, compact_threshold=compact_threshold)
+    doomed = []
+    for i in range(count):
+        handler.add_entry(f"w{worker}-{i}", "stress", "2023-06-01 12:00:00")
+        if rng.random() < 0.1:
+            doomed.append(f"w{worker}-{i}")
+        if rng.random() < 0.05:
+            # Delete by ID, which may have changed when another writer took it
+            for entry in handler.get_all_entries():
+                if entry['name'] in doomed:
+                    handler.delete_entry(entry['id'])
+        if rng.random() < 0.2:
+            handler.flush()
+        if rng.random() < 0.05:
+            handler.reload_changes()
+    
+    for entry in list(handler.get_all_entries()):
+        if entry['name'] in doomed:
+            handler.delete_entry(entry['id'])
+    handler.close()
+    return set(doomed)
+
+def main():
+    """Run the writers and verify the merged book"""
+    parser = argparse.ArgumentParser(description="Stress a guest book shared by several processes")
+    parser.add_argument("--writers", type=int, default=4, help="number of writer processes")
+    parser.add_argument("--entries", type=int, default=500, help="entries added by each writer")
+    parser.add_argument("--compact-threshold", type=int, default=50,
+                        help="journal records before a compaction")
+    parser.add_argument("--no-journal", action="store_true", help="save full snapshots instead of a journal")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as directory:
+        file_path = os.path.join(directory, "guestbook_data.json")
+        start = time.perf_counter()
+        with multiprocessing.Pool(args.writers) as pool:
+            doomed = pool.starmap(writer, [
+                (file_path, worker, args.entries, not args.no_journal, args.compact_threshold)
+                for worker in range(args.writers)
+            ])
+        elapsed = time.perf_counter() - start
+        
+        entries = DataHandler(file_path, journal=not args.no_journal).get_all_entries()
+    
+    deleted = set().union(*doomed)
+    expected = {f"w{worker}-{i}" for worker in range(args.writers) for i in range(args.entries)} - deleted
+    names = Counter(entry['name'] for entry in entries)
+    ids = Counter(entry['id'] for entry in entries)
+    
+    missing = expected - set(names)
+    repeated = [name for name, count in names.items() if count > 1]
+    resurrected = deleted & set(names)
+    duplicate_ids = [entry_id for entry_id, count in ids.items() if count > 1]
+    
+    print(f"{args.writers} writers, {len(entries)} entries in {elapsed:.2f} s")
+    print(f"missing {len(missing)}, repeated {len(repeated)}, "
+          f"deleted but present {len(resurrected)}, duplicate IDs {len(duplicate_ids)}")
+    if missing or repeated or resurrected or duplicate_ids:
+        print("FAILED")
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# Guest Book Application - Change Events
+# This file contains the callbacks the data handlers notify when their entries change.
+
+# The events, and the items that come with them
+ADDED = "added"          # the new entries
+REMOVED = "removed"      # the IDs of the removed entries
+CLEARED = "cleared"      # nothing, every entry was deleted
+RELOADED = "reloaded"    # nothing, the entries have to be read again
+
+class ChangeEvents:
+    """The callbacks subscribed to the changes of one guest book
+    
+    Each callback is called as callback(event, items). Callbacks run on the
+    thread that made the change while the data handler still holds its
+    lock, so they see the events in the order the changes were made. They
+    must return quickly and must not touch Tk widgets; the GUI only queues
+    the events and applies them on the Tk thread.
+    """
+    
+    def __init__(self):
+        """Create an empty list of callbacks"""
+        self._callbacks = ()
+    
+    def __bool__(self):
+        """True if any callback is subscribed"""
+        return bool(self._callbacks)
+    
+    def subscribe(self, callback):
+        """Start calling callback for every change"""
+        # The tuple is replaced rather than changed, so emit() never
+        # sees it half updated
+        self._callbacks = self._callbacks + (callback,)
+    
+    def unsubscribe(self, callback):
+        """Stop calling callback; unknown callbacks are ignored"""
+        self._callbacks = tuple(known for known in self._callbacks if known != callback)
+    
+    def emit(self, event, items=()):
+        """Tell every callback about a change"""
+        for callback in self._callbacks:
+            callback(event, items)
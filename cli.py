@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# Guest Book Application - Command Line Interface
+# This file contains the headless commands for scripts, cron jobs and shell pipelines.
+
+import argparse
+import datetime
+import json
+import os
+import sys
+from contextlib import redirect_stdout
+from data_handler import open_data_handler
+from date_index import parse_bound, parse_timestamp
+from entry import entry_to_json
+
+# Commands main.py hands to this module instead of starting the GUI
+COMMANDS = ("add", "search", "filter", "delete", "export", "stats", "compact")
+
+# Entries encoded per write when printing results
+OUTPUT_CHUNK_SIZE = 1000
+
+
+class CommandError(Exception):
+    """A command that cannot be carried out, reported as a JSON error line"""
+
+
+def write_json(out, value):
+    """Write a value as a single JSON line"""
+    out.write(json.dumps(value, default=entry_to_json) + "\n")
+
+def write_chunks(out, entries, file_format="jsonl"):
+    """Write entries as CSV or JSON Lines, a chunk at a time"""
+    # The exporter is only imported by the commands that print entries
+    from exporter import iter_export_chunks
+    for text, done in iter_export_chunks(entries, file_format, OUTPUT_CHUNK_SIZE):
+        out.write(text)
+
+def read_json_lines(stream):
+    """Yield the JSON values on the non-blank lines of a stream"""
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise CommandError(f"Line {number} is not valid JSON: {e}")
+
+def entry_fields(data):
+    """Return the entry mapping to add for a name, message and optional date
+    
+    Dates are "YYYY-MM-DD" (the current time of day is added, as in the
+    GUI) or "YYYY-MM-DD HH:MM:SS"; without a date the entry gets the
+    current date and time.
+    """
+    if not isinstance(data, dict):
+        raise CommandError("Entries must be JSON objects")
+    name, message, date = data.get('name'), data.get('message'), data.get('date')
+    if not isinstance(name, str) or not name.strip():
+        raise CommandError("Name cannot be empty")
+    if not isinstance(message, str) or not message.strip():
+        raise CommandError("Message cannot be empty")
+    
+    if date:
+        if not isinstance(date, str) or parse_timestamp(date) is None:
+            raise CommandError("Invalid date format. Please use YYYY-MM-DD")
+        date = date.strip()
+        if len(date) == 10:
+            date = f"{date} {datetime.datetime.now().strftime('%H:%M:%S')}"
+    return {"name": name.strip(), "message": message.strip(), "date": date or None}
+
+def entry_id(value):
+    """Return the entry ID in a command line argument or an input line
+    
+    Input lines may hold whole entries, so the output of search and
+    filter can be piped into delete.
+    """
+    if isinstance(value, dict):
+        value = value.get('id')
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            pass
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise CommandError(f"Invalid entry ID: {value!r}")
+    return value
+
+def open_book(args):
+    """Open the guest book named by --file
+    
+    The search index is only built if the command searches, and every
+    change is kept in memory until the command finishes and flushes.
+    """
+    # A new journaled book has nothing but its journal until it is compacted
+    if args.command != "add" and not any(map(os.path.exists, (args.file, args.file + ".journal"))):
+        raise CommandError(f"No guest book at {args.file}")
+    return open_data_handler(args.file, journal=True, auto_save=False, compact_entries=True,
+                             shared=True, lazy_search_index=True, parallel=args.workers)
+
+def all_entries(handler):
+    """Return every entry, streaming the partitions of a partitioned book"""
+    if hasattr(handler, "partition_keys"):
+        from partitions import AllEntries
+        return AllEntries(handler)
+    return handler.get_all_entries()
+
+def matching_entries(handler, query=None, start=None, end=None):
+    """Return the entries that match a search query and a date range
+    
+    A missing end date means now, as in filter_by_datetime.
+    """
+    if start:
+        try:
+            low = parse_bound(start)
+            high = parse_bound(end, end_of_day=True) if end else parse_bound(datetime.datetime.now())
+        except ValueError:
+            raise CommandError("Invalid date format. Please use YYYY-MM-DD")
+    elif end:
+        raise CommandError("--end needs a --start date")
+    
+    if not query:
+        return handler.filter_by_datetime(start, end) if start else all_entries(handler)
+    
+    # The entry list of a partitioned book holds only its recent months,
+    # but a command searches the whole book
+    if hasattr(handler, "search_all_entries"):
+        entries = handler.search_all_entries(query)
+    else:
+        entries = handler.search_entries(query)
+    if start:
+        entries = [
+            entry for entry in entries
+            if (timestamp := parse_timestamp(entry['date'])) is not None and
+            low <= timestamp <= high
+        ]
+    return entries
+
+def add_command(handler, args, out):
+    """Add one entry from the options, or one per JSON line on stdin"""
+    if args.stdin:
+        entries = [entry_fields(data) for data in read_json_lines(sys.stdin)]
+    else:
+        if args.name is None or args.message is None:
+            raise CommandError("add needs --name and --message, or --stdin")
+        entries = [entry_fields({"name": args.name, "message": args.message, "date": args.date})]
+    
+    if not handler.add_entries(entries):
+        raise CommandError("Failed to add entries")
+    write_json(out, {"added": len(entries)})
+
+def search_command(handler, args, out):
+    """Print the entries that contain the query"""
+    entries = matching_entries(handler, args.query, args.start, args.end)
+    write_chunks(out, entries[:args.limit] if args.limit is not None else entries)
+
+def filter_command(handler, args, out):
+    """Print the entries between two dates"""
+    entries = matching_entries(handler, None, args.start, args.end)
+    write_chunks(out, entries[:args.limit] if args.limit is not None else entries)
+
+def delete_command(handler, args, out):
+    """Delete the entries listed as arguments or on stdin"""
+    values = read_json_lines(sys.stdin) if args.stdin else args.ids
+    ids = [entry_id(value) for value in values]
+    if not ids:
+        raise CommandError("delete needs entry IDs, or --stdin")
+    
+    found = [entry_id for entry_id in dict.fromkeys(ids) if handler.get_entry(entry_id) is not None]
+    if found and not handler.delete_entries(found):
+        raise CommandError("Failed to delete entries")
+    write_json(out, {"deleted": len(found), "requested": len(ids)})
+
+def export_command(handler, args, out):
+    """Export the matching entries to a file; "-" writes them to stdout"""
+    entries = matching_entries(handler, args.search, args.start, args.end)
+    if args.output == "-":
+        file_format = args.format or "jsonl"
+        if file_format not in ("csv", "jsonl"):
+            raise CommandError("Only csv and jsonl can be written to stdout")
+        write_chunks(out, entries, file_format)
+        return
+    
+    from exporter import export_entries
+    count = export_entries(entries, args.output, args.format, pool=getattr(handler, "parallel", None))
+    if count is None:
+        raise CommandError(f"Failed to export to {args.output}")
+    write_json(out, {"exported": count, "file": args.output})
+
+def stats_command(handler, args, out):
+    """Print the number of entries, the newest date and the size on disk"""
+    latest = handler.latest_entries(1)
+    if os.path.isdir(args.file):
+        paths = [os.path.join(args.file, name) for name in os.listdir(args.file)]
+    else:
+        paths = [args.file, args.file + ".journal"]
+    size = sum(os.path.getsize(path) for path in paths if os.path.isfile(path))
+    write_json(out, {
+        "file": args.file,
+        "entries": len(all_entries(handler)),
+        "latest": latest[0]['date'] if latest else None,
+        "bytes": size
+    })
+
+def compact_command(handler, args, out):
+    """Fold the journal into the snapshot and wait until it is written"""
+    if hasattr(handler, "compact"):
+        handler.compact(wait=True)
+        write_json(out, {"compacted": True, "bytes": os.path.getsize(args.file)})
+    else:
+        # SQLite and partitioned books have no journal of their own to fold
+        handler.flush()
+        write_json(out, {"compacted": False})
+
+def build_parser():
+    """Return the argument parser for every command"""
+    parser = argparse.ArgumentParser(prog="main.py", description="Work with a guest book without the GUI")
+    parser.add_argument("--file", default="guestbook_data.json",
+                        help="guest book file (.json, .db or a partitioned book directory)")
+    parser.add_argument("--workers", type=int,
+                        help="worker processes for searches and exports of very large books")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    add = commands.add_parser("add", help="add an entry")
+    add.add_argument("--name", help="name of the guest")
+    add.add_argument("--message", help="message of the entry")
+    add.add_argument("--date", help="YYYY-MM-DD or YYYY-MM-DD HH:MM:SS, now by default")
+    add.add_argument("--stdin", action="store_true",
+                     help='read entries as JSON Lines of {"name", "message", "date"} from stdin')
+    add.set_defaults(run=add_command)
+    
+    search = commands.add_parser("search", help="print the entries that contain a query")
+    search.add_argument("query")
+    search.add_argument("--start", help="only entries from this date on")
+    search.add_argument("--end", help="only entries up to this date")
+    search.add_argument("--limit", type=int, help="print at most this many entries")
+    search.set_defaults(run=search_command)
+    
+    filter_ = commands.add_parser("filter", help="print the entries between two dates")
+    filter_.add_argument("start", help="YYYY-MM-DD or YYYY-MM-DD HH:MM:SS")
+    filter_.add_argument("end", nargs="?", help="last day to include, now by default")
+    filter_.add_argument("--limit", type=int, help="print at most this many entries")
+    filter_.set_defaults(run=filter_command)
+    
+    delete = commands.add_parser("delete", help="delete entries by ID")
+    delete.add_argument("ids", nargs="*", help="IDs of the entries to delete")
+    delete.add_argument("--stdin", action="store_true",
+                        help="read IDs, or entries printed by search and filter, from stdin")
+    delete.set_defaults(run=delete_command)
+    
+    export = commands.add_parser("export", help="export entries to CSV or JSON Lines")
+    export.add_argument("output", help='file to write, or "-" for stdout')
+    export.add_argument("--format", choices=("csv", "csv.gz", "jsonl", "jsonl.gz"),
+                        help="export format, taken from the file extension by default")
+    export.add_argument("--search", help="only entries that contain this query")
+    export.add_argument("--start", help="only entries from this date on")
+    export.add_argument("--end", help="only entries up to this date")
+    export.set_defaults(run=export_command)
+    
+    stats = commands.add_parser("stats", help="print the size of the guest book")
+    stats.set_defaults(run=stats_command)
+    
+    compact = commands.add_parser("compact", help="fold the journal into the guest book file")
+    compact.set_defaults(run=compact_command)
+    return parser
+
+def main(argv=None):
+    """Run a single command and return its exit status
+    
+    Results are printed to stdout as JSON Lines; errors are printed to
+    stderr as {"error": message} and give exit status 1. Messages the
+    data handlers print go to stderr as well, so stdout stays parseable.
+    """
+    args = build_parser().parse_args(argv)
+    out = sys.stdout
+    handler = None
+    try:
+        with redirect_stdout(sys.stderr):
+            try:
+                handler = open_book(args)
+                args.run(handler, args, out)
+                if not handler.flush():
+                    raise CommandError("Failed to save the guest book")
+            finally:
+                if handler is not None:
+                    handler.close()
+        out.flush()
+        return 0
+    except CommandError as e:
+        sys.stderr.write(json.dumps({"error": str(e)}) + "\n")
+        return 1
+    except BrokenPipeError:
+        # The reader went away, as with `| head`. Python flushes stdout
+        # again on exit, so it is pointed at /dev/null first.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), out.fileno())
+        return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
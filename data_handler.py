@@ -5,70 +5,1035 @@
 import json
 import os
 import datetime
-from pathlib import Path
+import hashlib
+import threading
+from contextlib import contextmanager, nullcontext
+from file_lock import FileLock
+from search_index import SearchIndex
+from date_index import DateIndex, pack_timestamp, parse_bound
+from json_stream import iter_json_array
+from entry import Entry, entry_to_json
+from exporter import export_entries
+from query_cache import QueryCache, SearchResults, date_matcher, refine_search, search_matcher
+from instrumentation import tally, timed
+from change_events import ChangeEvents, ADDED, REMOVED, CLEARED, RELOADED
+from sort_index import SortIndex, top_entries, top_visitors
 
 class DataHandler:
     """Handles all data operations for the guest book application"""
     
-    def __init__(self, file_path="guestbook_data.json"):
-        """Initialize the data handler with the specified file path"""
+    def __init__(self, file_path="guestbook_data.json", journal=False,
+                 compact_threshold=1000, compact_ratio=0.5, index_sidecar_min=20000,
+                 auto_save=True, load=True, compact_entries=False, shared=False,
+                 lazy_search_index=False, parallel=None):
+        """Initialize the data handler with the specified file path
+        
+        When journal is True, additions and deletions are appended to a
+        JSON Lines journal next to the snapshot instead of rewriting the
+        whole file. The journal is folded back into the snapshot in the
+        background once it holds at least compact_threshold records and
+        compact_ratio times the number of entries.
+        
+        Books with at least index_sidecar_min entries keep their search
+        index in a sidecar file so it does not have to be rebuilt on load.
+        
+        With auto_save turned off, changes are only kept in memory until
+        flush() writes all of them at once, typically from a worker thread.
+        
+        Pass load=False to call load_data() later, for example on a worker
+        thread with a progress callback.
+        
+        With compact_entries set, entries are kept as slotted Entry objects instead
+        of dicts, which roughly halves the memory a large book needs.
+        
+        Set shared when several processes use the same file. Writes then
+        hold an advisory lock on <file>.lock and first merge what the other
+        processes wrote, reading only the new journal records when the
+        snapshot itself is unchanged.
+        
+        Snapshots whose file name ends in .gz are gzip-compressed; their
+        journal is kept uncompressed.
+        
+        With lazy_search_index set, the search index is only built by the
+        first search, so short-lived processes that never search skip it.
+        
+        Set parallel to a number of worker processes (True for one per
+        core), or to a ParallelPool shared with other handlers, to build
+        the search index, run the searches it cannot answer and export in
+        a process pool once the book is large enough to gain from it.
+        """
         self.file_path = file_path
-        self.entries = []
-        self.load_data()
+        self.journal = journal
+        self.compact_threshold = compact_threshold
+        self.compact_ratio = compact_ratio
+        self.index_sidecar_min = index_sidecar_min
+        self.auto_save = auto_save
+        self.compact_entries = compact_entries
+        self.shared = shared
+        self.lazy_search_index = lazy_search_index
+        
+        # The process pool is only imported by handlers that use one
+        self._owns_parallel = isinstance(parallel, int) and parallel > 0
+        if self._owns_parallel:
+            from parallel import ParallelPool
+            parallel = ParallelPool(None if parallel is True else parallel)
+        self.parallel = parallel or None
+        
+        # Entries live in insertion-ordered slots. Deleted entries leave a
+        # None tombstone that is swept out once they make up half the slots.
+        self._slots = []
+        self._positions = {}     # entry ID -> slot of its first occurrence
+        self._duplicates = {}    # entry ID -> slots of repeated IDs in old books
+        self._tombstones = 0
+        self._live = None        # cached list of the live entries
+        self._next_id = 1
+        
+        self.search_index = SearchIndex()
+        self.date_index = DateIndex()
+        self.query_cache = QueryCache()
+        self._index_changed = False
+        self._search_index_live = True
+        
+        # Column sort indexes, each built by the first sort on its column
+        # and kept up to date from then on
+        self.sort_indexes = {}
+        
+        # Subscribers to added, removed, cleared and reloaded events, which
+        # are held back while a load replaces the entries wholesale
+        self.changes = ChangeEvents()
+        self._loading = False
+        
+        # Unsaved changes when auto_save is off
+        self._pending_records = []
+        self._dirty = False
+        self._snapshot_needed = False
+        
+        # Journal state. _lock guards the entries and indexes, _write_lock
+        # serializes writes to the data files so they can run off the
+        # calling thread without blocking readers for long. Locks are
+        # always taken in the order _write_lock, file lock, _lock.
+        self._lock = threading.RLock()
+        self._write_lock = threading.RLock()
+        self._file_lock = None
+        self._snapshot_token = None
+        self._snapshot_stat = None   # identity of the snapshot file we read
+        self._journal_offset = 0     # journal bytes applied, 0 without a valid journal
+        self._journal_records = 0
+        self._compaction_thread = None
+        
+        if load:
+            self.load_data()
+    
+    @property
+    def entries(self):
+        """The live entries in insertion order"""
+        if not self._tombstones:
+            return self._slots
+        # Built under the lock so a concurrent removal cannot leave a
+        # stale list in the cache
+        with self._lock:
+            if self._live is None:
+                self._live = [entry for entry in self._slots if entry is not None]
+            return self._live
+    
+    @property
+    def compressed(self):
+        """True if the snapshot is gzip-compressed"""
+        return self.file_path.lower().endswith(".gz")
+    
+    @property
+    def journal_path(self):
+        """Path of the journal file that belongs to the current snapshot"""
+        return self.file_path + ".journal"
+    
+    @property
+    def index_path(self):
+        """Path of the search index sidecar file"""
+        return self.file_path + ".idx"
     
-    def load_data(self):
-        """Load guest book entries from the JSON file"""
+    @timed("data.load_data")
+    def load_data(self, progress=None):
+        """Load guest book entries from the JSON file and replay its journal
+        
+        The file is parsed incrementally and the indexes are filled in the
+        same pass, so the raw text is never held in memory as a whole.
+        progress, if given, is called with (entries loaded, bytes read,
+        total bytes) while the file is read.
+        """
+        with self._snapshot_lock(), self._process_lock(), self._lock:
+            self._loading = True
+            try:
+                self._load(progress)
+            finally:
+                self._loading = False
+            self._notify(RELOADED)
+    
+    def _load(self, progress=None):
+        """Load the snapshot and journal, with the write, file and entry locks held"""
+        self._pending_records = []
+        self._dirty = False
+        
+        # The indexes are built in bulk once the snapshot is read, which
+        # sorts the dates once instead of inserting every entry in order
+        self._search_index_live = False
+        self._reset()
+        self._next_id = 1
+        self._snapshot_stat = self._stat(self.file_path)
         try:
             if os.path.exists(self.file_path):
-                with open(self.file_path, 'r') as file:
-                    self.entries = json.load(file)
+                digest = hashlib.sha1()
+                report = None
+                if progress is not None:
+                    report = lambda done, total: progress(len(self.entries), done, total)
+                if self.compressed:
+                    # gzip is only imported for compressed books, which
+                    # keeps it out of the start-up of everything else
+                    import gzip
+                    file = gzip.open(self.file_path, 'rb')
+                else:
+                    file = open(self.file_path, 'rb')
+                with file:
+                    for entry in iter_json_array(file, digest=digest, progress=report):
+                        self._append_slot(self._make_entry(entry))
+                self.date_index.build(self.entries)
+                self._index_changed = True
+                self._snapshot_token = digest.hexdigest()
             else:
-                self.entries = []
-        except (json.JSONDecodeError, IOError) as e:
+                self._snapshot_token = None
+        except (ValueError, IOError) as e:
             print(f"Error loading data: {e}")
-            self.entries = []
+            self._snapshot_token = None
+            self._reset()
+        
+        self._journal_offset = 0
+        self._journal_records = 0
+        try:
+            self._replay_journal()
+        except IOError as e:
+            print(f"Error loading journal: {e}")
+        
+        # A sidecar is cheaper to load than the index is to build, and a
+        # process pool builds it faster now that every entry is read
+        if not self.lazy_search_index:
+            self._build_search_index()
+            self._search_index_live = True
     
-    def save_data(self):
-        """Save guest book entries to the JSON file"""
+    @staticmethod
+    def _stat(path):
+        """Return what identifies the current version of a file, or None"""
         try:
-            with open(self.file_path, 'w') as file:
-                json.dump(self.entries, file, indent=4)
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    
+    def _process_lock(self):
+        """Return the lock that keeps other processes out while we write
+        
+        Books that are not shared get a no-op context manager.
+        """
+        if not self.shared:
+            return nullcontext()
+        lock_path = self.file_path + ".lock"
+        if self._file_lock is None or self._file_lock.path != lock_path:
+            self._file_lock = FileLock(lock_path)
+        return self._file_lock
+    
+    def _make_entry(self, data):
+        """Turn an entry dict from the file into the in-memory representation"""
+        return Entry.from_dict(data) if self.compact_entries else data
+    
+    def _append_slot(self, entry):
+        """Append an entry to the slots and the ID map without indexing it"""
+        entry_id = entry['id']
+        self._index_slot(entry_id, len(self._slots))
+        self._slots.append(entry)
+        if self._live is not None:
+            self._live.append(entry)
+        if type(entry_id) is int and entry_id >= self._next_id:
+            self._next_id = entry_id + 1
+    
+    def _insert(self, entry):
+        """Append an entry and add it to the indexes"""
+        self._append_slot(entry)
+        self.date_index.add(entry)
+        if self._search_index_live:
+            self.search_index.add(entry)
+        for index in self.sort_indexes.values():
+            index.add_many((entry,))
+        self.query_cache.added((entry,))
+        self._index_changed = True
+        if not self._loading and self.changes:
+            self.changes.emit(ADDED, (entry,))
+    
+    def _insert_many(self, entries):
+        """Append several entries and add them to the indexes"""
+        for entry in entries:
+            self._append_slot(entry)
+        
+        self.date_index.add_many(entries)
+        if self._search_index_live:
+            for entry in entries:
+                self.search_index.add(entry)
+        for index in self.sort_indexes.values():
+            index.add_many(entries)
+        self.query_cache.added(entries)
+        self._index_changed = True
+        self._notify(ADDED, entries)
+    
+    def _index_slot(self, entry_id, slot):
+        """Record the slot of an entry in the ID map"""
+        if entry_id in self._positions:
+            self._duplicates.setdefault(entry_id, []).append(slot)
+        else:
+            self._positions[entry_id] = slot
+    
+    def _remove(self, entry_ids):
+        """Remove the first entry with each ID from the entries and indexes
+        
+        Returns the IDs that were found and removed.
+        """
+        removed_ids = []
+        removed = []
+        for entry_id in entry_ids:
+            slot = self._positions.pop(entry_id, None)
+            if slot is None:
+                continue
+            duplicates = self._duplicates.get(entry_id)
+            if duplicates:
+                self._positions[entry_id] = duplicates.pop(0)
+                if not duplicates:
+                    del self._duplicates[entry_id]
+            
+            removed.append(self._slots[slot])
+            removed_ids.append(entry_id)
+            self._slots[slot] = None
+            self._tombstones += 1
+        
+        if removed:
+            self._live = None
+            if self._tombstones * 2 > len(self._slots):
+                self._sweep_tombstones()
+            
+            self.date_index.remove_many(removed)
+            if self._search_index_live:
+                self.search_index.remove_many(removed)
+            for index in self.sort_indexes.values():
+                index.remove_many(removed)
+            self.query_cache.removed(removed)
+            self._index_changed = True
+            self._notify(REMOVED, removed_ids)
+        return removed_ids
+    
+    def _sweep_tombstones(self):
+        """Drop the tombstones from the slots and renumber the ID map"""
+        self._slots = [entry for entry in self._slots if entry is not None]
+        self._tombstones = 0
+        self._live = None
+        self._positions = {}
+        self._duplicates = {}
+        for slot, entry in enumerate(self._slots):
+            self._index_slot(entry['id'], slot)
+    
+    def _reset(self):
+        """Drop every entry and empty the indexes"""
+        self._slots = []
+        self._positions = {}
+        self._duplicates = {}
+        self._tombstones = 0
+        self._live = None
+        self.date_index.clear()
+        self.search_index.clear()
+        self.sort_indexes = {}
+        self.query_cache.clear()
+        self._index_changed = True
+        self._notify(CLEARED)
+    
+    def _notify(self, event, items=()):
+        """Tell the subscribers about a change, unless a load is replacing the entries"""
+        if not self._loading and self.changes:
+            self.changes.emit(event, items)
+    
+    def subscribe(self, callback):
+        """Call callback(event, items) after every change to the entries
+        
+        The events are "added" with the new entries, "removed" with the IDs
+        of the removed entries, "cleared", and "reloaded" when the entries
+        were replaced and views have to be read again. The callback runs
+        on the thread that made the change, with the entry lock held.
+        """
+        self.changes.subscribe(callback)
+    
+    def unsubscribe(self, callback):
+        """Stop calling a callback passed to subscribe()"""
+        self.changes.unsubscribe(callback)
+    
+    def _data_fingerprint(self):
+        """Identify the on-disk state the in-memory entries correspond to"""
+        try:
+            journal_size = os.path.getsize(self.journal_path)
+        except OSError:
+            journal_size = 0
+        return [self._snapshot_token, journal_size, len(self.entries)]
+    
+    def _parallel_for(self, count):
+        """Return the process pool if count entries are worth processing in parallel, else None"""
+        if self.parallel is not None and self.parallel.worth_it(count):
+            return self.parallel
+        return None
+    
+    @timed("data.build_search_index")
+    def _build_search_index(self):
+        """Load the search index sidecar or rebuild the index from the entries"""
+        if (len(self.entries) >= self.index_sidecar_min and
+                self.search_index.load(self.index_path, self._data_fingerprint(), self.entries)):
+            self._index_changed = False
+            return
+        
+        postings = None
+        pool = self._parallel_for(len(self.entries))
+        if pool is not None:
+            try:
+                postings = pool.trigram_postings(self.entries)
+            except ValueError:
+                # Entries the pool cannot pack are indexed here instead
+                pass
+        if postings is not None:
+            self.search_index.merge_postings(self.entries, postings)
+        else:
+            self.search_index.build(self.entries)
+        self._index_changed = True
+    
+    def save_search_index(self):
+        """Write the search index sidecar for large books if it changed"""
+        with self._write_lock, self._lock:
+            if self._search_index_live and self._index_changed and len(self.entries) >= self.index_sidecar_min:
+                if self.search_index.save(self.index_path, self._data_fingerprint()):
+                    self._index_changed = False
+    
+    def _replay_journal(self):
+        """Apply the journal records that were written on top of the snapshot"""
+        pending_path = self.journal_path + ".tmp"
+        
+        # A leftover pending journal means a compaction was interrupted. It is
+        # only valid if the new snapshot made it to disk before the crash.
+        if os.path.exists(pending_path):
+            if self._read_journal_header(pending_path) == self._snapshot_token:
+                os.replace(pending_path, self.journal_path)
+            else:
+                os.remove(pending_path)
+        
+        if not self.shared and os.path.exists(self.file_path + ".tmp"):
+            os.remove(self.file_path + ".tmp")
+        
+        if not os.path.exists(self.journal_path):
+            return
+        
+        with open(self.journal_path, 'rb') as file:
+            lines = file.read().split(b'\n')
+        
+        # Every record ends with a newline, anything after the last one
+        # is a torn append
+        torn = lines.pop()
+        
+        try:
+            header = json.loads(lines[0]) if lines else None
+        except json.JSONDecodeError:
+            header = None
+        if not isinstance(header, dict) or header.get("snapshot") != self._snapshot_token:
+            # The snapshot was rewritten without this journal (for example by
+            # a full save), so the journal is already contained in it.
+            print("Ignoring journal that does not match the snapshot")
+            return
+        
+        good_bytes = len(lines[0]) + 1
+        for line in lines[1:]:
+            if not line.strip():
+                good_bytes += len(line) + 1
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                torn = True
+                break
+            self._apply_record(record)
+            self._journal_records += 1
+            good_bytes += len(line) + 1
+        
+        if torn:
+            # A torn record from an interrupted append, drop it and
+            # everything after it so new records start on a clean line
+            print("Truncating damaged journal tail")
+            with open(self.journal_path, 'r+b') as file:
+                file.truncate(good_bytes)
+        self._journal_offset = good_bytes
+    
+    def _read_journal_header(self, path):
+        """Return the snapshot token stored in the first line of a journal"""
+        try:
+            with open(path, 'rb') as file:
+                header = json.loads(file.readline())
+            return header.get("snapshot")
+        except (json.JSONDecodeError, AttributeError, IOError):
+            return False
+    
+    def _apply_record(self, record):
+        """Apply a single journal record to the in-memory entries"""
+        op = record.get("op")
+        if op == "add":
+            self._insert(self._make_entry(record["entry"]))
+        elif op == "delete":
+            self._remove((record["id"],))
+        elif op == "clear":
+            self._reset()
+    
+    def _append_journal(self, records):
+        """Append records to the journal in a single write"""
+        with self._write_lock, self._process_lock():
+            try:
+                if self.shared:
+                    self._sync_disk_changes()
+                
+                if not self._journal_offset or not os.path.exists(self.journal_path):
+                    header = (json.dumps({"snapshot": self._snapshot_token}) + "\n").encode()
+                    with open(self.journal_path, 'wb') as file:
+                        file.write(header)
+                    tally("data.bytes_written", len(header))
+                    self._journal_offset = len(header)
+                    self._journal_records = 0
+                
+                data = "".join(json.dumps(record, default=entry_to_json) + "\n" for record in records).encode()
+                with open(self.journal_path, 'ab') as file:
+                    file.write(data)
+                tally("data.bytes_written", len(data))
+                self._journal_offset += len(data)
+                self._journal_records += len(records)
+            except IOError as e:
+                print(f"Error writing journal: {e}")
+                return False
+        return True
+    
+    def _flush_journal(self):
+        """Append the unsaved records to the journal, with the write lock held"""
+        with self._lock:
+            records = list(self._pending_records)
+        if not records:
             return True
-        except IOError as e:
-            print(f"Error saving data: {e}")
+        if not self._append_journal(records):
+            # The records stay pending so the next flush tries again
             return False
+        
+        with self._lock:
+            del self._pending_records[:len(records)]
+            self._dirty = bool(self._pending_records)
+        return True
+    
+    def _read_journal_delta(self):
+        """Return the journal records written after the ones already applied
+        
+        Called with the file lock held. Returns None when the journal on
+        disk no longer continues the one that was applied.
+        """
+        try:
+            file = open(self.journal_path, 'rb')
+        except FileNotFoundError:
+            return [] if not self._journal_offset else None
+        
+        with file:
+            header_line = file.readline()
+            try:
+                header = json.loads(header_line)
+            except json.JSONDecodeError:
+                header = None
+            if (not header_line.endswith(b'\n') or not isinstance(header, dict) or
+                    header.get("snapshot") != self._snapshot_token):
+                # A journal for some other snapshot is ignored, as on load
+                return [] if not self._journal_offset else None
+            
+            start = self._journal_offset or len(header_line)
+            if os.fstat(file.fileno()).st_size < start:
+                return None
+            file.seek(start)
+            data = file.read()
+        
+        end = data.rfind(b'\n') + 1
+        if end < len(data):
+            # Writers hold the lock for a whole append, so a partial line
+            # can only be left by a writer that crashed
+            print("Truncating damaged journal tail")
+            with open(self.journal_path, 'r+b') as file:
+                file.truncate(start + end)
+        
+        records = []
+        for line in data[:end].split(b'\n')[:-1]:
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                return None
+        self._journal_offset = start + end
+        return records
     
+    def _sync_disk_changes(self):
+        """Merge what other processes wrote since the book was read
+        
+        Called with the write lock and the file lock held. While the
+        snapshot is unchanged only the new journal records are applied;
+        otherwise the book is reloaded. Unsaved changes stay on top, and
+        unsaved entries whose IDs another process took get new IDs.
+        Returns True if the entries changed.
+        """
+        records = None
+        if self._stat(self.file_path) == self._snapshot_stat:
+            records = self._read_journal_delta()
+        
+        with self._lock:
+            if records is None or any(record.get("op") == "clear" for record in records):
+                self._reload_keeping_unsaved()
+                return True
+            if not records:
+                return False
+            
+            self._renumber_unsaved({
+                record["entry"]["id"] for record in records if record.get("op") == "add"
+            })
+            for record in records:
+                self._apply_record(record)
+            self._journal_records += len(records)
+        return True
+    
+    def _reload_keeping_unsaved(self):
+        """Reload the book from disk and apply the unsaved changes again"""
+        unsaved = self._pending_records
+        self._loading = True
+        try:
+            self._load()
+            
+            renamed = {}
+            for record in unsaved:
+                op = record.get("op")
+                if op == "add":
+                    entry = record["entry"]
+                    if entry['id'] in self._positions:
+                        renamed[entry['id']] = self._next_id
+                        self._set_entry_id(entry, self._next_id)
+                    self._insert(entry)
+                elif op == "delete":
+                    record["id"] = renamed.get(record["id"], record["id"])
+                    self._remove((record["id"],))
+                elif op == "clear":
+                    renamed.clear()
+                    self._reset()
+        finally:
+            self._loading = False
+        
+        self._pending_records = unsaved
+        self._dirty = bool(unsaved)
+        self._notify(RELOADED)
+    
+    def _renumber_unsaved(self, taken_ids):
+        """Give unsaved entries new IDs where another process used the same ones"""
+        if not taken_ids:
+            return
+        numeric_ids = [entry_id for entry_id in taken_ids if type(entry_id) is int]
+        if numeric_ids:
+            self._next_id = max(self._next_id, max(numeric_ids) + 1)
+        
+        renamed = {}
+        for record in self._pending_records:
+            op = record.get("op")
+            if op == "add" and record["entry"]['id'] in taken_ids:
+                entry = record["entry"]
+                renamed[entry['id']] = self._next_id
+                self._rekey(entry, self._next_id)
+                self._next_id += 1
+            elif op == "delete" and record["id"] in renamed:
+                record["id"] = renamed[record["id"]]
+            elif op == "clear":
+                renamed.clear()
+        if renamed:
+            # Views still show the entries under their old IDs
+            self._notify(RELOADED)
+    
+    def _rekey(self, entry, new_id):
+        """Change the ID of an entry and move it in the ID map"""
+        old_id = entry['id']
+        duplicates = self._duplicates.get(old_id, [])
+        slots = [self._positions[old_id]] if old_id in self._positions else []
+        for slot in slots + duplicates:
+            if self._slots[slot] is entry:
+                if self._positions[old_id] == slot:
+                    if duplicates:
+                        self._positions[old_id] = duplicates.pop(0)
+                    else:
+                        del self._positions[old_id]
+                else:
+                    duplicates.remove(slot)
+                if old_id in self._duplicates and not duplicates:
+                    del self._duplicates[old_id]
+                self._index_slot(new_id, slot)
+                break
+        
+        id_index = self.sort_indexes.get("id")
+        if id_index is not None:
+            id_index.remove_many((entry,))
+        self._set_entry_id(entry, new_id)
+        if id_index is not None:
+            id_index.add_many((entry,))
+    
+    @staticmethod
+    def _set_entry_id(entry, entry_id):
+        """Set the ID of a dict or Entry"""
+        if isinstance(entry, Entry):
+            entry.id = entry_id
+        else:
+            entry['id'] = entry_id
+    
+    def has_disk_changes(self):
+        """Cheaply check whether the files changed since the book was read"""
+        if self._stat(self.file_path) != self._snapshot_stat:
+            return True
+        try:
+            size = os.path.getsize(self.journal_path)
+        except OSError:
+            return bool(self._journal_offset)
+        if self._journal_offset:
+            return size != self._journal_offset
+        # A new journal counts once it belongs to our snapshot
+        return self._read_journal_header(self.journal_path) == self._snapshot_token
+    
+    @timed("data.reload_changes")
+    def reload_changes(self):
+        """Pick up entries that other processes wrote to a shared book
+        
+        Returns True if the entries changed.
+        """
+        if not self.shared or not self.has_disk_changes():
+            return False
+        with self._write_lock, self._process_lock():
+            try:
+                return self._sync_disk_changes()
+            except IOError as e:
+                print(f"Error reloading data: {e}")
+                return False
+    
+    def _write_snapshot(self, entries, file_path):
+        """Write entries to a temporary file and return its path and token"""
+        data = json.dumps(entries, indent=4, default=entry_to_json).encode()
+        # The token is taken before compression, as loading hashes what it parses
+        token = hashlib.sha1(data).hexdigest()
+        if file_path.lower().endswith(".gz"):
+            import gzip
+            data = gzip.compress(data, compresslevel=6)
+        tmp_path = file_path + ".tmp"
+        if self.shared:
+            # Other processes may be writing their own snapshot right now
+            tmp_path = f"{file_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        tally("data.bytes_written", len(data))
+        return tmp_path, token
+    
+    def _maybe_compact(self):
+        """Start a background compaction once the journal is large enough"""
+        limit = max(self.compact_threshold, self.compact_ratio * len(self.entries))
+        if self._journal_records >= limit:
+            self.compact()
+    
+    @timed("data.compact")
+    def compact(self, wait=False):
+        """Fold the journal into a fresh snapshot in a background thread"""
+        if not self.journal:
+            return self.save_data()
+        
+        with self._write_lock:
+            if self._compaction_thread is None:
+                with self._process_lock():
+                    # The copy has to match the journal up to the offset, so
+                    # unsaved changes are written first
+                    while True:
+                        if not self._flush_journal():
+                            return
+                        with self._lock:
+                            if not self._pending_records:
+                                entries = list(self.entries)
+                                state = (self._snapshot_stat, self._journal_offset)
+                                break
+                
+                self._compaction_thread = threading.Thread(
+                    target=self._run_compaction,
+                    args=(entries, self.file_path, state),
+                    name="guestbook-compaction"
+                )
+                self._compaction_thread.start()
+        if wait:
+            self.wait_for_compaction()
+    
+    @timed("data.background_compaction")
+    def _run_compaction(self, entries, file_path, state):
+        """Write the snapshot and swap it in together with the journal tail
+        
+        state is the snapshot identity and journal offset the entries were
+        copied at. Journal records after that offset, written by us or by
+        other processes, are carried over into the new journal.
+        """
+        journal_path = file_path + ".journal"
+        snapshot_stat, offset = state
+        tmp_path = None
+        try:
+            tmp_path, token = self._write_snapshot(entries, file_path)
+            with self._write_lock, self._process_lock():
+                if snapshot_stat != self._snapshot_stat or snapshot_stat != self._stat(file_path):
+                    # The snapshot was replaced meanwhile (by a save, a
+                    # reload or another process), so this copy is outdated
+                    return
+                
+                tail = b""
+                tail_start = offset
+                if os.path.exists(journal_path):
+                    with open(journal_path, 'rb') as file:
+                        if not offset:
+                            # The journal was started after the copy was
+                            # taken, or is a stale one that does not count
+                            header_line = file.readline()
+                            tail_start = len(header_line)
+                            if self._read_journal_header(journal_path) != self._snapshot_token:
+                                tail_start = os.fstat(file.fileno()).st_size
+                        file.seek(tail_start)
+                        tail = file.read()
+                    tail = tail[:tail.rfind(b'\n') + 1]
+                
+                # The new journal is staged before either file is replaced,
+                # so load_data can finish the swap after a crash
+                header = (json.dumps({"snapshot": token}) + "\n").encode()
+                pending_path = journal_path + ".tmp"
+                with open(pending_path, 'wb') as file:
+                    file.write(header + tail)
+                    file.flush()
+                    os.fsync(file.fileno())
+                os.replace(tmp_path, file_path)
+                os.replace(pending_path, journal_path)
+                tmp_path = None
+                
+                self._snapshot_token = token
+                self._snapshot_stat = self._stat(file_path)
+                self._journal_offset = len(header) + max(0, self._journal_offset - tail_start)
+                self._journal_records = tail.count(b'\n')
+        except IOError as e:
+            print(f"Error compacting journal: {e}")
+        finally:
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            with self._write_lock:
+                self._compaction_thread = None
+    
+    @contextmanager
+    def _snapshot_lock(self):
+        """Hold the write lock while no compaction is running"""
+        while True:
+            self.wait_for_compaction()
+            self._write_lock.acquire()
+            if self._compaction_thread is None:
+                break
+            self._write_lock.release()
+        try:
+            yield
+        finally:
+            self._write_lock.release()
+    
+    def wait_for_compaction(self):
+        """Block until a running background compaction has finished"""
+        thread = self._compaction_thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+    
+    def close(self):
+        """Finish outstanding background work before the handler is dropped"""
+        self.flush()
+        self.wait_for_compaction()
+        self.save_search_index()
+        if self._owns_parallel:
+            self.parallel.shutdown()
+    
+    def has_unsaved_changes(self):
+        """Return True if changes are waiting for flush()"""
+        return self._dirty
+    
+    @timed("data.flush")
+    def flush(self):
+        """Write every change made since the last flush in a single write"""
+        if not self.journal or self._snapshot_needed:
+            return self.save_data() if self._dirty else True
+        
+        with self._write_lock:
+            saved = self._flush_journal()
+            if saved:
+                self._maybe_compact()
+            return saved
+    
+    def _defer(self, records):
+        """Record a change for the next flush
+        
+        Called with _lock held, in the same critical section that changed
+        the entries, so a concurrent flush or compaction never sees the
+        change without its records. Returns True when auto_save is off;
+        otherwise the caller writes the change with flush().
+        """
+        self._pending_records.extend(records)
+        self._dirty = True
+        return not self.auto_save
+    
+    @timed("data.save_data")
+    def save_data(self):
+        """Save guest book entries to the JSON file"""
+        return self._save_snapshot(merge=True)
+    
+    def _save_snapshot(self, merge):
+        """Write every entry to a new snapshot and drop the journal
+        
+        With merge set, a shared book first picks up what other processes
+        wrote, so their entries are not overwritten.
+        """
+        with self._snapshot_lock(), self._process_lock():
+            try:
+                if merge and self.shared:
+                    self._sync_disk_changes()
+                
+                # The snapshot contains every change, saved or not
+                with self._lock:
+                    entries = list(self.entries)
+                    self._pending_records = []
+                    self._dirty = False
+                
+                tmp_path, token = self._write_snapshot(entries, self.file_path)
+                os.replace(tmp_path, self.file_path)
+                self._snapshot_token = token
+                self._snapshot_stat = self._stat(self.file_path)
+                
+                # Everything in the journal is now part of the snapshot
+                if os.path.exists(self.journal_path):
+                    os.remove(self.journal_path)
+                self._journal_offset = 0
+                self._journal_records = 0
+                self._snapshot_needed = False
+                return True
+            except IOError as e:
+                print(f"Error saving data: {e}")
+                # The dropped journal records only exist in memory now, so
+                # the next flush has to write a full snapshot
+                with self._lock:
+                    self._dirty = True
+                    self._snapshot_needed = True
+                return False
+    
+    @timed("data.add_entry")
     def add_entry(self, name, message, date=None):
         """Add a new guest book entry"""
-        if not date:
-            date = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        return self.add_entries([{"name": name, "message": message, "date": date}])
+    
+    @timed("data.add_entries")
+    def add_entries(self, entries):
+        """Add several entries and save them in a single write
         
-        entry = {
-            "id": len(self.entries) + 1,
-            "name": name,
-            "message": message,
-            "date": date
-        }
+        entries is an iterable of mappings with a name, a message and an
+        optional date; every entry gets a new ID.
+        """
+        now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            new_entries = []
+            for entry_id, data in enumerate(entries, self._next_id):
+                entry = {
+                    "id": entry_id,
+                    "name": data['name'],
+                    "message": data['message'],
+                    "date": data.get('date') or now
+                }
+                new_entries.append(Entry.from_dict(entry) if self.compact_entries else entry)
+            self._insert_many(new_entries)
+            tally("data.entries_added", len(new_entries))
+            
+            records = [{"op": "add", "entry": entry} for entry in new_entries]
+            if not records or self._defer(records):
+                return True
+        return self.flush()
+    
+    @timed("data.put_entries")
+    def put_entries(self, entries):
+        """Add entries that already have IDs and dates, keeping both
         
-        self.entries.append(entry)
-        return self.save_data()
+        Used when entries move between books, for example into the
+        partitions of a partitioned guest book, which hands out the IDs.
+        """
+        with self._lock:
+            new_entries = [
+                self._make_entry({
+                    "id": entry['id'],
+                    "name": entry['name'],
+                    "message": entry['message'],
+                    "date": entry['date']
+                })
+                for entry in entries
+            ]
+            self._insert_many(new_entries)
+            tally("data.entries_added", len(new_entries))
+            
+            records = [{"op": "add", "entry": entry} for entry in new_entries]
+            if not records or self._defer(records):
+                return True
+        return self.flush()
     
     def get_all_entries(self):
         """Return all guest book entries"""
         return self.entries
     
+    def get_entry(self, entry_id):
+        """Return the entry with the given ID, or None"""
+        with self._lock:
+            slot = self._positions.get(entry_id)
+            return None if slot is None else self._slots[slot]
+    
+    @timed("data.search_entries")
     def search_entries(self, query):
         """Search for entries containing the query in name or message"""
-        query = query.lower()
-        results = []
+        text = query.lower()
+        matches = search_matcher(query)
         
-        for entry in self.entries:
-            if (query in entry['name'].lower() or 
-                query in entry['message'].lower()):
-                results.append(entry)
+        def search():
+            # Typing extends the previous query, so its cached result
+            # already holds every match of the new one
+            base = self.query_cache.narrowest("search", lambda cached: cached in text)
+            # The index also intersects every posting list, so it only
+            # wins when its candidates are far fewer; a refined result
+            # kept its lowercased texts and is cheaper still to filter
+            factor = 8 if isinstance(base, SearchResults) else 2
+            if base is not None and (not self._search_index_live or
+                                     len(base) <= factor * self.search_index.estimate(text)):
+                tally("data.entries_scanned", len(base))
+                return refine_search(base, text)
+            
+            # A process pool scans faster than building an index that a
+            # lazy handler may never use again, or than the index's own
+            # scan for queries too short for trigrams
+            pool = self._parallel_for(len(self.entries))
+            if pool is not None and (not self._search_index_live or len(text) < 3):
+                try:
+                    tally("data.entries_scanned", len(self.entries))
+                    return pool.search(self.entries, query)
+                except ValueError:
+                    pass
+            
+            if not self._search_index_live:
+                self._build_search_index()
+                self._search_index_live = True
+            return self.search_index.search(query)
         
-        return results
+        with self._lock:
+            return self.query_cache.lookup(("search", text), search, matches)
     
+    @timed("data.filter_by_date")
     def filter_by_date(self, start_date, end_date=None):
         """Filter entries by date range"""
         try:
@@ -77,46 +1042,178 @@ class DataHandler:
             
             if end_date:
                 end = datetime.datetime.strptime(end_date, "%Y-%m-%d")
-                end = end.replace(hour=23, minute=59, second=59)  # End of day
             else:
                 end = datetime.datetime.now()
+            end = end.replace(hour=23, minute=59, second=59)  # End of day
             
-            results = []
-            for entry in self.entries:
-                entry_date = datetime.datetime.strptime(entry['date'].split()[0], "%Y-%m-%d")
-                if start <= entry_date <= end:
-                    results.append(entry)
+            return self._date_range(pack_timestamp(start), pack_timestamp(end))
+        except ValueError as e:
+            print(f"Date format error: {e}")
+            return []
+    
+    @timed("data.filter_by_datetime")
+    def filter_by_datetime(self, start, end=None):
+        """Filter entries by a range that can include the time of day
+        
+        Bounds are datetimes or "YYYY-MM-DD[ HH:MM:SS]" strings. A date-only
+        end bound covers the whole day and a missing end bound means now.
+        """
+        try:
+            start = parse_bound(start)
+            end = parse_bound(end, end_of_day=True) if end else pack_timestamp(datetime.datetime.now())
             
-            return results
+            return self._date_range(start, end)
         except ValueError as e:
             print(f"Date format error: {e}")
             return []
     
+    def _date_range(self, start, end):
+        """Return the entries between two packed timestamps, from the cache when possible"""
+        with self._lock:
+            return self.query_cache.lookup(
+                ("date", start, end),
+                lambda: self.date_index.range(start, end),
+                date_matcher(start, end)
+            )
+    
+    def date_bounds(self):
+        """Return the oldest and newest entry dates as packed timestamps, or None"""
+        with self._lock:
+            return self.date_index.bounds()
+    
+    def cache_stats(self):
+        """Return the hit and miss statistics of the query cache"""
+        with self._lock:
+            return self.query_cache.stats()
+    
+    @timed("data.latest_entries")
+    def latest_entries(self, count=50):
+        """Return the most recent entries by date, newest first"""
+        with self._lock:
+            return self.date_index.latest(count)
+    
+    def _sort_index(self, column):
+        """Return the sort index of a column, building it on first use"""
+        index = self.sort_indexes.get(column)
+        if index is None:
+            index = SortIndex(column)
+            index.build(self.entries)
+            self.sort_indexes[column] = index
+        return index
+    
+    @timed("data.sort_entries")
+    def sort_entries(self, column, descending=False, entries=None):
+        """Return entries ordered by "id", "name" or "date" from the column's sort index
+        
+        Without entries every entry is returned, as a view that only reads
+        the rows it is sliced for. Entries such as a search result are put
+        in index order without sorting them again from scratch. Equal
+        values keep insertion order, reversed when descending.
+        """
+        with self._lock:
+            index = self._sort_index(column)
+            if entries is None:
+                return index.ordered(descending)
+            return index.select(entries, descending)
+    
+    @timed("data.top_entries")
+    def top_entries(self, column, count=50, descending=True):
+        """Return the count entries with the highest (or lowest) values in a column
+        
+        A sort index that already exists is read from its end; otherwise a
+        heap picks the entries without building one.
+        """
+        with self._lock:
+            index = self.sort_indexes.get(column)
+            if index is not None:
+                return index.top(count, descending)
+            return top_entries(self.entries, column, count, descending)
+    
+    @timed("data.top_visitors")
+    def top_visitors(self, count=10):
+        """Return (name, number of entries) for the most frequent visitors, most first"""
+        with self._lock:
+            return top_visitors(self.entries, count)
+    
+    @timed("data.count_by_day")
+    def count_by_day(self, start_date=None, end_date=None):
+        """Return (YYYY-MM-DD, count) pairs for every day that has entries"""
+        try:
+            start = parse_bound(start_date) // 1000000 if start_date else None
+            end = parse_bound(end_date) // 1000000 if end_date else None
+        except ValueError as e:
+            print(f"Date format error: {e}")
+            return []
+        
+        with self._lock:
+            counts = self.date_index.count_by_day(start, end)
+        return [(f"{day // 10000:04d}-{day // 100 % 100:02d}-{day % 100:02d}", count)
+                for day, count in counts]
+    
+    @timed("data.delete_entry")
     def delete_entry(self, entry_id):
         """Delete an entry by its ID"""
-        for i, entry in enumerate(self.entries):
-            if entry['id'] == entry_id:
-                del self.entries[i]
-                return self.save_data()
-        return False
+        with self._lock:
+            if not self._remove((entry_id,)):
+                return False
+            tally("data.entries_deleted")
+            
+            records = [{"op": "delete", "id": entry_id}]
+            if self._defer(records):
+                return True
+        return self.flush()
+    
+    @timed("data.delete_entries")
+    def delete_entries(self, entry_ids):
+        """Delete several entries by ID and save them in a single write
+        
+        IDs that do not exist are skipped. Returns False if none of the
+        entries existed or the change could not be saved.
+        """
+        with self._lock:
+            removed_ids = self._remove(entry_ids)
+            if not removed_ids:
+                return False
+            tally("data.entries_deleted", len(removed_ids))
+            
+            records = [{"op": "delete", "id": entry_id} for entry_id in removed_ids]
+            if self._defer(records):
+                return True
+        return self.flush()
     
+    @timed("data.clear_all")
+    def clear_all(self):
+        """Delete every entry in the guest book"""
+        with self._lock:
+            self._reset()
+            
+            records = [{"op": "clear"}]
+            if self._defer(records):
+                return True
+        return self.flush()
+    
+    @timed("data.save_as")
+    def save_as(self, file_path):
+        """Save the guest book to a new file and keep working on that file"""
+        with self._snapshot_lock():
+            self.file_path = file_path
+            return self._save_snapshot(merge=False)
+    
+    @timed("data.export_to_csv")
     def export_to_csv(self, file_path):
         """Export all entries to a CSV file"""
-        import csv
-        try:
-            with open(file_path, 'w', newline='') as file:
-                writer = csv.writer(file)
-                # Write header
-                writer.writerow(['ID', 'Name', 'Date', 'Message'])
-                # Write data
-                for entry in self.entries:
-                    writer.writerow([
-                        entry['id'],
-                        entry['name'],
-                        entry['date'],
-                        entry['message']
-                    ])
-            return True
-        except IOError as e:
-            print(f"Error exporting to CSV: {e}")
-            return False
+        return export_entries(self.entries, file_path, "csv", pool=self.parallel) is not None
+
+
+def open_data_handler(file_path="guestbook_data.json", **kwargs):
+    """Return a data handler for the file, picking the backend by extension
+    
+    Directories and manifest.json files open partitioned guest books.
+    """
+    if os.path.isdir(file_path) or os.path.basename(file_path) == "manifest.json":
+        from partitions import PartitionedDataHandler
+        return PartitionedDataHandler(file_path, **kwargs)
+    if file_path.lower().endswith((".db", ".sqlite", ".sqlite3")):
+        from sqlite_handler import SQLiteDataHandler
+        return SQLiteDataHandler(file_path, **kwargs)
+    return DataHandler(file_path, **kwargs)
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# Guest Book Application - Date Index
+# This file contains the sorted timestamp index used for date queries.
+
+import datetime
+from bisect import bisect_left, bisect_right, insort
+from instrumentation import tally
+
+# Index keys pack the timestamp above a 32-bit insertion sequence number
+SEQ_BITS = 32
+SEQ_MASK = (1 << SEQ_BITS) - 1
+
+def pack_timestamp(moment):
+    """Pack a datetime into a sortable YYYYMMDDhhmmss integer"""
+    return (moment.year * 10000000000 + moment.month * 100000000 + moment.day * 1000000 +
+            moment.hour * 10000 + moment.minute * 100 + moment.second)
+
+def unpack_timestamp(timestamp):
+    """Turn a packed timestamp back into a datetime"""
+    day, time = divmod(timestamp, 1000000)
+    return datetime.datetime(
+        day // 10000, day // 100 % 100, day % 100,
+        time // 10000, time // 100 % 100, time % 100
+    )
+
+# Packed days of the "YYYY-MM-DD" texts seen so far; a book has far fewer
+# distinct days than entries, so most dates skip building a datetime
+_packed_days = {}
+MAX_CACHED_DAYS = 100000
+
+def _packed_day(day_string):
+    """Return the YYYYMMDD int of a "YYYY-MM-DD" text, raising ValueError if invalid"""
+    day = _packed_days.get(day_string)
+    if day is None:
+        moment = datetime.date(int(day_string[0:4]), int(day_string[5:7]), int(day_string[8:10]))
+        day = moment.year * 10000 + moment.month * 100 + moment.day
+        if len(_packed_days) < MAX_CACHED_DAYS:
+            _packed_days[day_string] = day
+    return day
+
+def parse_timestamp(date_string):
+    """Parse an entry date ("YYYY-MM-DD" or "YYYY-MM-DD HH:MM:SS") into a packed int
+    
+    Returns None when the date cannot be parsed.
+    """
+    try:
+        # Fast path for the format the application writes, with the same
+        # checks the datetime constructor makes
+        if len(date_string) == 19 and date_string[4] == '-' and date_string[10] == ' ':
+            day = _packed_day(date_string[:10])
+            hour, minute, second = int(date_string[11:13]), int(date_string[14:16]), int(date_string[17:19])
+            if not (0 <= hour < 24 and 0 <= minute < 60 and 0 <= second < 60):
+                return None
+            return day * 1000000 + hour * 10000 + minute * 100 + second
+        
+        # Anything else is read like filter_by_date always has: the first
+        # word is the day, an optional second word the time of day
+        parts = date_string.split()
+        moment = datetime.datetime.strptime(parts[0], "%Y-%m-%d")
+        if len(parts) > 1:
+            try:
+                time = datetime.datetime.strptime(parts[1], "%H:%M:%S")
+                moment = moment.replace(hour=time.hour, minute=time.minute, second=time.second)
+            except ValueError:
+                pass
+        return pack_timestamp(moment)
+    except (ValueError, IndexError, TypeError, AttributeError):
+        return None
+
+def parse_bound(value, end_of_day=False):
+    """Turn a query bound (datetime, "YYYY-MM-DD" or "YYYY-MM-DD HH:MM:SS") into a packed int
+    
+    Date-only bounds cover the whole day when end_of_day is True.
+    Raises ValueError for anything else.
+    """
+    if isinstance(value, datetime.datetime):
+        return pack_timestamp(value)
+    if isinstance(value, datetime.date):
+        value = value.strftime("%Y-%m-%d")
+    
+    value = value.strip()
+    if len(value) <= 10:
+        moment = datetime.datetime.strptime(value, "%Y-%m-%d")
+        if end_of_day:
+            moment = moment.replace(hour=23, minute=59, second=59)
+    else:
+        moment = datetime.datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+    return pack_timestamp(moment)
+
+
+class DateIndex:
+    """Entries kept sorted by their parsed timestamp
+    
+    Range queries use binary search, so they cost O(log N + k) instead of
+    parsing every entry's date. Per-day counts are maintained alongside.
+    Entries whose date cannot be parsed are left out of the index.
+    """
+    
+    def __init__(self):
+        """Create an empty index"""
+        self.clear()
+    
+    def clear(self):
+        """Remove every entry from the index"""
+        self._keys = []          # sorted (timestamp << SEQ_BITS | seq) keys
+        self._entries = {}       # seq -> entry
+        self._seqs = {}          # id(entry) -> (seq, timestamp)
+        self._day_counts = {}    # YYYYMMDD -> number of entries
+        self._days = []          # sorted days that have entries
+        self._next_seq = 0
+    
+    def __len__(self):
+        """Return the number of indexed entries"""
+        return len(self._entries)
+    
+    def add(self, entry):
+        """Index a new entry"""
+        # Compact entries carry their timestamp already parsed
+        timestamp = getattr(entry, "timestamp", None)
+        if timestamp is None:
+            timestamp = parse_timestamp(entry['date'])
+        if timestamp is None:
+            return
+        
+        seq = self._next_seq
+        self._next_seq += 1
+        self._entries[seq] = entry
+        self._seqs[id(entry)] = (seq, timestamp)
+        
+        # New entries are usually the newest, so this is normally an append
+        key = (timestamp << SEQ_BITS) | seq
+        if not self._keys or key > self._keys[-1]:
+            self._keys.append(key)
+        else:
+            insort(self._keys, key)
+        
+        day = timestamp // 1000000
+        count = self._day_counts.get(day, 0)
+        if not count:
+            insort(self._days, day)
+        self._day_counts[day] = count + 1
+    
+    def add_many(self, entries):
+        """Index several entries, merging their keys in with a single sort"""
+        keys = []
+        new_days = False
+        for entry in entries:
+            timestamp = getattr(entry, "timestamp", None)
+            if timestamp is None:
+                timestamp = parse_timestamp(entry['date'])
+            if timestamp is None:
+                continue
+            
+            seq = self._next_seq
+            self._next_seq += 1
+            self._entries[seq] = entry
+            self._seqs[id(entry)] = (seq, timestamp)
+            keys.append((timestamp << SEQ_BITS) | seq)
+            
+            day = timestamp // 1000000
+            count = self._day_counts.get(day, 0)
+            new_days = new_days or not count
+            self._day_counts[day] = count + 1
+        
+        if keys:
+            keys.sort()
+            if not self._keys or keys[0] > self._keys[-1]:
+                # Newer than everything indexed, the usual case for new entries
+                self._keys.extend(keys)
+            elif len(keys) <= 8:
+                for key in keys:
+                    insort(self._keys, key)
+            else:
+                # Both runs are sorted, which timsort merges in linear time
+                self._keys.extend(keys)
+                self._keys.sort()
+        if new_days:
+            self._days = sorted(self._day_counts)
+    
+    def remove(self, entry):
+        """Remove an entry from the index"""
+        self.remove_many((entry,))
+    
+    def remove_many(self, entries):
+        """Remove several entries, rewriting the key list at most once"""
+        keys = []
+        for entry in entries:
+            found = self._seqs.pop(id(entry), None)
+            if found is None:
+                continue
+            seq, timestamp = found
+            del self._entries[seq]
+            keys.append((timestamp << SEQ_BITS) | seq)
+            
+            day = timestamp // 1000000
+            self._day_counts[day] -= 1
+            if not self._day_counts[day]:
+                del self._day_counts[day]
+                del self._days[bisect_left(self._days, day)]
+        
+        if len(keys) * 64 < len(self._keys):
+            for key in keys:
+                i = bisect_left(self._keys, key)
+                if i < len(self._keys) and self._keys[i] == key:
+                    del self._keys[i]
+        elif keys:
+            dropped = set(keys)
+            self._keys = [key for key in self._keys if key not in dropped]
+    
+    def build(self, entries):
+        """Replace the index contents with the given entries"""
+        self.clear()
+        self.add_many(entries)
+    
+    def range(self, start, end):
+        """Return entries with start <= timestamp <= end in insertion order"""
+        lo = bisect_left(self._keys, start << SEQ_BITS)
+        hi = bisect_right(self._keys, (end << SEQ_BITS) | SEQ_MASK)
+        tally("data.entries_scanned", hi - lo)
+        seqs = sorted(key & SEQ_MASK for key in self._keys[lo:hi])
+        return [self._entries[seq] for seq in seqs]
+    
+    def bounds(self):
+        """Return the oldest and newest packed timestamps, or None if the index is empty"""
+        if not self._keys:
+            return None
+        return self._keys[0] >> SEQ_BITS, self._keys[-1] >> SEQ_BITS
+    
+    def latest(self, count):
+        """Return the newest entries, newest first"""
+        if count <= 0:
+            return []
+        return [self._entries[key & SEQ_MASK] for key in reversed(self._keys[-count:])]
+    
+    def count_by_day(self, start_day=None, end_day=None):
+        """Return (YYYYMMDD, count) pairs for the days between the bounds"""
+        lo = 0 if start_day is None else bisect_left(self._days, start_day)
+        hi = len(self._days) if end_day is None else bisect_right(self._days, end_day)
+        return [(day, self._day_counts[day]) for day in self._days[lo:hi]]
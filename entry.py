@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# Guest Book Application - Compact Entry
+# This file contains the memory-efficient representation of a guest book entry.
+
+import sys
+from collections.abc import Mapping
+from date_index import parse_timestamp
+
+ENTRY_KEYS = ("id", "name", "message", "date")
+_KEY_SET = frozenset(ENTRY_KEYS)
+
+def format_timestamp(timestamp):
+    """Format a packed timestamp the way the application writes dates"""
+    day, time = divmod(timestamp, 1000000)
+    return (f"{day // 10000:04d}-{day // 100 % 100:02d}-{day % 100:02d} "
+            f"{time // 10000:02d}:{time // 100 % 100:02d}:{time % 100:02d}")
+
+
+class Entry(Mapping):
+    """A guest book entry stored in slots instead of a dict
+    
+    Entries read like the dicts in the JSON file (entry['name'] and so on)
+    but avoid the per-entry dict. Visitor names are interned so repeat
+    visitors share one string, and dates in the application's own format
+    are kept as a packed integer that is turned back into the same text
+    on access.
+    """
+    
+    __slots__ = ("id", "name", "message", "_date")
+    
+    def __init__(self, id, name, message, date):
+        """Create an entry from the same fields as the JSON format"""
+        self.id = id
+        self.name = sys.intern(name) if type(name) is str else name
+        self.message = message
+        
+        # Only dates that format back to exactly the same text are packed
+        timestamp = parse_timestamp(date) if type(date) is str and len(date) == 19 else None
+        if timestamp is not None and format_timestamp(timestamp) == date:
+            self._date = timestamp
+        else:
+            self._date = date
+    
+    @classmethod
+    def from_dict(cls, data):
+        """Create an entry from a dict in the JSON format"""
+        return cls(data['id'], data['name'], data['message'], data['date'])
+    
+    @property
+    def date(self):
+        """Return the entry date as text"""
+        date = self._date
+        return format_timestamp(date) if type(date) is int else date
+    
+    @property
+    def timestamp(self):
+        """Return the packed timestamp of the entry, or None if it has no valid date"""
+        date = self._date
+        return date if type(date) is int else parse_timestamp(date)
+    
+    def to_dict(self):
+        """Return the entry as a dict in the JSON format"""
+        return {"id": self.id, "name": self.name, "message": self.message, "date": self.date}
+    
+    def __getitem__(self, key):
+        """Look up a field by its JSON key"""
+        if key in _KEY_SET:
+            return getattr(self, key)
+        raise KeyError(key)
+    
+    def __iter__(self):
+        """Iterate over the JSON keys"""
+        return iter(ENTRY_KEYS)
+    
+    def __len__(self):
+        """Return the number of fields"""
+        return len(ENTRY_KEYS)
+    
+    def __repr__(self):
+        """Show the entry like its dict form"""
+        return f"Entry({self.to_dict()!r})"
+
+
+def entry_to_json(value):
+    """json.dump default hook that serializes Entry objects as dicts"""
+    if isinstance(value, Entry):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# Guest Book Application - File Lock
+# This file contains the advisory lock that lets several processes share a guest book.
+
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # Windows has no fcntl, so the lock only guards threads of one process
+    fcntl = None
+
+class FileLock:
+    """Exclusive advisory lock on a lock file, held across processes with flock
+    
+    The lock also excludes other threads of this process and can be taken
+    again by the thread that holds it. Use it as a context manager.
+    """
+    
+    def __init__(self, path):
+        """Create a lock that uses the file at path (created when needed)"""
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._file = None
+        self._depth = 0
+    
+    def acquire(self):
+        """Block until this thread holds the lock"""
+        self._thread_lock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            try:
+                self._file = open(self.path, 'ab')
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            except OSError:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+    
+    def release(self):
+        """Release one level of the lock"""
+        self._depth -= 1
+        if self._depth == 0 and self._file is not None:
+            try:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            finally:
+                self._file.close()
+                self._file = None
+        self._thread_lock.release()
+    
+    def __enter__(self):
+        """Acquire the lock"""
+        self.acquire()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Release the lock"""
+        self.release()
@@ -5,14 +5,43 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import datetime
-from data_handler import DataHandler
+import time
+from collections import deque
+from data_handler import DataHandler, open_data_handler
+from date_index import parse_bound
+from query_cache import date_matcher, search_matcher
+from sort_index import id_order
+from change_events import ADDED, REMOVED
+from virtual_list import VirtualTreeview
+from io_worker import IOWorker
+from importer import import_file
+from exporter import export_entries, export_format
+from instrumentation import metrics, timed
+from performance_panel import PerformancePanel
 import os
 
+# Milliseconds between checks for changes made by other processes
+CHANGE_CHECK_INTERVAL = 2000
+
+# Milliseconds after the last keystroke before a live search runs
+SEARCH_DELAY = 150
+
+# Books up to this size are searched on the Tk thread, which stays well
+# within a frame; larger ones are searched on the search worker
+INLINE_SEARCH_LIMIT = 5000
+
+# Columns whose headings sort the entries, with their heading text
+SORT_COLUMNS = {"id": "ID", "name": "Name", "date": "Date"}
+
+# Entries in the newest entries view, and visitors in the top visitors list
+NEWEST_COUNT = 50
+TOP_VISITOR_COUNT = 10
+
 class GuestBookApp:
     """Main application class for the Guest Book"""
     
-    def __init__(self):
-        """Initialize the application"""
+    def __init__(self, data_handler=None):
+        """Initialize the application, on the default guest book unless a handler is given"""
         self.root = tk.Tk()
         self.root.title("Guest Book Application")
         self.root.geometry("800x600")
@@ -21,14 +50,52 @@ class GuestBookApp:
         # Set app icon using Unicode character (instead of an image file)
         self.root.iconbitmap("")  # Using default
         
-        # Initialize data handler
-        self.data_handler = DataHandler()
+        # Initialize data handler; changes are written by the I/O worker.
+        # The book is shared so several windows or processes can use it.
+        if data_handler is None:
+            data_handler = DataHandler(journal=True, auto_save=False, compact_entries=True,
+                                       shared=True)
+        self.data_handler = data_handler
+        self.loading = False
+        self._last_progress = 0
+        
+        # Returns the rows the treeview shows, so they can be refreshed
+        # when another process changes the book, and the predicate new
+        # entries must match to join them (None for every entry)
+        self.current_view = lambda: self.in_sort_order()
+        self.view_matches = None
+        
+        # The column the entries are sorted by (None for insertion order),
+        # and whether the view can take new entries at its end; top-k
+        # views such as the newest entries are read again instead
+        self.sort_column = None
+        self.sort_descending = False
+        self.view_appendable = True
+        
+        # Change events of the data handler, applied to the treeview on
+        # the Tk thread by apply_changes()
+        self._changes = deque()
+        self.data_handler.subscribe(self.on_data_changed)
+        
+        # Live search state: the pending debounce timer and a counter that
+        # tells results of superseded searches apart
+        self._search_job = None
+        self._search_generation = 0
+        
+        # The Performance window, while it is open
+        self.performance_panel = None
         
         # Setup GUI components
         self.setup_ui()
         
+        # Run disk operations off the Tk thread, and searches on a thread
+        # of their own so they never wait behind a save
+        self.io_worker = IOWorker(self.root, on_status=self.update_io_status)
+        self.search_worker = IOWorker(self.root)
+        
         # Load initial data
         self.refresh_entries()
+        self.root.after(CHANGE_CHECK_INTERVAL, self.watch_for_changes)
     
     def setup_ui(self):
         """Set up the user interface"""
@@ -49,7 +116,8 @@ class GuestBookApp:
         file_menu.add_command(label="Open Guest Book", command=self.open_guestbook)
         file_menu.add_command(label="Save As...", command=self.save_guestbook_as)
         file_menu.add_separator()
-        file_menu.add_command(label="Export to CSV", command=self.export_to_csv)
+        file_menu.add_command(label="Import...", command=self.import_entries)
+        file_menu.add_command(label="Export...", command=self.export_shown_entries)
         file_menu.add_separator()
         file_menu.add_command(label="Exit", command=self.root.quit)
         menubar.add_cascade(label="File", menu=file_menu)
@@ -59,8 +127,20 @@ class GuestBookApp:
         edit_menu.add_command(label="Clear All Entries", command=self.clear_all_entries)
         menubar.add_cascade(label="Edit", menu=edit_menu)
         
+        # View menu
+        view_menu = tk.Menu(menubar, tearoff=0)
+        view_menu.add_command(label="All Entries", command=self.refresh_entries)
+        view_menu.add_command(label=f"Newest {NEWEST_COUNT} Entries", command=self.show_newest_entries)
+        view_menu.add_command(label="Most Frequent Visitors", command=self.show_top_visitors)
+        menubar.add_cascade(label="View", menu=view_menu)
+        
         # Help menu
         help_menu = tk.Menu(menubar, tearoff=0)
+        help_menu.add_command(label="Performance", command=self.show_performance_panel)
+        help_menu.add_command(label="Start Profiling", command=self.toggle_profiling)
+        self.help_menu = help_menu
+        self.profile_menu_index = help_menu.index("end")
+        help_menu.add_separator()
         help_menu.add_command(label="About", command=self.show_about)
         menubar.add_cascade(label="Help", menu=help_menu)
         
@@ -147,7 +227,8 @@ class GuestBookApp:
         reset_button = ttk.Button(search_frame, text="Reset", command=self.refresh_entries)
         reset_button.pack(side=tk.LEFT, padx=5)
         
-        # Make Enter key trigger search when in search field
+        # Search while typing, and right away on Enter
+        self.search_var.trace_add("write", lambda *args: self.schedule_live_search())
         search_entry.bind('<Return>', lambda event: self.search_entries())
     
     def create_entries_display(self):
@@ -156,13 +237,19 @@ class GuestBookApp:
         display_frame = ttk.LabelFrame(self.main_frame, text="Guest Book Entries", padding="10")
         display_frame.grid(row=2, column=0, sticky="nsew", padx=5, pady=5)
         
-        # Add a treeview with scrollbars
-        self.tree = ttk.Treeview(display_frame, columns=("id", "name", "date", "message"), show="headings")
+        # Add a virtual treeview that only creates items for the visible rows
+        self.entries_view = VirtualTreeview(
+            display_frame,
+            columns=("id", "name", "date", "message"),
+            row_values=lambda entry: (entry['id'], entry['name'], entry['date'], entry['message']),
+            row_key=lambda entry: entry['id'],
+            on_change=self.update_page_label
+        )
+        self.tree = self.entries_view.tree
         
-        # Configure columns
-        self.tree.heading("id", text="ID")
-        self.tree.heading("name", text="Name")
-        self.tree.heading("date", text="Date")
+        # Configure columns; clicking a sortable heading sorts by it
+        for column, text in SORT_COLUMNS.items():
+            self.tree.heading(column, text=text, command=lambda column=column: self.sort_by_column(column))
         self.tree.heading("message", text="Message")
         
         # Configure column widths
@@ -172,9 +259,9 @@ class GuestBookApp:
         self.tree.column("message", width=400)
         
         # Add scrollbars
-        y_scrollbar = ttk.Scrollbar(display_frame, orient="vertical", command=self.tree.yview)
+        y_scrollbar = self.entries_view.scrollbar
         x_scrollbar = ttk.Scrollbar(display_frame, orient="horizontal", command=self.tree.xview)
-        self.tree.configure(yscrollcommand=y_scrollbar.set, xscrollcommand=x_scrollbar.set)
+        self.tree.configure(xscrollcommand=x_scrollbar.set)
         
         # Place elements in grid
         self.tree.grid(row=0, column=0, sticky="nsew")
@@ -185,36 +272,318 @@ class GuestBookApp:
         display_frame.columnconfigure(0, weight=1)
         display_frame.rowconfigure(0, weight=1)
         
+        # Add paging controls
+        self.create_page_controls(display_frame)
+        
         # Add right-click context menu
         self.create_context_menu()
     
+    def create_page_controls(self, parent):
+        """Create the page navigation bar below the entries"""
+        page_frame = ttk.Frame(parent)
+        page_frame.grid(row=2, column=0, columnspan=2, sticky="ew", pady=(5, 0))
+        
+        ttk.Button(page_frame, text="<< First", command=lambda: self.entries_view.scroll_to(0)).pack(side=tk.LEFT)
+        ttk.Button(page_frame, text="< Prev", command=lambda: self.entries_view.page(-1)).pack(side=tk.LEFT, padx=5)
+        ttk.Button(page_frame, text="Next >", command=lambda: self.entries_view.page(1)).pack(side=tk.LEFT)
+        ttk.Button(page_frame, text="Last >>", command=lambda: self.entries_view.scroll_to(
+            self.entries_view.last_offset())).pack(side=tk.LEFT, padx=5)
+        
+        # Jump to a row number
+        ttk.Label(page_frame, text="Go to row:").pack(side=tk.LEFT, padx=(20, 5))
+        self.goto_var = tk.StringVar()
+        goto_entry = ttk.Entry(page_frame, textvariable=self.goto_var, width=8)
+        goto_entry.pack(side=tk.LEFT)
+        goto_entry.bind('<Return>', lambda event: self.goto_row())
+        ttk.Button(page_frame, text="Go", command=self.goto_row).pack(side=tk.LEFT, padx=5)
+        
+        # Position and total count
+        self.page_var = tk.StringVar()
+        ttk.Label(page_frame, textvariable=self.page_var).pack(side=tk.RIGHT)
+        self.update_page_label()
+    
+    def update_page_label(self):
+        """Show which rows are visible out of how many"""
+        if not hasattr(self, "page_var"):
+            return
+        total = self.entries_view.total()
+        if total:
+            first = self.entries_view.first_visible() + 1
+            last = self.entries_view.last_visible()
+            self.page_var.set(f"Rows {first:,}-{last:,} of {total:,}")
+        else:
+            self.page_var.set("No rows")
+    
+    def goto_row(self):
+        """Scroll so the requested row number is at the top"""
+        try:
+            row = int(self.goto_var.get().replace(",", ""))
+        except ValueError:
+            messagebox.showerror("Error", "Row number must be a whole number")
+            return
+        self.entries_view.scroll_to(row - 1)
+    
+    def show_entries(self, entries, keep_position=False):
+        """Display a sequence of entries in the virtual treeview
+        
+        Lists are copied, as the treeview changes its rows in place when
+        entries are added or deleted.
+        """
+        if isinstance(entries, list):
+            entries = list(entries)
+        self.entries_view.set_rows(entries, keep_position=keep_position)
+    
+    def in_sort_order(self, entries=None):
+        """Return entries, or every entry when None, in the order the column headings chose"""
+        if self.sort_column is None:
+            return self.data_handler.get_all_entries() if entries is None else entries
+        return self.data_handler.sort_entries(self.sort_column, self.sort_descending, entries)
+    
+    def update_sort_headings(self):
+        """Mark the sorted column heading with the sort direction"""
+        for column, text in SORT_COLUMNS.items():
+            if column == self.sort_column:
+                text += " \u25bc" if self.sort_descending else " \u25b2"
+            self.tree.heading(column, text=text)
+    
+    @timed("gui.sort_by_column")
+    def sort_by_column(self, column):
+        """Sort the shown entries by a column heading
+        
+        The first click sorts ascending, the next descending and the third
+        goes back to insertion order. The current search, filter or top-k
+        view stays; its rows come in order from the data handler's sort
+        index, and the selection is kept.
+        """
+        if self.still_loading():
+            return
+        if column != self.sort_column:
+            self.sort_column, self.sort_descending = column, False
+        elif not self.sort_descending:
+            self.sort_descending = True
+        else:
+            self.sort_column = None
+        self.update_sort_headings()
+        
+        self._changes.clear()
+        self.show_entries(self.current_view(), keep_position=True)
+        self.entries_view.scroll_to(0)
+        
+        if self.sort_column is None:
+            self.status_var.set("Showing entries in the order they were added")
+        else:
+            direction = "descending" if self.sort_descending else "ascending"
+            self.status_var.set(f"Sorted by {SORT_COLUMNS[column].lower()} ({direction})")
+    
+    def on_data_changed(self, event, items):
+        """Queue a change event; it can arrive on any thread"""
+        self._changes.append((event, items))
+    
+    @timed("gui.apply_changes")
+    def apply_changes(self):
+        """Bring the treeview up to date with the queued change events
+        
+        New entries that match the current search or filter are appended
+        and deleted ones are dropped, so the rows around them are not
+        redrawn and the scroll position and selection stay. Clears,
+        reloads, sorted and top-k views and views that are not lists,
+        such as SQLite results, read the view again instead; sorted views
+        come from the sort indexes, so this does not sort anything. So do
+        views of older books with repeated IDs, as a removal only names
+        the ID and would take every row that shares it. While a search
+        runs on the worker the events wait for its results.
+        """
+        if self.loading or self.search_worker.busy():
+            return
+        view = self.entries_view
+        reread = (not isinstance(view.rows, list) or self.sort_column is not None or
+                  not self.view_appendable or not view.unique_keys())
+        added = []
+        removed = set()
+        while self._changes:
+            event, items = self._changes.popleft()
+            if reread:
+                continue
+            # Runs of the same event are applied together, in order
+            if event == ADDED:
+                if removed:
+                    view.remove_keys(removed)
+                    removed = set()
+                added.extend(items)
+            elif event == REMOVED:
+                if added:
+                    view.append_rows(filter(self.view_matches, added) if self.view_matches else added)
+                    added = []
+                removed.update(items)
+            else:
+                reread = True
+        
+        if reread:
+            self.show_entries(self.current_view(), keep_position=True)
+        elif added:
+            view.append_rows(filter(self.view_matches, added) if self.view_matches else added)
+        elif removed:
+            view.remove_keys(removed)
+    
     def create_context_menu(self):
         """Create context menu for treeview"""
         self.context_menu = tk.Menu(self.tree, tearoff=0)
-        self.context_menu.add_command(label="Delete Entry", command=self.delete_selected_entry)
+        self.context_menu.add_command(label="Delete Selected Entries", command=self.delete_selected_entries)
         
         # Bind right-click to show context menu
         self.tree.bind("<Button-3>", self.show_context_menu)
     
     def show_context_menu(self, event):
         """Show context menu on right-click"""
-        # Select the item under the mouse
+        # Select the item under the mouse unless it is part of the selection
         item = self.tree.identify_row(event.y)
         if item:
-            self.tree.selection_set(item)
+            if item not in self.tree.selection():
+                self.entries_view.select_only(item)
             self.context_menu.post(event.x_root, event.y_root)
     
     def create_status_bar(self):
         """Create a status bar at the bottom of the window"""
         self.status_var = tk.StringVar()
-        status_bar = ttk.Label(self.root, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W)
-        status_bar.pack(side=tk.BOTTOM, fill=tk.X)
+        status_frame = ttk.Frame(self.root, relief=tk.SUNKEN)
+        status_frame.pack(side=tk.BOTTOM, fill=tk.X)
+        status_bar = ttk.Label(status_frame, textvariable=self.status_var, anchor=tk.W)
+        status_bar.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        
+        # Background disk activity is shown on the right
+        self.io_status_var = tk.StringVar()
+        io_status = ttk.Label(status_frame, textvariable=self.io_status_var, anchor=tk.E)
+        io_status.pack(side=tk.RIGHT, padx=5)
+        
+        # How often searches and filters were answered from the query cache
+        self.cache_status_var = tk.StringVar()
+        cache_status = ttk.Label(status_frame, textvariable=self.cache_status_var, anchor=tk.E)
+        cache_status.pack(side=tk.RIGHT, padx=5)
         
         # Set initial status
         self.status_var.set("Ready")
     
+    def update_io_status(self, descriptions):
+        """Show the disk operations that are queued or running"""
+        if not descriptions:
+            self.io_status_var.set("")
+        elif len(descriptions) == 1:
+            self.io_status_var.set(f"{descriptions[0]}...")
+        else:
+            self.io_status_var.set(f"{descriptions[0]}... (+{len(descriptions) - 1} more)")
+    
+    def update_cache_status(self):
+        """Show the hit and miss counts of the query cache"""
+        stats = self.data_handler.cache_stats()
+        if stats is None or not stats.hits + stats.misses:
+            self.cache_status_var.set("")
+        else:
+            self.cache_status_var.set(f"Cache: {stats.hits:,} hits, {stats.misses:,} misses")
+    
+    def schedule_save(self):
+        """Write unsaved changes in the background
+        
+        Saves that are requested while one is still waiting in the queue
+        collapse into a single write.
+        """
+        self.io_worker.submit(
+            self.data_handler.flush,
+            description="Saving",
+            key=("save", id(self.data_handler)),
+            on_done=self.on_save_done,
+            on_error=self.on_save_done
+        )
+    
+    def on_save_done(self, result):
+        """Report a background save that did not succeed"""
+        if result is not True:
+            messagebox.showerror("Error", "Failed to save guest book")
+    
+    def set_data_handler(self, handler, status):
+        """Switch the window over to another guest book"""
+        old_handler = self.data_handler
+        old_handler.unsubscribe(self.on_data_changed)
+        self._changes.clear()
+        self.data_handler = handler
+        handler.subscribe(self.on_data_changed)
+        if self.loading:
+            self.show_entries([])
+        else:
+            self.refresh_entries()
+        self.status_var.set(status)
+        
+        # Changes made to the old book while the new one was loading are
+        # written before it is closed
+        self.io_worker.submit(old_handler.close, description="Closing")
+    
+    def load_guestbook(self, factory, file_path, status):
+        """Load a guest book in the background, showing entries as they arrive"""
+        self.schedule_save()
+        handler = factory(file_path, journal=True, auto_save=False, load=False,
+                          compact_entries=True, shared=True)
+        self.loading = True
+        self.set_data_handler(handler, f"Loading {file_path}...")
+        self.io_worker.submit(
+            handler.load_data,
+            description=f"Loading {os.path.basename(file_path)}",
+            on_progress=lambda *progress: self.on_load_progress(handler, *progress),
+            on_done=lambda result: self.on_load_done(handler, status),
+            on_error=lambda error: self.on_load_done(handler, f"Failed to open guest book: {error}")
+        )
+    
+    @timed("gui.on_load_progress")
+    def on_load_progress(self, handler, loaded, bytes_read, total_bytes, action="Loading"):
+        """Show the entries loaded so far, at most a few times per second"""
+        now = time.monotonic()
+        if handler is not self.data_handler or now - self._last_progress < 0.25:
+            return
+        self._last_progress = now
+        
+        self.entries_view.set_rows(handler.get_all_entries(), keep_position=True)
+        if total_bytes:
+            percent = min(100, bytes_read * 100 // total_bytes)
+            self.status_var.set(f"{action}... {percent}% ({loaded:,} entries)")
+        else:
+            self.status_var.set(f"{action}... ({loaded:,} entries)")
+    
+    def on_load_done(self, handler, status):
+        """Finish a background load"""
+        if handler is not self.data_handler:
+            return
+        self.loading = False
+        self.refresh_entries()
+        self.status_var.set(status)
+    
+    def watch_for_changes(self):
+        """Check the guest book for changes by other processes in the background"""
+        if not self.loading:
+            handler = self.data_handler
+            self.io_worker.submit(
+                handler.reload_changes,
+                key=("reload", id(handler)),
+                on_done=lambda changed: self.on_disk_changed(handler, changed)
+            )
+        self.root.after(CHANGE_CHECK_INTERVAL, self.watch_for_changes)
+    
+    @timed("gui.on_disk_changed")
+    def on_disk_changed(self, handler, changed):
+        """Update the treeview after another process changed the guest book"""
+        if not changed or handler is not self.data_handler or self.loading:
+            return
+        self.apply_changes()
+        self.status_var.set("Guest book updated with changes from another window or program")
+    
+    def still_loading(self):
+        """Tell the user to wait if a guest book is still being loaded"""
+        if self.loading:
+            self.status_var.set("Please wait until the guest book has finished loading or importing")
+        return self.loading
+    
     def add_entry(self):
         """Add a new entry from the form data"""
+        if self.still_loading():
+            return
+        
         name = self.name_var.get().strip()
         date = self.date_var.get().strip()
         message = self.message_text.get("1.0", tk.END).strip()
@@ -240,8 +609,9 @@ class GuestBookApp:
             messagebox.showerror("Error", "Invalid date format. Please use YYYY-MM-DD")
             return
         
-        # Add the entry
+        # Add the entry; it is saved in the background
         if self.data_handler.add_entry(name, message, date):
+            self.schedule_save()
             self.status_var.set(f"New entry added: {name}")
             
             # Clear form fields
@@ -249,67 +619,110 @@ class GuestBookApp:
             self.date_var.set(datetime.datetime.now().strftime("%Y-%m-%d"))
             self.message_text.delete("1.0", tk.END)
             
-            # Refresh entries display
-            self.refresh_entries()
+            # Show the entry if it matches the current view
+            self.apply_changes()
         else:
             messagebox.showerror("Error", "Failed to add entry")
     
+    @timed("gui.refresh_entries")
     def refresh_entries(self):
         """Refresh the entries displayed in the treeview"""
-        # Clear existing entries
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        if self.still_loading():
+            return
         
-        # Get all entries and add them to the treeview
-        entries = self.data_handler.get_all_entries()
+        # Get all entries and show them in the treeview; a search still
+        # running on the worker no longer applies, and queued changes
+        # are part of what is read now
+        self._search_generation += 1
+        self._changes.clear()
+        self.current_view = lambda: self.in_sort_order()
+        self.view_matches = None
+        self.view_appendable = True
+        entries = self.current_view()
+        self.show_entries(entries)
         
         if not entries:
             self.status_var.set("No entries found")
             return
         
-        # Add entries to treeview
-        for entry in entries:
-            self.tree.insert("", "end", values=(
-                entry['id'],
-                entry['name'],
-                entry['date'],
-                entry['message']
-            ))
-        
         self.status_var.set(f"Displaying {len(entries)} entries")
     
+    def schedule_live_search(self):
+        """Search shortly after the user stops typing"""
+        if self._search_job is not None:
+            self.root.after_cancel(self._search_job)
+        self._search_job = self.root.after(SEARCH_DELAY, self.search_entries)
+    
     def search_entries(self):
-        """Search entries based on the search query"""
+        """Search entries based on the search query
+        
+        Large books are searched on the search worker. A search that is
+        still queued when the next one starts is replaced by it, and the
+        results of a search that was overtaken are dropped.
+        """
+        if self._search_job is not None:
+            self.root.after_cancel(self._search_job)
+            self._search_job = None
+        self._search_generation += 1
+        
+        if self.still_loading():
+            return
+        
         query = self.search_var.get().strip()
         
         if not query:
             self.refresh_entries()
             return
         
-        # Clear existing entries
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
         # Search entries
-        results = self.data_handler.search_entries(query)
+        self._changes.clear()
+        self.current_view = lambda: self.in_sort_order(self.data_handler.search_entries(query))
+        self.view_matches = search_matcher(query)
+        self.view_appendable = True
+        handler = self.data_handler
+        if len(handler.get_all_entries()) <= INLINE_SEARCH_LIMIT:
+            self.show_search_results(query, handler.search_entries(query))
+            return
+        
+        generation = self._search_generation
+        
+        def on_done(results):
+            if generation == self._search_generation and handler is self.data_handler:
+                self.show_search_results(query, results)
+        
+        def on_error(error):
+            if generation == self._search_generation:
+                self.status_var.set(f"Search failed: {error}")
+        
+        self.status_var.set(f"Searching for '{query}'...")
+        self.search_worker.submit(
+            handler.search_entries,
+            query,
+            key="search",
+            on_done=on_done,
+            on_error=on_error
+        )
+    
+    @timed("gui.show_search_results")
+    def show_search_results(self, query, results):
+        """Show the results of a search in the treeview"""
+        self.update_cache_status()
+        self.show_entries(self.in_sort_order(results))
+        # Entries added or deleted while the search ran
+        self.apply_changes()
         
         if not results:
             self.status_var.set(f"No entries found for '{query}'")
             return
         
-        # Add search results to treeview
-        for entry in results:
-            self.tree.insert("", "end", values=(
-                entry['id'],
-                entry['name'],
-                entry['date'],
-                entry['message']
-            ))
-        
         self.status_var.set(f"Found {len(results)} entries matching '{query}'")
     
+    @timed("gui.filter_entries")
     def filter_entries(self):
         """Filter entries by date range"""
+        if self.still_loading():
+            return
+        
         start_date = self.filter_start_var.get().strip()
         end_date = self.filter_end_var.get().strip()
         
@@ -317,113 +730,317 @@ class GuestBookApp:
             messagebox.showerror("Error", "Start date is required for filtering")
             return
         
-        # Clear existing entries
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
         # Filter entries
-        results = self.data_handler.filter_by_date(start_date, end_date)
+        self._search_generation += 1
+        self._changes.clear()
+        self.current_view = lambda: self.in_sort_order(self.data_handler.filter_by_date(start_date, end_date))
+        self.view_appendable = True
+        try:
+            # The same range filter_by_date reads, for entries added later
+            self.view_matches = date_matcher(
+                parse_bound(start_date),
+                parse_bound(end_date or datetime.date.today(), end_of_day=True)
+            )
+        except ValueError:
+            self.view_matches = lambda entry: False
+        results = self.current_view()
+        self.update_cache_status()
+        self.show_entries(results)
         
         if not results:
             self.status_var.set("No entries found in the specified date range")
             return
         
-        # Add filtered results to treeview
-        for entry in results:
-            self.tree.insert("", "end", values=(
-                entry['id'],
-                entry['name'],
-                entry['date'],
-                entry['message']
-            ))
-        
         date_range = f"from {start_date}"
         if end_date:
             date_range += f" to {end_date}"
         
         self.status_var.set(f"Found {len(results)} entries {date_range}")
     
-    def delete_selected_entry(self):
-        """Delete the selected entry"""
-        selected_item = self.tree.selection()
+    @timed("gui.show_newest_entries")
+    def show_newest_entries(self):
+        """Show the most recent entries by date, newest first unless a column is sorted"""
+        if self.still_loading():
+            return
         
-        if not selected_item:
-            messagebox.showerror("Error", "No entry selected")
+        self._search_generation += 1
+        self._changes.clear()
+        self.current_view = lambda: self.in_sort_order(self.data_handler.latest_entries(NEWEST_COUNT))
+        self.view_matches = None
+        self.view_appendable = False
+        entries = self.current_view()
+        self.show_entries(entries)
+        
+        if not entries:
+            self.status_var.set("No entries found")
+            return
+        
+        self.status_var.set(f"Showing the {len(entries)} newest entries")
+    
+    def show_top_visitors(self):
+        """List the visitors who signed the guest book most often"""
+        if self.still_loading():
+            return
+        
+        visitors = self.data_handler.top_visitors(TOP_VISITOR_COUNT)
+        if not visitors:
+            messagebox.showinfo("Most Frequent Visitors", "The guest book has no entries yet")
+            return
+        
+        lines = [
+            f"{rank}. {name}: {count} {'entry' if count == 1 else 'entries'}"
+            for rank, (name, count) in enumerate(visitors, 1)
+        ]
+        messagebox.showinfo("Most Frequent Visitors", "\n".join(lines))
+    
+    def delete_selected_entries(self):
+        """Delete every selected entry, including rows scrolled out of view"""
+        if self.still_loading():
             return
         
-        # Get the ID of the selected entry
-        item_values = self.tree.item(selected_item, "values")
-        entry_id = int(item_values[0])
+        # Books can mix numeric and text IDs, which only sort by id_order
+        entry_ids = sorted(self.entries_view.selected, key=id_order)
+        
+        if not entry_ids:
+            messagebox.showerror("Error", "No entry selected")
+            return
         
         # Confirm deletion
-        if messagebox.askyesno("Confirm Deletion", "Are you sure you want to delete this entry?"):
-            if self.data_handler.delete_entry(entry_id):
-                self.status_var.set(f"Entry {entry_id} deleted")
-                self.refresh_entries()
+        if len(entry_ids) == 1:
+            question = "Are you sure you want to delete this entry?"
+        else:
+            question = f"Are you sure you want to delete these {len(entry_ids)} entries?"
+        if messagebox.askyesno("Confirm Deletion", question):
+            if self.data_handler.delete_entries(entry_ids):
+                self.schedule_save()
+                if len(entry_ids) == 1:
+                    self.status_var.set(f"Entry {entry_ids[0]} deleted")
+                else:
+                    self.status_var.set(f"{len(entry_ids)} entries deleted")
+                self.apply_changes()
             else:
-                messagebox.showerror("Error", "Failed to delete entry")
+                messagebox.showerror("Error", "Failed to delete entries")
     
     def new_guestbook(self):
         """Create a new guest book"""
         if messagebox.askyesno("New Guest Book", "Create a new guest book? This will clear all current entries."):
-            self.data_handler = DataHandler()
-            self.refresh_entries()
-            self.status_var.set("New guest book created")
+            self.load_guestbook(DataHandler, "guestbook_data.json", "New guest book created")
     
     def open_guestbook(self):
         """Open an existing guest book file"""
         file_path = filedialog.askopenfilename(
             title="Open Guest Book",
-            filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+            filetypes=[
+                ("JSON files", "*.json"),
+                ("SQLite databases", "*.db *.sqlite *.sqlite3"),
+                ("Partitioned guest books", "manifest.json"),
+                ("All files", "*.*")
+            ]
         )
         
         if file_path:
-            self.data_handler = DataHandler(file_path)
-            self.refresh_entries()
-            self.status_var.set(f"Opened guest book from {file_path}")
+            self.load_guestbook(open_data_handler, file_path, f"Opened guest book from {file_path}")
     
     def save_guestbook_as(self):
         """Save the guest book to a new file"""
         file_path = filedialog.asksaveasfilename(
             title="Save Guest Book As",
             defaultextension=".json",
-            filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+            filetypes=[
+                ("JSON files", "*.json"),
+                ("SQLite databases", "*.db *.sqlite *.sqlite3"),
+                ("All files", "*.*")
+            ]
         )
         
         if file_path:
-            # Update the data handler with the new file path
-            self.data_handler.file_path = file_path
+            # Save the data in the background and keep working on the new file
+            handler = self.data_handler
             
-            # Save the data
-            if self.data_handler.save_data():
-                self.status_var.set(f"Guest book saved to {file_path}")
-            else:
-                messagebox.showerror("Error", "Failed to save guest book")
+            def on_done(saved):
+                if not saved:
+                    messagebox.showerror("Error", "Failed to save guest book")
+                elif handler is self.data_handler and handler.file_path != file_path:
+                    # A database saved as JSON only wrote a copy, open it
+                    self.load_guestbook(open_data_handler, file_path, f"Guest book saved to {file_path}")
+                else:
+                    self.status_var.set(f"Guest book saved to {file_path}")
+            
+            self.io_worker.submit(
+                handler.save_as,
+                file_path,
+                description="Saving",
+                on_done=on_done
+            )
     
-    def export_to_csv(self):
-        """Export the guest book to a CSV file"""
+    def import_entries(self):
+        """Import entries from a CSV, JSON or JSON Lines file in the background"""
+        if self.still_loading():
+            return
+        
+        file_path = filedialog.askopenfilename(
+            title="Import Entries",
+            filetypes=[
+                ("Supported files", "*.csv *.json *.jsonl *.ndjson"),
+                ("CSV files", "*.csv"),
+                ("JSON files", "*.json"),
+                ("JSON Lines files", "*.jsonl *.ndjson"),
+                ("All files", "*.*")
+            ]
+        )
+        
+        if file_path:
+            handler = self.data_handler
+            
+            def finish(status):
+                # Batches imported before a failure are kept and saved
+                self.loading = False
+                self.schedule_save()
+                self.refresh_entries()
+                self.status_var.set(status)
+            
+            def on_done(result):
+                if handler is not self.data_handler:
+                    return
+                if result is None:
+                    finish(f"Failed to import {file_path}")
+                    messagebox.showerror("Error", f"Failed to import {file_path}")
+                else:
+                    finish(f"Imported {result.added:,} entries ({result.duplicates:,} duplicates "
+                           f"and {result.invalid:,} invalid rows skipped)")
+            
+            def on_error(error):
+                if handler is self.data_handler:
+                    finish(f"Failed to import {file_path}: {error}")
+            
+            self.loading = True
+            self.status_var.set(f"Importing {file_path}...")
+            self.io_worker.submit(
+                import_file,
+                handler,
+                file_path,
+                description=f"Importing {os.path.basename(file_path)}",
+                on_progress=lambda *progress: self.on_load_progress(handler, *progress, action="Importing"),
+                on_done=on_done,
+                on_error=on_error
+            )
+    
+    def export_shown_entries(self):
+        """Export the entries in the list, or just the selected ones, in the background
+        
+        Active searches and date filters carry over to the export. The
+        extension picks the format: .csv, .jsonl, .csv.gz or .jsonl.gz.
+        """
+        if self.still_loading():
+            return
+        
+        entries = self.current_view()
+        selected = self.entries_view.selected
+        if len(selected) > 1 and messagebox.askyesno(
+                "Export", f"Export only the {len(selected)} selected entries?"):
+            # In the order the list shows them, which also works for books
+            # that mix numeric and text IDs
+            entries = [entry for entry in entries if entry['id'] in selected]
+        
         file_path = filedialog.asksaveasfilename(
-            title="Export to CSV",
+            title="Export Entries",
             defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+            filetypes=[
+                ("CSV files", "*.csv"),
+                ("JSON Lines files", "*.jsonl"),
+                ("Compressed CSV files", "*.csv.gz"),
+                ("Compressed JSON Lines files", "*.jsonl.gz"),
+                ("All files", "*.*")
+            ]
         )
         
         if file_path:
-            if self.data_handler.export_to_csv(file_path):
-                self.status_var.set(f"Guest book exported to {file_path}")
-            else:
-                messagebox.showerror("Error", "Failed to export to CSV")
+            if export_format(file_path) is None:
+                messagebox.showerror("Error", "Please export to a .csv, .jsonl, .csv.gz or .jsonl.gz file")
+                return
+            
+            def on_done(exported):
+                if exported is None:
+                    messagebox.showerror("Error", f"Failed to export to {file_path}")
+                else:
+                    self.status_var.set(f"Exported {exported:,} entries to {file_path}")
+            
+            def on_error(error):
+                messagebox.showerror("Error", f"Failed to export to {file_path}: {error}")
+            
+            self.io_worker.submit(
+                export_entries,
+                entries,
+                file_path,
+                description=f"Exporting to {os.path.basename(file_path)}",
+                on_progress=self.on_export_progress,
+                on_done=on_done,
+                on_error=on_error
+            )
+    
+    def on_export_progress(self, exported, total):
+        """Show how far a background export is, at most a few times per second"""
+        now = time.monotonic()
+        if now - self._last_progress < 0.25:
+            return
+        self._last_progress = now
+        
+        if total:
+            self.status_var.set(f"Exporting... {exported * 100 // total}% ({exported:,} of {total:,} entries)")
     
     def clear_all_entries(self):
         """Clear all entries after confirmation"""
+        if self.still_loading():
+            return
+        
         if messagebox.askyesno("Clear All Entries", "Are you sure you want to clear all entries? This cannot be undone."):
-            self.data_handler.entries = []
-            if self.data_handler.save_data():
-                self.refresh_entries()
+            if self.data_handler.clear_all():
+                self.schedule_save()
+                self.apply_changes()
                 self.status_var.set("All entries cleared")
             else:
                 messagebox.showerror("Error", "Failed to clear entries")
     
+    def show_performance_panel(self):
+        """Open the Performance window, or bring it to the front if it is open"""
+        if self.performance_panel is not None and self.performance_panel.exists():
+            self.performance_panel.window.lift()
+            return
+        self.performance_panel = PerformancePanel(self.root)
+    
+    def toggle_profiling(self):
+        """Start a cProfile capture of the GUI thread, or stop it and save the result"""
+        if not metrics.profiling:
+            metrics.start_profile()
+            self.help_menu.entryconfigure(self.profile_menu_index, label="Stop Profiling")
+            self.status_var.set("Profiling... choose Help > Stop Profiling when done")
+            return
+        
+        self.help_menu.entryconfigure(self.profile_menu_index, label="Start Profiling")
+        file_path = filedialog.asksaveasfilename(
+            title="Save Profile",
+            defaultextension=".prof",
+            filetypes=[("Profile files", "*.prof"), ("All files", "*.*")]
+        )
+        summary = metrics.stop_profile(file_path or None)
+        if not file_path:
+            self.status_var.set("Profiling stopped")
+            return
+        
+        # The most expensive calls go next to the profile, for a quick
+        # look without other tools
+        summary_path = os.path.splitext(file_path)[0] + ".txt"
+        if summary_path == file_path:
+            summary_path = file_path + ".txt"
+        try:
+            with open(summary_path, 'w', encoding='utf-8') as file:
+                file.write(summary)
+        except IOError as e:
+            print(f"Error saving profile summary: {e}")
+            self.status_var.set(f"Profile saved to {file_path}")
+            return
+        self.status_var.set(f"Profile saved to {file_path}, summary in {summary_path}")
+    
     def show_about(self):
         """Show the about dialog"""
         messagebox.showinfo(
@@ -436,3 +1053,7 @@ class GuestBookApp:
     def run(self):
         """Run the application main loop"""
         self.root.mainloop()
+        
+        # Finish queued disk work and write any unsaved changes before exiting
+        self.io_worker.shutdown()
+        self.data_handler.close()
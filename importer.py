@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# Guest Book Application - Importer
+# This file contains the bulk import of entries from CSV, JSON and JSON Lines files.
+
+import csv
+import datetime
+import io
+import json
+import os
+from collections import namedtuple
+from date_index import parse_timestamp
+from json_stream import iter_json_array
+
+# File extensions the importer understands
+IMPORT_FORMATS = {
+    ".csv": "csv",
+    ".json": "json",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl"
+}
+
+ImportResult = namedtuple("ImportResult", ["added", "duplicates", "invalid"])
+
+def content_key(name, message, date):
+    """Return the key used to recognize duplicate entries
+    
+    The key is the content itself rather than its hash, so two distinct
+    rows whose hashes collide are never taken for duplicates. Names and
+    messages are shared with the entries, so the keys cost little more.
+    """
+    return (name, message, date)
+
+def _csv_rows(file):
+    """Yield (name, message, date) for each row of a CSV file with a header
+    
+    Columns are matched by header name, so files written by Export to CSV
+    (ID, Name, Date, Message) and hand-made sheets both work.
+    """
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.reader(text)
+        header = next(reader, None)
+        if header is None:
+            return
+        columns = {title.strip().lower(): i for i, title in enumerate(header)}
+        if "name" not in columns or "message" not in columns:
+            raise ValueError("CSV file needs a Name and a Message column")
+        
+        name_column, message_column = columns["name"], columns["message"]
+        date_column = columns.get("date")
+        for row in reader:
+            try:
+                date = row[date_column] if date_column is not None else None
+                yield row[name_column], row[message_column], date
+            except IndexError:
+                yield None
+    finally:
+        # Leave the binary file open for the caller
+        text.detach()
+
+def _json_fields(data):
+    """Return (name, message, date) from an entry object, or None"""
+    if not isinstance(data, dict):
+        return None
+    return data.get('name'), data.get('message'), data.get('date')
+
+def _json_rows(file):
+    """Yield (name, message, date) for each object of a JSON array"""
+    for data in iter_json_array(file):
+        yield _json_fields(data)
+
+def _jsonl_rows(file):
+    """Yield (name, message, date) for each line of a JSON Lines file"""
+    for line in file:
+        if not line.strip():
+            continue
+        try:
+            yield _json_fields(json.loads(line))
+        except ValueError:
+            yield None
+
+_ROW_READERS = {"csv": _csv_rows, "json": _json_rows, "jsonl": _jsonl_rows}
+
+def import_format(file_path):
+    """Return the import format for a file name, or None if it is not supported"""
+    return IMPORT_FORMATS.get(os.path.splitext(file_path)[1].lower())
+
+def import_file(handler, file_path, batch_size=10000, progress=None, pool=None):
+    """Import the entries of a CSV, JSON or JSON Lines file into a guest book
+    
+    The file is streamed and entries are added with handler.add_entries
+    in batches of batch_size, so each batch is saved in one write.
+    Every imported entry gets a new ID. Rows without a name or message
+    or with an unreadable date are skipped, rows without a date get the
+    time of the import, and rows whose name, message and date match an
+    entry already in the book (or earlier in the file) are skipped as
+    duplicates. progress, if given, is called with (entries added,
+    bytes read, total bytes) after each batch.
+    
+    With a ParallelPool as pool, the lines of large JSON Lines files are
+    parsed by its worker processes; checking and adding the rows stays
+    here, in file order.
+    
+    Returns an ImportResult, or None if the file could not be imported.
+    """
+    file_format = import_format(file_path)
+    if file_format is None:
+        print(f"Error importing {file_path}: unsupported file type")
+        return None
+    
+    seen = {content_key(entry['name'], entry['message'], entry['date'])
+            for entry in handler.get_all_entries()}
+    now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    valid_dates = {}    # date text -> whether it can be parsed
+    added = duplicates = invalid = 0
+    batch = []
+    
+    try:
+        with open(file_path, 'rb') as file:
+            total = os.fstat(file.fileno()).st_size
+            position = file.tell
+            rows = None
+            if pool is not None and file_format == "jsonl":
+                from parallel import JSON_LINE_BYTES
+                if pool.worth_it(total // JSON_LINE_BYTES):
+                    parsed = [0]    # bytes of the file the rows so far came from
+                    position = lambda: parsed[0]
+                    
+                    def parallel_rows():
+                        for chunk_rows, end in pool.json_lines(file_path):
+                            parsed[0] = end
+                            yield from chunk_rows
+                    rows = parallel_rows()
+            if rows is None:
+                rows = _ROW_READERS[file_format](file)
+            
+            def save_batch():
+                if not handler.add_entries(batch):
+                    raise IOError("could not save the imported entries")
+                if progress is not None:
+                    progress(added, position(), total)
+                batch.clear()
+            
+            for row in rows:
+                if row is None:
+                    invalid += 1
+                    continue
+                name, message, date = row
+                if not (isinstance(name, str) and name.strip() and
+                        isinstance(message, str) and message.strip()):
+                    invalid += 1
+                    continue
+                
+                # Sign-in sheets repeat the same dates, so each distinct
+                # date text is only parsed once
+                if not date:
+                    date = now
+                elif not isinstance(date, str):
+                    invalid += 1
+                    continue
+                else:
+                    valid = valid_dates.get(date)
+                    if valid is None:
+                        valid = valid_dates[date] = parse_timestamp(date) is not None
+                    if not valid:
+                        invalid += 1
+                        continue
+                
+                key = content_key(name, message, date)
+                if key in seen:
+                    duplicates += 1
+                    continue
+                seen.add(key)
+                
+                batch.append({"name": name, "message": message, "date": date})
+                added += 1
+                if len(batch) >= batch_size:
+                    save_batch()
+            save_batch()
+    except (ValueError, IOError) as e:
+        print(f"Error importing {file_path}: {e}")
+        return None
+    
+    return ImportResult(added, duplicates, invalid)
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# Guest Book Application - Instrumentation
+# This file contains the opt-in timing spans, counters and profiler behind the Performance panel.
+
+import datetime
+import functools
+import json
+import os
+import threading
+import time
+
+class Instrumentation:
+    """Collects timing spans and counters while enabled
+    
+    Spans record how often an operation ran and how long it took in total
+    and at most; counters add up quantities such as entries scanned or
+    bytes written. Nothing is recorded while disabled, and the timed()
+    wrappers then only check the enabled flag. All methods are thread-safe.
+    """
+    
+    def __init__(self):
+        """Create a disabled, empty set of metrics"""
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._spans = {}      # name -> [calls, total seconds, max seconds]
+        self._counters = {}   # name -> total
+        self._started = time.time()
+        self._profiler = None
+        self._dump_thread = None
+        self._dump_stop = None
+    
+    def enable(self):
+        """Start recording spans and counters"""
+        self.enabled = True
+    
+    def disable(self):
+        """Stop recording; what was recorded so far is kept"""
+        self.enabled = False
+    
+    def reset(self):
+        """Forget every span and counter"""
+        with self._lock:
+            self._spans.clear()
+            self._counters.clear()
+            self._started = time.time()
+    
+    def record(self, name, seconds):
+        """Add one run of the operation name that took seconds"""
+        with self._lock:
+            span = self._spans.get(name)
+            if span is None:
+                self._spans[name] = [1, seconds, seconds]
+            else:
+                span[0] += 1
+                span[1] += seconds
+                if seconds > span[2]:
+                    span[2] = seconds
+    
+    def count(self, name, amount=1):
+        """Add amount to the counter name"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+    
+    def snapshot(self):
+        """Return the spans and counters as a JSON-compatible dict"""
+        with self._lock:
+            spans = {
+                name: {
+                    "calls": calls,
+                    "total_ms": round(total * 1000, 3),
+                    "mean_ms": round(total * 1000 / calls, 3),
+                    "max_ms": round(longest * 1000, 3)
+                }
+                for name, (calls, total, longest) in sorted(self._spans.items())
+            }
+            counters = dict(sorted(self._counters.items()))
+            started = self._started
+        return {
+            "time": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "pid": os.getpid(),
+            "enabled": self.enabled,
+            "seconds_recorded": round(time.time() - started, 3),
+            "spans": spans,
+            "counters": counters
+        }
+    
+    def dump(self, file_path):
+        """Write a snapshot to a JSON file, replacing it in one step"""
+        tmp_path = f"{file_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w') as file:
+                json.dump(self.snapshot(), file, indent=4)
+            os.replace(tmp_path, file_path)
+            return True
+        except IOError as e:
+            print(f"Error writing metrics: {e}")
+            return False
+    
+    def start_dumps(self, file_path, interval=60):
+        """Enable recording and write a snapshot to file_path every interval seconds"""
+        self.stop_dumps()
+        self.enable()
+        stop = threading.Event()
+        
+        def run():
+            while not stop.wait(interval):
+                self.dump(file_path)
+            # One last snapshot so short runs leave a file behind
+            self.dump(file_path)
+        
+        self._dump_stop = stop
+        self._dump_thread = threading.Thread(target=run, name="guestbook-metrics", daemon=True)
+        self._dump_thread.start()
+    
+    def stop_dumps(self):
+        """Stop the periodic snapshots after writing a final one"""
+        if self._dump_thread is not None:
+            self._dump_stop.set()
+            self._dump_thread.join()
+            self._dump_thread = None
+            self._dump_stop = None
+    
+    @property
+    def profiling(self):
+        """True while a cProfile capture is running"""
+        return self._profiler is not None
+    
+    def start_profile(self):
+        """Start a cProfile capture of the calling thread"""
+        if self._profiler is None:
+            # Imported here, as the profiler modules slow down start-up
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+    
+    def stop_profile(self, file_path=None, limit=30):
+        """Stop the capture and return its most expensive functions as text
+        
+        The full statistics are saved to file_path if given, in the format
+        pstats and tools such as snakeviz read.
+        """
+        profiler = self._profiler
+        if profiler is None:
+            return ""
+        profiler.disable()
+        self._profiler = None
+        
+        if file_path:
+            try:
+                profiler.dump_stats(file_path)
+            except IOError as e:
+                print(f"Error saving profile: {e}")
+        
+        import io
+        import pstats
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(limit)
+        return output.getvalue()
+
+
+# The metrics shared by the data handlers, the server and the GUI
+metrics = Instrumentation()
+
+def timed(name):
+    """Decorate a function so each call is recorded as a span named name"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics.record(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+def tally(name, amount=1):
+    """Add amount to a counter when instrumentation is enabled"""
+    if metrics.enabled:
+        metrics.count(name, amount)
+
+def start_from_environment():
+    """Start periodic metrics snapshots if GUESTBOOK_METRICS_FILE is set
+    
+    GUESTBOOK_METRICS_INTERVAL sets the seconds between snapshots, 60 by
+    default. Returns True if the snapshots were started.
+    """
+    file_path = os.environ.get("GUESTBOOK_METRICS_FILE")
+    if not file_path:
+        return False
+    try:
+        interval = float(os.environ.get("GUESTBOOK_METRICS_INTERVAL", 60))
+    except ValueError:
+        print("Error: GUESTBOOK_METRICS_INTERVAL must be a number of seconds")
+        interval = 60
+    metrics.start_dumps(file_path, interval)
+    return True
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# Guest Book Application - I/O Worker
+# This file contains the background thread that runs disk operations for the GUI.
+
+import queue
+import threading
+
+class Job:
+    """A unit of work queued on the I/O worker"""
+    
+    def __init__(self, func, args, kwargs, description, key, on_done, on_error, on_progress):
+        """Store the callable and the callbacks that receive its outcome"""
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.description = description
+        self.key = key
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+
+
+class IOWorker:
+    """Runs disk operations on a background thread so Tk never blocks
+    
+    Jobs run one at a time in submission order. Their results, errors and
+    progress reports are handed back on the Tk thread by polling with
+    root.after, so callbacks may touch widgets freely.
+    """
+    
+    def __init__(self, root, poll_interval=50, on_status=None):
+        """Start the worker thread
+        
+        on_status is called on the Tk thread with the descriptions of the
+        jobs that are queued or running whenever that list changes.
+        """
+        self.root = root
+        self.poll_interval = poll_interval
+        self.on_status = on_status
+        
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+        self._queued = {}        # key -> job that has not started yet
+        self._outstanding = []   # jobs queued or running, in order
+        self._polling = False
+        
+        self._thread = threading.Thread(target=self._run, name="guestbook-io", daemon=True)
+        self._thread.start()
+    
+    def submit(self, func, *args, description="", key=None,
+               on_done=None, on_error=None, on_progress=None, **kwargs):
+        """Queue func(*args, **kwargs) to run on the worker thread
+        
+        Jobs that share a key collapse: if a job with the same key is still
+        waiting, it is replaced by this one instead of queuing another run.
+        When on_progress is given, func receives a progress keyword argument
+        it can call from the worker thread to report progress.
+        """
+        job = Job(func, args, kwargs, description, key, on_done, on_error, on_progress)
+        with self._lock:
+            waiting = self._queued.get(key) if key is not None else None
+            if waiting is not None:
+                # Reuse the queued slot so the write happens once
+                waiting.__dict__.update(job.__dict__)
+                return
+            if key is not None:
+                self._queued[key] = job
+            self._outstanding.append(job)
+        self._jobs.put(job)
+        
+        self._report_status()
+        self._start_polling()
+    
+    def busy(self):
+        """Return True while jobs are queued or running"""
+        with self._lock:
+            return bool(self._outstanding)
+    
+    def descriptions(self):
+        """Return the descriptions of queued and running jobs"""
+        with self._lock:
+            return [job.description for job in self._outstanding if job.description]
+    
+    def shutdown(self):
+        """Run every queued job, then stop the worker thread"""
+        self._jobs.put(None)
+        self._thread.join()
+    
+    def _run(self):
+        """Worker thread loop"""
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            
+            with self._lock:
+                if job.key is not None and self._queued.get(job.key) is job:
+                    del self._queued[job.key]
+            
+            kwargs = dict(job.kwargs)
+            if job.on_progress is not None:
+                kwargs["progress"] = lambda *values, job=job: self._results.put((job, "progress", values))
+            
+            try:
+                result = job.func(*job.args, **kwargs)
+                self._results.put((job, "done", result))
+            except Exception as e:
+                self._results.put((job, "error", e))
+    
+    def _start_polling(self):
+        """Begin delivering results on the Tk thread"""
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_interval, self._poll)
+    
+    def _poll(self):
+        """Deliver finished work and keep polling while jobs are outstanding"""
+        self._deliver()
+        if self.busy() or not self._results.empty():
+            self.root.after(self.poll_interval, self._poll)
+        else:
+            self._polling = False
+    
+    def _deliver(self):
+        """Run the callbacks for every result that has arrived"""
+        while True:
+            try:
+                job, kind, value = self._results.get_nowait()
+            except queue.Empty:
+                return
+            
+            if kind == "progress":
+                job.on_progress(*value)
+                continue
+            
+            with self._lock:
+                self._outstanding.remove(job)
+            if kind == "done" and job.on_done is not None:
+                job.on_done(value)
+            elif kind == "error":
+                if job.on_error is not None:
+                    job.on_error(value)
+                else:
+                    print(f"Error in background job '{job.description}': {value}")
+            self._report_status()
+    
+    def _report_status(self):
+        """Tell the status callback which jobs are outstanding"""
+        if self.on_status is not None:
+            self.on_status(self.descriptions())
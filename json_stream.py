@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# Guest Book Application - JSON Streaming
+# This file contains an incremental parser for large JSON guest book files.
+
+import codecs
+import json
+import os
+import re
+
+# Refuse to buffer more than this much text for a single array element
+MAX_ELEMENT_SIZE = 16 * 1024 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = _WHITESPACE + ",]"
+# Matching the whitespace with a regular expression skips it at C speed,
+# as the json module itself does
+_skip_whitespace = re.compile(r"[ \t\n\r]*").match
+_separator = re.compile(r"[ \t\n\r]*([,\]])[ \t\n\r]*").match
+
+class _Reader:
+    """Decodes a binary file chunk by chunk into a growing text buffer"""
+    
+    def __init__(self, file, chunk_size, digest, progress):
+        """Wrap a file opened in binary mode"""
+        self.file = file
+        self.chunk_size = chunk_size
+        self.digest = digest
+        self.progress = progress
+        self.decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.bytes_read = 0
+        try:
+            self.total = os.fstat(file.fileno()).st_size
+        except (AttributeError, OSError, ValueError):
+            self.total = None
+    
+    def fill(self):
+        """Append the next chunk to the buffer, return False at end of file"""
+        if self.eof:
+            return False
+        chunk = self.file.read(self.chunk_size)
+        if self.digest is not None:
+            self.digest.update(chunk)
+        self.bytes_read += len(chunk)
+        self.eof = not chunk
+        
+        # Drop text that has already been parsed before growing the buffer
+        if self.pos:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        self.buffer += self.decoder.decode(chunk, final=self.eof)
+        
+        if self.progress is not None:
+            self.progress(self.bytes_read, self.total)
+        return not self.eof or bool(self.buffer)
+    
+    def skip_whitespace(self):
+        """Advance past whitespace and return the next character ('' at end)"""
+        while True:
+            buffer = self.buffer
+            pos = self.pos = _skip_whitespace(buffer, self.pos).end()
+            if pos < len(buffer):
+                return buffer[pos]
+            if not self.fill():
+                return ""
+    
+    def decode_value(self):
+        """Decode the JSON value that starts at the current position"""
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+                # A value cut off by the end of the buffer (such as "12"
+                # of "12.5") only counts once a delimiter follows it
+                if self.eof or (end < len(self.buffer) and self.buffer[end] in _DELIMITERS):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                if len(self.buffer) - self.pos > MAX_ELEMENT_SIZE:
+                    raise ValueError("JSON array element is too large to stream")
+            self.fill()
+
+
+def iter_json_array(file, chunk_size=1 << 16, digest=None, progress=None):
+    """Yield the elements of the top-level JSON array in a binary file
+    
+    Only about chunk_size bytes plus the element being parsed are held in
+    memory at once, instead of the whole text and object graph that
+    json.load needs. digest, if given, is updated with every byte read
+    (for example a hashlib object). progress is called with
+    (bytes read, total bytes) after each chunk; total is None when the
+    size of the file is unknown.
+    
+    Raises json.JSONDecodeError (a ValueError) on malformed input.
+    """
+    reader = _Reader(file, chunk_size, digest, progress)
+    
+    if reader.skip_whitespace() != "[":
+        raise json.JSONDecodeError("Expecting '['", reader.buffer, reader.pos)
+    reader.pos += 1
+    
+    if reader.skip_whitespace() == "]":
+        reader.pos += 1
+    else:
+        while True:
+            yield reader.decode_value()
+            
+            # Usually the separator and the start of the next element are
+            # in the buffer already and are matched in one go
+            match = _separator(reader.buffer, reader.pos)
+            if match is not None and match.end() < len(reader.buffer):
+                reader.pos = match.end()
+                if match.group(1) == "]":
+                    break
+                continue
+            
+            separator = reader.skip_whitespace()
+            reader.pos += 1
+            if separator == "]":
+                break
+            if separator != ",":
+                raise json.JSONDecodeError("Expecting ',' delimiter", reader.buffer, reader.pos - 1)
+            reader.skip_whitespace()
+    
+    if reader.skip_whitespace():
+        raise json.JSONDecodeError("Extra data", reader.buffer, reader.pos)
@@ -2,8 +2,36 @@
 # Guest Book Application - Main Entry Point
 # This file serves as the entry point for the guest book application.
 
-from guestbook import GuestBookApp
+import sys
+from instrumentation import metrics, start_from_environment
+
+def main():
+    """Start the GUI, the HTTP server with `main.py serve`, or run a command
+    
+    The commands (add, search, filter, delete, export, stats, compact) are
+    listed by `main.py --help` and print JSON Lines.
+    
+    Set GUESTBOOK_METRICS_FILE to collect metrics and write them to that
+    file every GUESTBOOK_METRICS_INTERVAL seconds.
+    """
+    start_from_environment()
+    try:
+        if len(sys.argv) > 1 and sys.argv[1] == "serve":
+            # The server runs headless, so tkinter is never imported
+            from server import main as serve
+            serve(sys.argv[2:])
+            return
+        if len(sys.argv) > 1:
+            # So are the commands, which only import the data handlers
+            from cli import main as run_command
+            sys.exit(run_command(sys.argv[1:]))
+        
+        from guestbook import GuestBookApp
+        app = GuestBookApp()
+        app.run()
+    finally:
+        # Write the final snapshot
+        metrics.stop_dumps()
 
 if __name__ == "__main__":
-    app = GuestBookApp()
-    app.run()
+    main()
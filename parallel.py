@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+# Guest Book Application - Parallel Processing
+# This file contains the process pool that spreads scans, index builds, exports and imports of very large books over several cores.
+
+import gzip
+import io
+import json
+import multiprocessing
+import os
+import threading
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from operator import attrgetter, itemgetter
+from entry import Entry
+from search_index import entry_trigrams
+
+# Books below this many entries are processed on the calling thread, as
+# starting the work in other processes costs more than it saves
+PARALLEL_MIN_ENTRIES = 200000
+
+# Each worker gets this many chunks, so a slow chunk does not hold up the rest
+CHUNKS_PER_WORKER = 4
+
+# Fields of a packed entry are separated by NUL, entries by the ASCII
+# record separator; entries containing either are never packed
+FIELD_SEPARATOR = "\x00"
+RECORD_SEPARATOR = "\x1e"
+
+# Rough size of a JSON Lines entry, to tell from a file size whether a
+# parallel import pays off
+JSON_LINE_BYTES = 120
+
+# Column order of CSV exports, as in exporter.CSV_HEADER
+CSV_HEADER = "ID,Name,Date,Message\r\n"
+
+
+class SharedEntries:
+    """Entries packed into one block of shared memory for the worker processes
+    
+    Each chunk holds the text fields of its entries as UTF-8, separated by
+    NUL and RS characters, and optionally their IDs as an array of 64-bit
+    integers. Workers attach to the block by name and decode only their
+    own chunk instead of receiving pickled entries. Raises ValueError for
+    entries that cannot be packed: fields that are not text, text that
+    contains a separator, or IDs that are not integers.
+    """
+    
+    def __init__(self, entries, chunk_count, fields=("name", "message"), ids=False):
+        """Pack the fields (and IDs) of the entries in at most chunk_count chunks"""
+        size = -(-len(entries) // max(1, chunk_count))
+        blocks = []
+        self.fields = fields
+        self.chunks = []        # (text offset, text end, first entry, entries, ID offset or None)
+        offset = 0
+        for first in range(0, len(entries), size):
+            batch = entries[first:first + size]
+            text = _pack_text(batch, fields)
+            # Separators inside the text would split an entry in two
+            if (text.count(FIELD_SEPARATOR) != (len(fields) - 1) * len(batch) or
+                    text.count(RECORD_SEPARATOR) != len(batch) - 1):
+                raise ValueError("entries containing separator characters cannot be packed")
+            data = text.encode("utf-8")
+            
+            id_offset = offset + len(data)
+            if ids:
+                entry_ids = list(_field_getter(batch, "id"))
+                # bool is an int too, but the exporters write it as true/false
+                if set(map(type, entry_ids)) - {int}:
+                    raise ValueError("entries with IDs that are not integers cannot be packed")
+                try:
+                    data += array('q', entry_ids).tobytes()
+                except OverflowError:
+                    raise ValueError("entries with IDs that do not fit 64 bits cannot be packed")
+            blocks.append(data)
+            self.chunks.append((offset, id_offset, first, len(batch), id_offset if ids else None))
+            offset += len(data)
+        
+        self.memory = SharedMemory(create=True, size=max(1, offset))
+        for chunk, data in zip(self.chunks, blocks):
+            self.memory.buf[chunk[0]:chunk[0] + len(data)] = data
+        self.name = self.memory.name
+    
+    def close(self):
+        """Release and remove the shared memory block"""
+        self.memory.close()
+        self.memory.unlink()
+    
+    def __enter__(self):
+        """Use the packed entries in a with block"""
+        return self
+    
+    def __exit__(self, *exc_info):
+        """Remove the block when the with block ends"""
+        self.close()
+
+
+def _field_getter(batch, *fields):
+    """Map the entries of a batch to the values of some fields, at C speed"""
+    # Compact entries are read by attribute, which skips their Mapping lookups
+    if all(type(entry) is Entry for entry in batch):
+        return map(attrgetter(*fields), batch)
+    return map(itemgetter(*fields), batch)
+
+def _pack_text(batch, fields):
+    """Return the text fields of a batch joined with the separators"""
+    try:
+        if len(fields) == 1:
+            return RECORD_SEPARATOR.join(_field_getter(batch, *fields))
+        return RECORD_SEPARATOR.join(map(FIELD_SEPARATOR.join, _field_getter(batch, *fields)))
+    except TypeError:
+        raise ValueError("entries with fields that are not text cannot be packed")
+
+def _records(name, chunk):
+    """Return the text records of one chunk, and its IDs if it has them"""
+    start, end, first, count, id_offset = chunk
+    # Workers share the resource tracker of the pool's process, so the
+    # block stays registered once and is removed by its creator
+    memory = SharedMemory(name=name)
+    try:
+        text = bytes(memory.buf[start:end]).decode("utf-8")
+        ids = array('q')
+        if id_offset is not None:
+            ids.frombytes(memory.buf[id_offset:id_offset + 8 * count])
+    finally:
+        memory.close()
+    return (text.split(RECORD_SEPARATOR) if count else []), ids
+
+def _search_chunk(name, chunk, query):
+    """Return the positions of the entries in a chunk whose name or message contains query"""
+    records, ids = _records(name, chunk)
+    hits = array('i')
+    for position, record in enumerate(records, chunk[2]):
+        # The NUL between name and message keeps matches from spanning
+        # both, so this is the same check as the search index makes
+        if query in record.lower():
+            hits.append(position)
+    return hits.tobytes()
+
+def _trigram_chunk(name, chunk):
+    """Return the posting lists of the entries in a chunk as trigram -> array bytes"""
+    records, ids = _records(name, chunk)
+    postings = {}
+    for doc, record in enumerate(records, chunk[2]):
+        name_text, message = record.split(FIELD_SEPARATOR)
+        for gram in entry_trigrams(name_text, message):
+            docs = postings.get(gram)
+            if docs is None:
+                postings[gram] = array('i', (doc,))
+            else:
+                docs.append(doc)
+    return {gram: docs.tobytes() for gram, docs in postings.items()}
+
+def _export_chunk(name, chunk, file_format):
+    """Return the entries of a chunk encoded in an export format, compressed for .gz"""
+    records, ids = _records(name, chunk)
+    rows = map(str.split, records, [FIELD_SEPARATOR] * len(records))
+    if file_format.startswith("csv"):
+        import csv
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows((entry_id, name_text, date, message)
+                                     for entry_id, (name_text, message, date) in zip(ids, rows))
+        text = buffer.getvalue()
+    else:
+        encode = json.JSONEncoder().encode
+        text = "".join(
+            encode({"id": entry_id, "name": name_text, "message": message, "date": date}) + "\n"
+            for entry_id, (name_text, message, date) in zip(ids, rows)
+        )
+    data = text.encode("utf-8")
+    # Each chunk becomes a gzip member; a file of several members reads
+    # back as their concatenation
+    return gzip.compress(data, compresslevel=6) if file_format.endswith(".gz") else data
+
+def _json_lines_chunk(file_path, start, end):
+    """Return (name, message, date) or None for each line in a byte range of a JSON Lines file"""
+    from importer import _json_fields
+    with open(file_path, 'rb') as file:
+        file.seek(start)
+        lines = file.read(end - start).split(b"\n")
+    rows = []
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            rows.append(_json_fields(json.loads(line)))
+        except ValueError:
+            rows.append(None)
+    return rows
+
+
+class ParallelPool:
+    """A pool of worker processes for the work on very large books
+    
+    Entries are split into chunks that are packed into shared memory and
+    handed to a ProcessPoolExecutor; the results come back in the order of
+    the chunks, so they merge in insertion order. Work on fewer than
+    min_entries entries is left to the caller, which does it on its own
+    thread. The workers are started on first use.
+    """
+    
+    def __init__(self, workers=None, min_entries=PARALLEL_MIN_ENTRIES):
+        """Create a pool of worker processes, one per core by default"""
+        self.workers = workers or os.cpu_count() or 1
+        self.min_entries = min_entries
+        self._executor = None
+        self._lock = threading.Lock()
+    
+    def worth_it(self, count):
+        """Return True if count entries are enough to process in parallel"""
+        return self.workers > 1 and count >= self.min_entries
+    
+    def _pool(self):
+        """Return the executor, starting it on first use"""
+        with self._lock:
+            if self._executor is None:
+                # Forking a process that runs threads, like the GUI, can
+                # deadlock, so workers start from a clean interpreter
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            return self._executor
+    
+    def _map(self, func, shared, *args):
+        """Run func on every chunk of the packed entries and return the results in order"""
+        count = len(shared.chunks)
+        return self._pool().map(func, [shared.name] * count, shared.chunks, *([arg] * count for arg in args))
+    
+    def pack(self, entries, fields=("name", "message"), ids=False):
+        """Pack entries into shared memory, as many chunks as the workers take"""
+        return SharedEntries(entries, self.workers * CHUNKS_PER_WORKER, fields, ids)
+    
+    def search(self, entries, query):
+        """Return the entries whose name or message contains query, in order
+        
+        Matches are exactly those of SearchIndex.search. Raises ValueError
+        if the entries cannot be packed.
+        """
+        query = query.lower()
+        if FIELD_SEPARATOR in query or RECORD_SEPARATOR in query:
+            raise ValueError("queries with separator characters cannot be searched in parallel")
+        with self.pack(entries) as shared:
+            results = []
+            for data in self._map(_search_chunk, shared, query):
+                hits = array('i')
+                hits.frombytes(data)
+                results.extend(map(entries.__getitem__, hits))
+        return results
+    
+    def trigram_postings(self, entries):
+        """Return the search index posting lists of the entries, one dict per chunk
+        
+        Document numbers are positions in entries, and the dicts come in
+        entry order, so SearchIndex.merge_postings can append them.
+        """
+        with self.pack(entries) as shared:
+            return list(self._map(_trigram_chunk, shared))
+    
+    def export_blocks(self, entries, file_format):
+        """Pack entries and return an iterator of (bytes, entries so far) in an export format
+        
+        The blocks are written to a binary file one after another; for the
+        .gz formats each block is a compressed gzip member. Raises
+        ValueError right away if the entries cannot be packed.
+        """
+        if not file_format.startswith("csv") and not all(type(entry) is Entry for entry in entries):
+            # JSON Lines writes every key of an entry in its own order, which
+            # only compact entries are sure to share with the packed fields
+            raise ValueError("only compact entries are exported to JSON Lines in parallel")
+        shared = self.pack(entries, ("name", "message", "date"), ids=True)
+        
+        def blocks():
+            try:
+                if file_format.startswith("csv"):
+                    header = CSV_HEADER.encode("utf-8")
+                    yield (gzip.compress(header, compresslevel=6) if file_format.endswith(".gz") else header), 0
+                done = 0
+                chunk_sizes = [chunk[3] for chunk in shared.chunks]
+                for data, count in zip(self._map(_export_chunk, shared, file_format), chunk_sizes):
+                    done += count
+                    yield data, done
+            finally:
+                shared.close()
+        return blocks()
+    
+    def json_lines(self, file_path):
+        """Yield (rows, bytes read) for each chunk of a JSON Lines file, in file order
+        
+        The workers read their byte range of the file themselves, so the
+        file is the shared buffer. Rows are (name, message, date) tuples,
+        or None for lines that are not JSON.
+        """
+        total = os.path.getsize(file_path)
+        chunk_count = self.workers * CHUNKS_PER_WORKER
+        bounds = [0]
+        with open(file_path, 'rb') as file:
+            for i in range(1, chunk_count):
+                # Each range ends after the line that crosses its nominal end
+                file.seek(max(total * i // chunk_count, bounds[-1]))
+                file.readline()
+                if file.tell() >= total:
+                    break
+                if file.tell() > bounds[-1]:
+                    bounds.append(file.tell())
+        bounds.append(total)
+        
+        starts, ends = bounds[:-1], bounds[1:]
+        results = self._pool().map(_json_lines_chunk, [file_path] * len(starts), starts, ends)
+        for rows, end in zip(results, ends):
+            yield rows, end
+    
+    def shutdown(self):
+        """Stop the worker processes"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
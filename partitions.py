@@ -0,0 +1,1021 @@
+#!/usr/bin/env python3
+# Guest Book Application - Partitioned Storage
+# This file contains a data handler that keeps a guest book in one file per month and opens old months on demand.
+
+import datetime
+import gzip
+import heapq
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from itertools import islice
+from collections.abc import Sequence
+from contextlib import nullcontext
+from data_handler import DataHandler, open_data_handler
+from date_index import pack_timestamp, parse_bound, parse_timestamp
+from entry import format_timestamp
+from exporter import export_entries
+from file_lock import FileLock
+from instrumentation import timed
+from change_events import ChangeEvents, ADDED, REMOVED, CLEARED, RELOADED
+from query_cache import CacheStats, search_matcher
+from sort_index import SORT_KEYS, top_entries, top_visitors
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+# Packed YYYYMMDDhhmmss timestamps divided by these give YYYYMM or YYYY
+GRANULARITIES = {"month": 10 ** 8, "year": 10 ** 10}
+
+# Entries whose date cannot be parsed share a partition of their own
+UNDATED = "undated"
+
+def partition_key(date, granularity="month"):
+    """Return the partition an entry date belongs to, such as "2023-06" or "2023" """
+    timestamp = parse_timestamp(date) if isinstance(date, str) else date
+    if timestamp is None:
+        return UNDATED
+    period = timestamp // GRANULARITIES[granularity]
+    if granularity == "year":
+        return f"{period:04d}"
+    return f"{period // 100:04d}-{period % 100:02d}"
+
+
+class AllEntries(Sequence):
+    """Every entry of a partitioned book, read one partition at a time
+    
+    Open partitions contribute their entries from memory; the others are
+    read from disk while they are iterated and dropped afterwards, so
+    exporting a large book never holds more than one old partition.
+    Indexes and slices read only the partitions they fall in, found from
+    the entry counts, and the last partition read is kept for the next
+    lookup.
+    """
+    
+    def __init__(self, handler):
+        """Remember the partitions as they are now"""
+        self.handler = handler
+        with handler._lock:
+            self._keys = handler.partition_keys()
+            self._counts = [handler._partition_count(key) for key in self._keys]
+        self._total = sum(self._counts)
+        self._loaded = (None, None)     # key and entries of the last partition looked up
+    
+    def __len__(self):
+        """Return the number of entries according to the manifest"""
+        return self._total
+    
+    def _partition(self, key):
+        """Return the entries of a partition, reading it unless it was the last one"""
+        if self._loaded[0] != key:
+            self._loaded = (key, self.handler._read_partition(key))
+        return self._loaded[1]
+    
+    def __getitem__(self, index):
+        """Return one entry or a list of entries"""
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._total)
+            if step < 0:
+                return list(self)[index]
+            return list(islice(self._iter_from(start), 0, max(0, stop - start), step))
+        
+        if index < 0:
+            index += self._total
+        if 0 <= index < self._total:
+            for key, count in zip(self._keys, self._counts):
+                if index < count:
+                    entries = self._partition(key)
+                    if index < len(entries):
+                        return entries[index]
+                    break
+                index -= count
+        raise IndexError("entry index out of range")
+    
+    def _iter_from(self, start):
+        """Yield the entries from an index on, skipping the partitions before it"""
+        for key, count in zip(self._keys, self._counts):
+            if start >= count:
+                start -= count
+                continue
+            yield from islice(self.handler._read_partition(key), start, None)
+            start = 0
+    
+    def __iter__(self):
+        """Yield the entries partition by partition"""
+        for key in self._keys:
+            yield from self.handler._read_partition(key)
+
+
+class PartitionedDataHandler:
+    """Keeps a guest book in one file per month (or year) with a manifest
+    
+    The book is a directory holding a manifest.json and one partition per
+    period, each an ordinary journaled DataHandler file. The manifest
+    records every partition's entry count, date bounds and ID range, so
+    only the newest active_partitions periods are loaded on start-up and
+    date filters open just the partitions that overlap the range. Older
+    partitions opened on demand are kept in a small LRU of
+    cached_partitions and closed again when it overflows.
+    
+    The entry list (get_all_entries and search_entries) covers the active
+    partitions; search_all_entries, date filters, latest_entries,
+    count_by_day, get_entry and deletions reach every partition. IDs are handed out book-wide from the
+    manifest, so they stay unique across partitions. Partitions can be
+    archived, which compresses them and keeps them out of the active
+    window while they stay readable and writable.
+    
+    The other options (journal, auto_save, compact_entries, shared and so
+    on) have the same meaning as for DataHandler and apply to every
+    partition; a number of parallel workers starts one process pool that
+    every partition shares.
+    """
+    
+    def __init__(self, file_path="guestbook_parts", granularity="month", active_partitions=3,
+                 cached_partitions=6, load=True, **options):
+        """Open or create the partitioned book in the directory file_path
+        
+        file_path may also name the manifest inside the directory.
+        granularity ("month" or "year") only applies to new books; existing
+        books keep the granularity in their manifest.
+        """
+        if os.path.basename(file_path) == MANIFEST_NAME:
+            file_path = os.path.dirname(file_path) or "."
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+        self.file_path = file_path
+        self.granularity = granularity
+        self.active_partitions = active_partitions
+        self.cached_partitions = cached_partitions
+        self.auto_save = options.pop("auto_save", True)
+        self.shared = options.get("shared", False)
+        self._owns_parallel = isinstance(options.get("parallel"), int) and options["parallel"] > 0
+        if self._owns_parallel:
+            from parallel import ParallelPool
+            options["parallel"] = ParallelPool(None if options["parallel"] is True else options["parallel"])
+        self.parallel = options.get("parallel") or None
+        self.options = options
+        
+        # _lock guards the manifest and the partition maps; partitions
+        # have locks of their own and are written outside of it
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._manifest_lock = None
+        self._manifest_stat = None
+        self._partitions = {}            # key -> open DataHandler
+        self._active = set()             # keys that stay open
+        self._recent = OrderedDict()     # keys opened on demand, least recent first
+        self._changed = set()            # keys whose manifest record is out of date
+        self._info = {}                  # key -> manifest record
+        self._next_id = 1
+        self._manifest_dirty = False
+        self.changes = ChangeEvents()
+        
+        if load:
+            self.load_data()
+    
+    @property
+    def manifest_path(self):
+        """Path of the manifest file"""
+        return os.path.join(self.file_path, MANIFEST_NAME)
+    
+    @property
+    def entries(self):
+        """The entries of the active partitions, oldest partition first"""
+        return self.get_all_entries()
+    
+    def _process_lock(self):
+        """Return the lock that keeps other processes out of the manifest"""
+        if not self.shared:
+            return nullcontext()
+        if self._manifest_lock is None or self._manifest_lock.path != self.manifest_path + ".lock":
+            self._manifest_lock = FileLock(self.manifest_path + ".lock")
+        return self._manifest_lock
+    
+    def _read_manifest(self):
+        """Return the manifest on disk, or None if there is none"""
+        try:
+            with open(self.manifest_path) as file:
+                manifest = json.load(file)
+        except FileNotFoundError:
+            return None
+        if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+            raise ValueError(f"unsupported manifest in {self.file_path}")
+        return manifest
+    
+    def _partition_path(self, key):
+        """Path of a partition's snapshot file"""
+        return os.path.join(self.file_path, self._info[key]["file"])
+    
+    def _partition_count(self, key):
+        """Number of entries in a partition, from memory when it is open"""
+        partition = self._partitions.get(key)
+        if partition is not None:
+            return len(partition.entries)
+        return self._info[key].get("count", 0)
+    
+    def partition_keys(self):
+        """Return the keys of every partition, oldest first"""
+        with self._lock:
+            return sorted(self._info)
+    
+    def load_data(self, progress=None):
+        """Read the manifest and load the active partitions
+        
+        progress, if given, is called with (entries loaded, bytes read,
+        total bytes) while the partitions are read.
+        """
+        with self._lock:
+            for partition in self._partitions.values():
+                partition.close()
+            self._partitions = {}
+            self._recent.clear()
+            self._changed.clear()
+            try:
+                os.makedirs(self.file_path, exist_ok=True)
+                manifest = self._read_manifest()
+            except (ValueError, IOError) as e:
+                print(f"Error loading manifest: {e}")
+                manifest = None
+            if manifest is None:
+                manifest = self._rebuild_manifest()
+            self._apply_manifest(manifest)
+            self._active = set(self._choose_active())
+            
+            # Partitions are registered before they are read, so the
+            # entries loaded so far can be shown while the rest load
+            keys = sorted(self._active)
+            for key in keys:
+                self._partitions[key] = self._new_partition(key, load=False)
+        
+        sizes = [os.path.getsize(self._partition_path(key))
+                 if os.path.exists(self._partition_path(key)) else 0 for key in keys]
+        total_bytes = sum(sizes)
+        loaded = 0
+        bytes_read = 0
+        for key, size in zip(keys, sizes):
+            partition = self._partitions[key]
+            report = None
+            if progress is not None:
+                report = lambda count, done, total, base=loaded, offset=bytes_read: progress(
+                    base + count, offset + done, total_bytes)
+            partition.load_data(report)
+            loaded += len(partition.entries)
+            bytes_read += size
+        
+        with self._lock:
+            # Entries written after the last manifest update (for example
+            # before a crash) may carry IDs the manifest has not seen yet
+            for key in keys:
+                self._next_id = max(self._next_id, self._max_id(key) + 1)
+        self.changes.emit(RELOADED)
+    
+    def subscribe(self, callback):
+        """Call callback(event, items) after every change, as DataHandler does"""
+        self.changes.subscribe(callback)
+    
+    def unsubscribe(self, callback):
+        """Stop calling a callback passed to subscribe()"""
+        self.changes.unsubscribe(callback)
+    
+    def _forward(self, key, event, items):
+        """Pass on a change of one partition as a change of the book
+        
+        Views of the whole book show the active window, so entries added
+        to older partitions, and partitions that were cleared or reloaded,
+        only tell the subscribers to read their views again. Called with
+        the partition's lock held, so the book's lock is not taken.
+        """
+        if not self.changes:
+            return
+        if event == REMOVED or (event == ADDED and key in self._active):
+            self.changes.emit(event, items)
+        else:
+            self.changes.emit(RELOADED)
+    
+    def _apply_manifest(self, manifest):
+        """Take over the partitions and next ID of a manifest"""
+        self.granularity = manifest.get("granularity", self.granularity)
+        self._info = dict(manifest.get("partitions", {}))
+        self._next_id = max(self._next_id, manifest.get("next_id", 1))
+        self._manifest_stat = DataHandler._stat(self.manifest_path)
+    
+    def _rebuild_manifest(self):
+        """Build a manifest from the partition files in the directory
+        
+        Used for new books and when the manifest was lost.
+        """
+        manifest = {"version": MANIFEST_VERSION, "granularity": self.granularity,
+                    "next_id": 1, "partitions": {}}
+        names = sorted(name for name in os.listdir(self.file_path)
+                       if name.endswith((".json", ".json.gz")) and name != MANIFEST_NAME)
+        if not names:
+            return manifest
+        
+        print(f"Rebuilding the manifest of {self.file_path}")
+        for name in names:
+            key = name[:-len(".json.gz")] if name.endswith(".gz") else name[:-len(".json")]
+            self._info = {key: {"file": name}}
+            partition = self._new_partition(key, load=True)
+            record = self._describe(key, partition)
+            manifest["partitions"][key] = record
+            if record["max_id"] is not None:
+                manifest["next_id"] = max(manifest["next_id"], record["max_id"] + 1)
+            if len(key) == 4:
+                manifest["granularity"] = "year"
+        self._info = {}
+        self._manifest_dirty = True
+        return manifest
+    
+    def _choose_active(self):
+        """Return the keys of the newest unarchived partitions and of undated entries"""
+        dated = [key for key, info in self._info.items()
+                 if key != UNDATED and not info.get("archived")]
+        active = sorted(dated)[-self.active_partitions:] if self.active_partitions > 0 else []
+        if UNDATED in self._info and not self._info[UNDATED].get("archived"):
+            active.append(UNDATED)
+        return active
+    
+    def _new_partition(self, key, load):
+        """Create the DataHandler of a partition and pass on its changes"""
+        partition = DataHandler(self._partition_path(key), auto_save=False, load=load, **self.options)
+        partition.subscribe(lambda event, items: self._forward(key, event, items))
+        return partition
+    
+    def _open(self, key):
+        """Return the open partition for key, loading it on demand"""
+        with self._lock:
+            partition = self._partitions.get(key)
+            if partition is not None:
+                if key in self._recent:
+                    self._recent.move_to_end(key)
+                return partition
+            
+            partition = self._new_partition(key, load=True)
+            self._partitions[key] = partition
+            self._recent[key] = None
+            self._next_id = max(self._next_id, self._max_id(key) + 1)
+            evicted = []
+            while len(self._recent) > self.cached_partitions:
+                old_key, _ = self._recent.popitem(last=False)
+                old_partition = self._partitions.pop(old_key)
+                if old_key in self._changed:
+                    # The manifest record has to be taken while it is open
+                    self._info[old_key] = self._describe(old_key, old_partition)
+                evicted.append(old_partition)
+        # Closing writes what is still unsaved in the evicted partitions
+        for old_partition in evicted:
+            old_partition.close()
+        return partition
+    
+    def _read_partition(self, key):
+        """Return the entries of a partition without keeping it open"""
+        with self._lock:
+            partition = self._partitions.get(key)
+            if partition is not None:
+                return partition.get_all_entries()
+            # Nothing is changed or searched here, so the handler needs no
+            # listener and no search index, and is closed straight away
+            partition = DataHandler(self._partition_path(key), auto_save=False,
+                                    **dict(self.options, lazy_search_index=True))
+        entries = partition.get_all_entries()
+        partition.close()
+        return entries
+    
+    def _max_id(self, key):
+        """Return the highest numeric ID in an open partition, or 0"""
+        ids = [entry['id'] for entry in self._partitions[key].get_all_entries() if type(entry['id']) is int]
+        return max(ids, default=0)
+    
+    def _describe(self, key, partition):
+        """Return the manifest record of an open partition"""
+        entries = partition.get_all_entries()
+        ids = [entry['id'] for entry in entries if type(entry['id']) is int]
+        bounds = partition.date_bounds()
+        file_name = os.path.basename(partition.file_path)
+        return {
+            "file": file_name,
+            "count": len(entries),
+            "first": format_timestamp(bounds[0]) if bounds else None,
+            "last": format_timestamp(bounds[1]) if bounds else None,
+            "min_id": min(ids, default=None),
+            "max_id": max(ids, default=None),
+            "archived": file_name.endswith(".gz")
+        }
+    
+    def _write_manifest(self, describe=True):
+        """Bring the manifest on disk up to date with the open partitions
+        
+        Shared books merge the manifest on disk first, so partitions and
+        IDs added by other processes are kept. With describe off only the
+        next ID is brought up to date, which is all reserving IDs needs.
+        """
+        with self._process_lock():
+            with self._lock:
+                try:
+                    if self.shared and DataHandler._stat(self.manifest_path) != self._manifest_stat:
+                        disk = self._read_manifest()
+                        if disk is not None:
+                            for key, info in disk.get("partitions", {}).items():
+                                if key not in self._changed:
+                                    self._info[key] = info
+                            self._next_id = max(self._next_id, disk.get("next_id", 1))
+                    if describe:
+                        for key in self._changed:
+                            if key in self._partitions:
+                                self._info[key] = self._describe(key, self._partitions[key])
+                    
+                    manifest = {
+                        "version": MANIFEST_VERSION,
+                        "granularity": self.granularity,
+                        "next_id": self._next_id,
+                        "partitions": dict(sorted(self._info.items()))
+                    }
+                    tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+                    with open(tmp_path, 'w') as file:
+                        json.dump(manifest, file, indent=4)
+                        file.flush()
+                        os.fsync(file.fileno())
+                    os.replace(tmp_path, self.manifest_path)
+                    self._manifest_stat = DataHandler._stat(self.manifest_path)
+                    if describe:
+                        self._changed.clear()
+                        self._manifest_dirty = False
+                    return True
+                except (ValueError, IOError) as e:
+                    print(f"Error writing manifest: {e}")
+                    return False
+    
+    def _reserve_ids(self, count):
+        """Return the first of count new IDs that are unique across the book
+        
+        Shared books reserve them in the manifest, so two processes never
+        hand out the same ID for different partitions.
+        """
+        with self._lock:
+            if self.shared:
+                with self._process_lock():
+                    try:
+                        disk = self._read_manifest()
+                    except (ValueError, IOError) as e:
+                        print(f"Error reading manifest: {e}")
+                        disk = None
+                    if disk is not None:
+                        self._next_id = max(self._next_id, disk.get("next_id", 1))
+                    first_id = self._next_id
+                    self._next_id += count
+                    self._manifest_dirty = True
+                    self._write_manifest(describe=False)
+                    return first_id
+            
+            first_id = self._next_id
+            self._next_id += count
+            self._manifest_dirty = True
+            return first_id
+    
+    def _partition_for_new_entries(self, key):
+        """Return the partition that new entries of key go to, creating it if needed"""
+        with self._lock:
+            if key not in self._info:
+                self._info[key] = {"file": f"{key}.json", "count": 0}
+                # A new period newer than the active window joins it
+                newest = max((k for k in self._active if k != UNDATED), default=None)
+                if key == UNDATED or newest is None or key > newest:
+                    self._active.add(key)
+                    self._partitions[key] = self._new_partition(key, load=True)
+            self._changed.add(key)
+            self._manifest_dirty = True
+        return self._open(key)
+    
+    def _finish_change(self):
+        """Save a change right away when auto_save is on"""
+        if not self.auto_save:
+            return True
+        return self.flush()
+    
+    def has_unsaved_changes(self):
+        """Return True if changes are waiting for flush()"""
+        with self._lock:
+            partitions = list(self._partitions.values())
+            dirty = self._manifest_dirty
+        return dirty or any(partition.has_unsaved_changes() for partition in partitions)
+    
+    @timed("partitions.flush")
+    def flush(self):
+        """Write the manifest and every partition's unsaved changes
+        
+        The manifest goes first, so the IDs handed out are recorded before
+        any entry that uses them reaches a partition file. Shared books
+        reserve their IDs in the manifest up front, so they write it last,
+        once the partitions have merged what other processes wrote.
+        """
+        with self._flush_lock:
+            with self._lock:
+                partitions = list(self._partitions.values())
+                write_manifest = self._manifest_dirty or bool(self._changed)
+            saved = True
+            if write_manifest and not self.shared:
+                saved = self._write_manifest()
+            for partition in partitions:
+                saved = partition.flush() and saved
+            if write_manifest and self.shared:
+                saved = self._write_manifest() and saved
+            return saved
+    
+    @timed("partitions.save_data")
+    def save_data(self):
+        """Write the manifest and a full snapshot of every open partition"""
+        with self._flush_lock:
+            with self._lock:
+                partitions = list(self._partitions.values())
+                self._changed.update(self._partitions)
+            saved = self._write_manifest()
+            for partition in partitions:
+                saved = partition.save_data() and saved
+            return saved
+    
+    def close(self):
+        """Write outstanding changes and close every open partition"""
+        self.flush()
+        with self._lock:
+            partitions = list(self._partitions.values())
+        for partition in partitions:
+            partition.close()
+        if self._owns_parallel:
+            self.parallel.shutdown()
+    
+    def has_disk_changes(self):
+        """Cheaply check whether another process changed the book"""
+        if DataHandler._stat(self.manifest_path) != self._manifest_stat:
+            return True
+        with self._lock:
+            partitions = list(self._partitions.values())
+        return any(partition.has_disk_changes() for partition in partitions)
+    
+    @timed("partitions.reload_changes")
+    def reload_changes(self):
+        """Pick up partitions and entries that other processes wrote
+        
+        Returns True if the entries changed.
+        """
+        if not self.shared or not self.has_disk_changes():
+            return False
+        
+        changed = False
+        with self._lock:
+            if DataHandler._stat(self.manifest_path) != self._manifest_stat:
+                try:
+                    disk = self._read_manifest()
+                except (ValueError, IOError) as e:
+                    print(f"Error reloading manifest: {e}")
+                    disk = None
+                if disk is not None:
+                    for key, info in disk.get("partitions", {}).items():
+                        if key not in self._changed:
+                            self._info[key] = info
+                    self._next_id = max(self._next_id, disk.get("next_id", 1))
+                    self._manifest_stat = DataHandler._stat(self.manifest_path)
+                    # Periods another process started may belong in the active window
+                    for key in self._choose_active():
+                        if key not in self._active and (key == UNDATED or key > min(self._active, default="")):
+                            self._active.add(key)
+                            self._recent.pop(key, None)
+                            if key not in self._partitions:
+                                self._partitions[key] = self._new_partition(key, load=True)
+                            changed = True
+            partitions = list(self._partitions.items())
+        if changed:
+            self.changes.emit(RELOADED)
+        
+        for key, partition in partitions:
+            if partition.reload_changes():
+                changed = True
+                with self._lock:
+                    self._changed.add(key)
+        return changed
+    
+    def add_entry(self, name, message, date=None):
+        """Add a new guest book entry"""
+        return self.add_entries([{"name": name, "message": message, "date": date}])
+    
+    @timed("partitions.add_entries")
+    def add_entries(self, entries):
+        """Add several entries to the partitions their dates belong to
+        
+        entries is an iterable of mappings with a name, a message and an
+        optional date; every entry gets a new ID.
+        """
+        now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        entries = list(entries)
+        if not entries:
+            return True
+        
+        groups = {}
+        for entry_id, data in enumerate(entries, self._reserve_ids(len(entries))):
+            date = data.get('date') or now
+            entry = {"id": entry_id, "name": data['name'], "message": data['message'], "date": date}
+            groups.setdefault(partition_key(date, self.granularity), []).append(entry)
+        
+        for key, group in sorted(groups.items()):
+            self._partition_for_new_entries(key).put_entries(group)
+        return self._finish_change()
+    
+    def get_all_entries(self):
+        """Return the entries of the active partitions, oldest partition first"""
+        partitions = self._active_partitions()
+        if len(partitions) == 1:
+            return partitions[0].get_all_entries()
+        entries = []
+        for partition in partitions:
+            entries.extend(partition.get_all_entries())
+        return entries
+    
+    def _active_partitions(self):
+        """Return the open active partitions, oldest first"""
+        with self._lock:
+            return [self._partitions[key] for key in sorted(self._active) if key in self._partitions]
+    
+    @timed("partitions.sort_entries")
+    def sort_entries(self, column, descending=False, entries=None):
+        """Return entries ordered by "id", "name" or "date"
+        
+        Each partition orders its share from its own sort index and the
+        sorted runs are merged, so nothing is sorted from scratch. Without
+        entries, the entries of the active partitions are ordered.
+        """
+        if entries is None:
+            runs = [partition.sort_entries(column, descending) for partition in self._active_partitions()]
+        else:
+            groups = {}
+            for entry in entries:
+                groups.setdefault(partition_key(entry['date'], self.granularity), []).append(entry)
+            runs = []
+            with self._lock:
+                partitions = {key: self._partitions.get(key) for key in groups}
+            for key, group in groups.items():
+                partition = partitions[key]
+                if partition is not None:
+                    runs.append(partition.sort_entries(column, descending, group))
+                else:
+                    # Closed since the entries were read, so there is no index to use
+                    runs.append(sorted(group, key=SORT_KEYS[column], reverse=descending))
+        
+        if len(runs) == 1:
+            return runs[0]
+        return list(heapq.merge(*runs, key=SORT_KEYS[column], reverse=descending))
+    
+    @timed("partitions.top_entries")
+    def top_entries(self, column, count=50, descending=True):
+        """Return the count entries of the active partitions with the highest (or lowest) values in a column"""
+        candidates = []
+        for partition in self._active_partitions():
+            candidates.extend(partition.top_entries(column, count, descending))
+        return top_entries(candidates, column, count, descending)
+    
+    @timed("partitions.top_visitors")
+    def top_visitors(self, count=10):
+        """Return (name, number of entries) for the most frequent visitors of the active partitions"""
+        return top_visitors(self.get_all_entries(), count)
+    
+    def _partitions_with_id(self, entry_id):
+        """Return the keys of the partitions that may hold an ID, open ones first"""
+        with self._lock:
+            keys = [key for key in sorted(self._partitions, reverse=True)]
+            for key, info in sorted(self._info.items(), reverse=True):
+                if key in self._partitions:
+                    continue
+                low, high = info.get("min_id"), info.get("max_id")
+                if type(entry_id) is not int or (low is not None and low <= entry_id <= high):
+                    keys.append(key)
+        return keys
+    
+    def get_entry(self, entry_id):
+        """Return the entry with the given ID, or None"""
+        for key in self._partitions_with_id(entry_id):
+            entry = self._open(key).get_entry(entry_id)
+            if entry is not None:
+                return entry
+        return None
+    
+    @timed("partitions.search_entries")
+    def search_entries(self, query):
+        """Search the active partitions for entries containing the query"""
+        partitions = self._active_partitions()
+        results = []
+        for partition in partitions:
+            results.extend(partition.search_entries(query))
+        return results
+    
+    @timed("partitions.search_all_entries")
+    def search_all_entries(self, query):
+        """Search every partition for entries containing the query, oldest first
+        
+        Open partitions use their search index; the others are read from
+        disk and scanned one at a time, like AllEntries, so this suits
+        one-off searches such as those of the command line.
+        """
+        matches = search_matcher(query)
+        results = []
+        for key in self.partition_keys():
+            with self._lock:
+                partition = self._partitions.get(key)
+            if partition is not None:
+                results.extend(partition.search_entries(query))
+            else:
+                results.extend(filter(matches, self._read_partition(key)))
+        return results
+    
+    def _overlapping(self, start, end):
+        """Return the keys of the partitions with entries between two packed timestamps"""
+        keys = []
+        with self._lock:
+            for key, info in sorted(self._info.items()):
+                if key == UNDATED:
+                    continue
+                partition = self._partitions.get(key)
+                if partition is not None:
+                    # Open partitions may have unsaved entries the manifest lacks
+                    bounds = partition.date_bounds()
+                else:
+                    bounds = None
+                    if info.get("first") and info.get("last"):
+                        bounds = (parse_timestamp(info["first"]), parse_timestamp(info["last"]))
+                if bounds is not None and bounds[0] <= end and start <= bounds[1]:
+                    keys.append(key)
+        return keys
+    
+    @timed("partitions.filter_by_date")
+    def filter_by_date(self, start_date, end_date=None):
+        """Filter entries by date range, opening only the partitions it overlaps"""
+        try:
+            datetime.datetime.strptime(start_date, "%Y-%m-%d")
+            if end_date:
+                datetime.datetime.strptime(end_date, "%Y-%m-%d")
+        except ValueError as e:
+            print(f"Date format error: {e}")
+            return []
+        # Without an end date the range runs to the end of today, as in
+        # DataHandler.filter_by_date
+        return self.filter_by_datetime(start_date, end_date or datetime.date.today().isoformat())
+    
+    @timed("partitions.filter_by_datetime")
+    def filter_by_datetime(self, start, end=None):
+        """Filter entries by a range that can include the time of day
+        
+        Bounds are datetimes or "YYYY-MM-DD[ HH:MM:SS]" strings, as for
+        DataHandler.filter_by_datetime.
+        """
+        try:
+            low = parse_bound(start)
+            high = parse_bound(end, end_of_day=True) if end else pack_timestamp(datetime.datetime.now())
+        except ValueError as e:
+            print(f"Date format error: {e}")
+            return []
+        
+        results = []
+        for key in self._overlapping(low, high):
+            results.extend(self._open(key).filter_by_datetime(start, end))
+        return results
+    
+    def cache_stats(self):
+        """Return the query cache statistics of the open partitions added up"""
+        with self._lock:
+            partitions = list(self._partitions.values())
+        stats = [partition.cache_stats() for partition in partitions]
+        return CacheStats(*(sum(values) for values in zip(*stats))) if stats else CacheStats(0, 0, 0, 0, 0, 0)
+    
+    @timed("partitions.latest_entries")
+    def latest_entries(self, count=50):
+        """Return the most recent entries by date, newest first"""
+        results = []
+        for key in reversed(self.partition_keys()):
+            if len(results) >= count:
+                break
+            if key != UNDATED:
+                results.extend(self._open(key).latest_entries(count - len(results)))
+        return results
+    
+    @timed("partitions.count_by_day")
+    def count_by_day(self, start_date=None, end_date=None):
+        """Return (YYYY-MM-DD, count) pairs for every day that has entries"""
+        try:
+            low = parse_bound(start_date) if start_date else 0
+            high = parse_bound(end_date, end_of_day=True) if end_date else 99999999999999
+        except ValueError as e:
+            print(f"Date format error: {e}")
+            return []
+        
+        counts = []
+        for key in self._overlapping(low, high):
+            counts.extend(self._open(key).count_by_day(start_date, end_date))
+        return counts
+    
+    def delete_entry(self, entry_id):
+        """Delete an entry by its ID"""
+        return self.delete_entries([entry_id])
+    
+    @timed("partitions.delete_entries")
+    def delete_entries(self, entry_ids):
+        """Delete several entries by ID from whichever partitions hold them
+        
+        IDs that do not exist are skipped. Returns False if none of the
+        entries existed or the change could not be saved.
+        """
+        remaining = set(entry_ids)
+        deleted = False
+        keys = []
+        for entry_id in entry_ids:
+            keys.extend(key for key in self._partitions_with_id(entry_id) if key not in keys)
+        for key in keys:
+            if not remaining:
+                break
+            partition = self._open(key)
+            found = [entry_id for entry_id in remaining if partition.get_entry(entry_id) is not None]
+            if found and partition.delete_entries(found):
+                remaining.difference_update(found)
+                deleted = True
+                with self._lock:
+                    self._changed.add(key)
+                    self._manifest_dirty = True
+        if not deleted:
+            return False
+        return self._finish_change()
+    
+    @timed("partitions.clear_all")
+    def clear_all(self):
+        """Delete every entry and partition file of the book"""
+        with self._flush_lock, self._process_lock(), self._lock:
+            for partition in self._partitions.values():
+                partition.clear_all()
+                partition.close()
+            try:
+                for info in self._info.values():
+                    path = os.path.join(self.file_path, info["file"])
+                    for suffix in ("", ".journal", ".idx", ".lock"):
+                        if os.path.exists(path + suffix):
+                            os.remove(path + suffix)
+            except IOError as e:
+                print(f"Error clearing partitions: {e}")
+                return False
+            self._partitions = {}
+            self._recent.clear()
+            self._active = set()
+            self._info = {}
+            self._changed.clear()
+            self._manifest_dirty = True
+            self.changes.emit(CLEARED)
+        return self.flush()
+    
+    @timed("partitions.archive")
+    def archive(self, before):
+        """Compress the partitions of periods before a key such as "2023-01"
+        
+        Archived partitions are gzip-compressed and left out of the active
+        window. They are still opened on demand for date filters and
+        deletions. Returns the keys that were archived.
+        """
+        archived = []
+        for key in self.partition_keys():
+            with self._lock:
+                info = self._info[key]
+                if key == UNDATED or key >= before or info.get("archived"):
+                    continue
+                partition = self._partitions.pop(key, None)
+                self._active.discard(key)
+                self._recent.pop(key, None)
+            if partition is None:
+                partition = self._new_partition(key, load=True)
+            try:
+                # Fold the journal into the snapshot, then compress it
+                if not partition.save_data():
+                    raise IOError(f"could not save partition {key}")
+                partition.close()
+                with self._lock:
+                    info.update(self._describe(key, partition))
+                path = partition.file_path
+                tmp_path = path + ".gz.tmp"
+                with open(path, 'rb') as source, gzip.open(tmp_path, 'wb', compresslevel=9) as target:
+                    shutil.copyfileobj(source, target, 1024 * 1024)
+                os.replace(tmp_path, path + ".gz")
+                if os.path.exists(path + ".idx"):
+                    os.replace(path + ".idx", path + ".gz.idx")
+                os.remove(path)
+                # Writes to the archive lock <file>.gz.lock from now on
+                if os.path.exists(path + ".lock"):
+                    os.remove(path + ".lock")
+            except IOError as e:
+                print(f"Error archiving partition {key}: {e}")
+                continue
+            with self._lock:
+                info["file"] = os.path.basename(path) + ".gz"
+                info["archived"] = True
+                self._manifest_dirty = True
+            archived.append(key)
+        if archived:
+            # The archived partitions left the active window
+            self.changes.emit(RELOADED)
+            self.flush()
+        return archived
+    
+    @timed("partitions.save_as")
+    def save_as(self, file_path):
+        """Copy the book to another directory and keep working on the copy"""
+        if os.path.basename(file_path) == MANIFEST_NAME:
+            file_path = os.path.dirname(file_path) or "."
+        if os.path.exists(file_path) and not os.path.isdir(file_path):
+            print(f"Error saving data: {file_path} is not a directory")
+            return False
+        
+        self.flush()
+        with self._flush_lock, self._lock:
+            try:
+                os.makedirs(file_path, exist_ok=True)
+                for key, info in self._info.items():
+                    partition = self._partitions.get(key)
+                    target = os.path.join(file_path, info["file"])
+                    if partition is not None:
+                        if not partition.save_as(target):
+                            return False
+                    else:
+                        shutil.copy2(self._partition_path(key), target)
+                        if os.path.exists(self._partition_path(key) + ".journal"):
+                            shutil.copy2(self._partition_path(key) + ".journal", target + ".journal")
+            except IOError as e:
+                print(f"Error saving data: {e}")
+                return False
+            self.file_path = file_path
+            self._manifest_stat = None
+            self._manifest_dirty = True
+            self._changed.update(self._partitions)
+        return self.flush()
+    
+    @timed("partitions.export_to_csv")
+    def export_to_csv(self, file_path):
+        """Export every entry of every partition to a CSV file"""
+        return export_entries(AllEntries(self), file_path, "csv") is not None
+
+
+def partition_book(source_path, directory, granularity="month"):
+    """Split a JSON or SQLite guest book into a new partitioned book
+    
+    Entries keep their IDs. Returns the number of entries written, or None
+    if the book could not be split.
+    """
+    source = open_data_handler(source_path, auto_save=False)
+    entries = source.get_all_entries()
+    next_id = max((entry['id'] for entry in entries if type(entry['id']) is int), default=0) + 1
+    
+    # Older books can contain repeated IDs; those entries get fresh IDs
+    # above every existing one, as in the SQLite migration
+    groups = {}
+    seen = set()
+    for entry in entries:
+        if entry['id'] in seen:
+            entry = dict(entry, id=next_id)
+            next_id += 1
+        seen.add(entry['id'])
+        groups.setdefault(partition_key(entry['date'], granularity), []).append(entry)
+    source.close()
+    
+    book = PartitionedDataHandler(directory, granularity=granularity, auto_save=False, load=False)
+    if os.path.exists(book.manifest_path):
+        print(f"Error splitting {source_path}: {directory} already holds a guest book")
+        return None
+    try:
+        os.makedirs(directory, exist_ok=True)
+        for key, group in sorted(groups.items()):
+            book._info[key] = {"file": f"{key}.json"}
+            partition = book._new_partition(key, load=False)
+            partition.put_entries(group)
+            if not partition.save_data():
+                return None
+            book._info[key] = book._describe(key, partition)
+    except IOError as e:
+        print(f"Error splitting {source_path}: {e}")
+        return None
+    
+    book._next_id = next_id
+    if not book._write_manifest():
+        return None
+    return sum(len(group) for group in groups.values())
+
+
+if __name__ == "__main__":
+    import sys
+    
+    if len(sys.argv) in (4, 5) and sys.argv[1] == "split":
+        granularity = sys.argv[4] if len(sys.argv) == 5 else "month"
+        count = partition_book(sys.argv[2], sys.argv[3], granularity)
+        if count is None:
+            sys.exit(1)
+        print(f"Split {count} entries into {sys.argv[3]}")
+    elif len(sys.argv) == 4 and sys.argv[1] == "archive":
+        book = PartitionedDataHandler(sys.argv[2])
+        archived = book.archive(sys.argv[3])
+        book.close()
+        print(f"Archived {len(archived)} partitions")
+    else:
+        print("Usage: python partitions.py split <guestbook.json> <directory> [month|year]")
+        print("       python partitions.py archive <directory> <YYYY-MM>")
+        sys.exit(1)
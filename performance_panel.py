@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# Guest Book Application - Performance Panel
+# This file contains the window that shows the timing spans and counters collected by the instrumentation.
+
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+from instrumentation import metrics
+
+# Milliseconds between updates of an open panel
+REFRESH_INTERVAL = 1000
+
+class PerformancePanel:
+    """A window listing how long each operation took and what the counters say
+    
+    Collecting metrics is switched on with the checkbox and stays on when
+    the window is closed, so the panel can be reopened later to look at
+    what happened in the meantime.
+    """
+    
+    def __init__(self, root):
+        """Create the window and start updating it"""
+        self.window = tk.Toplevel(root)
+        self.window.title("Performance")
+        self.window.geometry("640x480")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        self._job = None
+        
+        frame = ttk.Frame(self.window, padding="10")
+        frame.pack(fill=tk.BOTH, expand=True)
+        frame.columnconfigure(0, weight=1)
+        frame.rowconfigure(1, weight=3)
+        frame.rowconfigure(3, weight=1)
+        
+        # Switch collecting on and off
+        self.enabled_var = tk.BooleanVar(value=metrics.enabled)
+        ttk.Checkbutton(frame, text="Collect metrics", variable=self.enabled_var,
+                        command=self.toggle_metrics).grid(row=0, column=0, sticky="w")
+        
+        # Timing spans
+        self.spans_view = ttk.Treeview(frame, columns=("name", "calls", "total", "mean", "max"), show="headings")
+        for column, text, width, anchor in (("name", "Operation", 220, "w"), ("calls", "Calls", 70, "e"),
+                                            ("total", "Total ms", 90, "e"), ("mean", "Mean ms", 90, "e"),
+                                            ("max", "Max ms", 90, "e")):
+            self.spans_view.heading(column, text=text)
+            self.spans_view.column(column, width=width, anchor=anchor)
+        self.spans_view.grid(row=1, column=0, sticky="nsew", pady=5)
+        
+        # Counters
+        ttk.Label(frame, text="Counters:").grid(row=2, column=0, sticky="w")
+        self.counters_view = ttk.Treeview(frame, columns=("name", "value"), show="headings", height=6)
+        self.counters_view.heading("name", text="Counter")
+        self.counters_view.heading("value", text="Value")
+        self.counters_view.column("name", width=220)
+        self.counters_view.column("value", width=120, anchor="e")
+        self.counters_view.grid(row=3, column=0, sticky="nsew", pady=5)
+        
+        # Buttons
+        button_frame = ttk.Frame(frame)
+        button_frame.grid(row=4, column=0, sticky="ew", pady=(5, 0))
+        ttk.Button(button_frame, text="Reset", command=self.reset).pack(side=tk.LEFT)
+        ttk.Button(button_frame, text="Save as JSON...", command=self.save_json).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Close", command=self.close).pack(side=tk.RIGHT)
+        
+        self.refresh()
+    
+    def exists(self):
+        """Return True while the window is open"""
+        return bool(self.window.winfo_exists())
+    
+    def toggle_metrics(self):
+        """Start or stop collecting metrics"""
+        if self.enabled_var.get():
+            metrics.enable()
+        else:
+            metrics.disable()
+    
+    def refresh(self):
+        """Show the current spans and counters and schedule the next update"""
+        snapshot = metrics.snapshot()
+        self.enabled_var.set(snapshot["enabled"])
+        
+        self.spans_view.delete(*self.spans_view.get_children())
+        for name, span in snapshot["spans"].items():
+            self.spans_view.insert("", "end", values=(
+                name, f"{span['calls']:,}", f"{span['total_ms']:,.1f}",
+                f"{span['mean_ms']:,.2f}", f"{span['max_ms']:,.1f}"
+            ))
+        
+        self.counters_view.delete(*self.counters_view.get_children())
+        for name, value in snapshot["counters"].items():
+            self.counters_view.insert("", "end", values=(name, f"{value:,}"))
+        
+        self._job = self.window.after(REFRESH_INTERVAL, self.refresh)
+    
+    def reset(self):
+        """Forget everything collected so far"""
+        metrics.reset()
+    
+    def save_json(self):
+        """Save the current metrics to a JSON file"""
+        file_path = filedialog.asksaveasfilename(
+            parent=self.window,
+            title="Save Metrics",
+            defaultextension=".json",
+            filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+        )
+        if file_path and not metrics.dump(file_path):
+            messagebox.showerror("Error", f"Failed to save metrics to {file_path}", parent=self.window)
+    
+    def close(self):
+        """Stop updating and close the window"""
+        if self._job is not None:
+            self.window.after_cancel(self._job)
+            self._job = None
+        self.window.destroy()
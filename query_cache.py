@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# Guest Book Application - Query Cache
+# This file contains the LRU cache of search and date filter results.
+
+from collections import OrderedDict, namedtuple
+from itertools import compress
+from date_index import parse_timestamp
+from entry import Entry
+
+CacheStats = namedtuple("CacheStats", ["hits", "misses", "patches", "evictions", "queries", "rows"])
+
+# Changes larger than this drop the cached results instead of patching them
+PATCH_LIMIT = 1000
+
+def entry_timestamp(entry):
+    """Return the packed timestamp of a dict or compact entry, or None"""
+    timestamp = getattr(entry, "timestamp", None)
+    return timestamp if timestamp is not None else parse_timestamp(entry['date'])
+
+def search_matcher(query):
+    """Return the predicate of a search for query, as the search index applies it"""
+    query = query.lower()
+    
+    def matches(entry):
+        if type(entry) is Entry:
+            # Attribute access skips the Mapping lookup of compact entries
+            return query in entry.name.lower() or query in entry.message.lower()
+        return query in entry['name'].lower() or query in entry['message'].lower()
+    return matches
+
+class SearchResults(list):
+    """Search matches that keep each entry's lowercased name and message
+    
+    folded lines up with the entries, so a longer query can be checked
+    with one substring test per entry instead of lowercasing both fields
+    again on every keystroke. Results refined from each other share the
+    same strings.
+    """
+    __slots__ = ("folded",)
+
+def refine_search(rows, query):
+    """Return the rows that match query, which extends the query they came from"""
+    query = query.lower()
+    if "\n" in query:
+        # Would match across the line break joining the two fields
+        matches = search_matcher(query)
+        return [entry for entry in rows if matches(entry)]
+    
+    folded = getattr(rows, "folded", None)
+    if folded is None:
+        folded = [
+            f"{entry.name}\n{entry.message}".lower() if type(entry) is Entry
+            else f"{entry['name']}\n{entry['message']}".lower()
+            for entry in rows
+        ]
+    keep = [query in text for text in folded]
+    result = SearchResults(compress(rows, keep))
+    result.folded = list(compress(folded, keep))
+    return result
+
+def date_matcher(start, end):
+    """Return the predicate of a date range between two packed timestamps"""
+    def matches(entry):
+        timestamp = entry_timestamp(entry)
+        return timestamp is not None and start <= timestamp <= end
+    return matches
+
+
+class QueryCache:
+    """Least recently used cache of query results, kept current as entries change
+    
+    Each result is stored with the data version it was computed at and the
+    predicate that selects its entries. added() and removed() bump the
+    version and patch the results that are still current, so a search
+    that was cached before an entry was added still hits afterwards.
+    Results are lists in insertion order; patching builds new lists, so a
+    list handed out earlier never changes. The cache holds at most
+    max_queries results with max_rows entries between them. Callers
+    serialize access, the data handler does so with its lock.
+    """
+    
+    def __init__(self, max_queries=64, max_rows=500000):
+        """Create an empty cache with the given bounds"""
+        self.max_queries = max_queries
+        self.max_rows = max_rows
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.patches = 0
+        self.evictions = 0
+        self._results = OrderedDict()   # key -> (version, rows, predicate)
+        self._rows = 0
+    
+    def lookup(self, key, compute, matches):
+        """Return the cached result for key, or compute and cache it
+        
+        matches is the predicate used to patch the result when entries
+        are added or removed later.
+        """
+        cached = self._results.get(key)
+        if cached is not None and cached[0] == self.version:
+            self._results.move_to_end(key)
+            self.hits += 1
+            return cached[1]
+        
+        self.misses += 1
+        rows = compute()
+        self._discard(key)
+        if len(rows) <= self.max_rows:
+            self._results[key] = (self.version, rows, matches)
+            self._rows += len(rows)
+            self._evict()
+        return rows
+    
+    def narrowest(self, kind, covers):
+        """Return the smallest current result of a kind whose query covers another
+        
+        covers(query) tells whether every match of the new query is in the
+        result of query, for example because the new text contains the old
+        one. Among results of the same size the most recently used wins,
+        as it usually comes from the longest query typed so far. Returns
+        None when no cached result qualifies.
+        """
+        best = None
+        for key, (version, rows, matches) in self._results.items():
+            if key[0] == kind and version == self.version and covers(key[1]):
+                if best is None or len(rows) <= len(best):
+                    best = rows
+        return best
+    
+    def added(self, entries):
+        """Append new entries to the cached results they match"""
+        self.version += 1
+        if not self._results:
+            return
+        if len(entries) > PATCH_LIMIT:
+            self.clear()
+            return
+        for key, (version, rows, matches) in list(self._results.items()):
+            if version != self.version - 1:
+                self._discard(key)
+                continue
+            new_rows = [entry for entry in entries if matches(entry)]
+            if new_rows:
+                rows = rows + new_rows
+                self._rows += len(new_rows)
+                self.patches += 1
+            self._results[key] = (self.version, rows, matches)
+        self._evict()
+    
+    def removed(self, entries):
+        """Drop removed entries from the cached results that contain them"""
+        self.version += 1
+        if len(entries) > PATCH_LIMIT:
+            self.clear()
+            return
+        removed_ids = None
+        for key, (version, rows, matches) in list(self._results.items()):
+            if version != self.version - 1:
+                self._discard(key)
+                continue
+            if any(matches(entry) for entry in entries):
+                if removed_ids is None:
+                    removed_ids = {id(entry) for entry in entries}
+                kept = [entry for entry in rows if id(entry) not in removed_ids]
+                self._rows -= len(rows) - len(kept)
+                rows = kept
+                self.patches += 1
+            self._results[key] = (self.version, rows, matches)
+    
+    def clear(self):
+        """Drop every cached result, for changes that cannot be patched"""
+        self.version += 1
+        self._results.clear()
+        self._rows = 0
+    
+    def __len__(self):
+        """Return the number of cached results"""
+        return len(self._results)
+    
+    def stats(self):
+        """Return the hit, miss, patch and eviction counts and the cache size"""
+        return CacheStats(self.hits, self.misses, self.patches, self.evictions,
+                          len(self._results), self._rows)
+    
+    def _discard(self, key):
+        """Remove a single cached result"""
+        cached = self._results.pop(key, None)
+        if cached is not None:
+            self._rows -= len(cached[1])
+    
+    def _evict(self):
+        """Drop the least recently used results until the cache is within bounds"""
+        while self._results and (len(self._results) > self.max_queries or self._rows > self.max_rows):
+            _, (version, rows, matches) = self._results.popitem(last=False)
+            self._rows -= len(rows)
+            self.evictions += 1
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# Guest Book Application - Search Index
+# This file contains the trigram index used to speed up entry searches.
+
+import marshal
+import os
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from instrumentation import tally
+from query_cache import refine_search
+
+# Bump when the sidecar layout changes so old files are rebuilt
+SIDECAR_VERSION = 2
+
+# Prebuilt slices make trigram extraction run at C speed for typical texts
+_SLICES = [slice(i, i + 3) for i in range(4096)]
+
+def trigrams(text):
+    """Return the set of three-character substrings of the text"""
+    if len(text) <= len(_SLICES):
+        return set(map(text.__getitem__, _SLICES[:max(0, len(text) - 2)]))
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def entry_trigrams(name, message):
+    """Return the trigrams indexed for an entry's name and message
+    
+    Both fields are lowercased and split in a single pass over one text.
+    The few trigrams that span the line break are indexed too; they only
+    add candidates, which the substring check of a search rules out.
+    """
+    return trigrams(f"{name}\n{message}".lower())
+
+
+class SearchIndex:
+    """Trigram index over the lowercased name and message of each entry
+    
+    Queries of three or more characters only verify the entries that
+    contain every trigram of the query, so results are exactly those of
+    a case-insensitive substring scan, in the order entries were added.
+    Document numbers only grow, so each posting list is a sorted array.
+    """
+    
+    def __init__(self):
+        """Create an empty index"""
+        self.clear()
+    
+    def clear(self):
+        """Remove every entry from the index"""
+        self._docs = {}        # document number -> entry
+        self._doc_numbers = {}  # id(entry) -> document number
+        self._postings = {}    # trigram -> sorted array of document numbers
+        self._next_doc = 0
+    
+    def __len__(self):
+        """Return the number of indexed entries"""
+        return len(self._docs)
+    
+    def _entry_trigrams(self, entry):
+        """Return the trigrams of an entry's name and message"""
+        return entry_trigrams(entry['name'], entry['message'])
+    
+    def add(self, entry):
+        """Index a new entry"""
+        doc = self._next_doc
+        self._next_doc += 1
+        self._docs[doc] = entry
+        self._doc_numbers[id(entry)] = doc
+        
+        postings = self._postings
+        for gram in self._entry_trigrams(entry):
+            docs = postings.get(gram)
+            if docs is None:
+                postings[gram] = array('i', (doc,))
+            else:
+                docs.append(doc)
+    
+    def remove(self, entry):
+        """Remove an entry from the index"""
+        self.remove_many((entry,))
+    
+    def remove_many(self, entries):
+        """Remove several entries, touching each posting list once"""
+        removed = {}    # trigram -> document numbers to drop
+        for entry in entries:
+            doc = self._doc_numbers.pop(id(entry), None)
+            if doc is None:
+                continue
+            del self._docs[doc]
+            for gram in self._entry_trigrams(entry):
+                removed.setdefault(gram, []).append(doc)
+        
+        for gram, dropped in removed.items():
+            docs = self._postings.get(gram)
+            if docs is None:
+                continue
+            if len(dropped) * 64 < len(docs):
+                # A few documents out of a long list are cheaper to cut out
+                for doc in dropped:
+                    i = bisect_left(docs, doc)
+                    if i < len(docs) and docs[i] == doc:
+                        del docs[i]
+            else:
+                dropped = set(dropped)
+                docs = self._postings[gram] = array('i', [doc for doc in docs if doc not in dropped])
+            if not docs:
+                del self._postings[gram]
+    
+    def build(self, entries):
+        """Replace the index contents with the given entries
+        
+        The posting lists are collected as plain lists and turned into
+        arrays once at the end, which is cheaper than growing an array
+        per document.
+        """
+        self.clear()
+        postings = defaultdict(list)
+        for doc, entry in enumerate(entries):
+            self._docs[doc] = entry
+            self._doc_numbers[id(entry)] = doc
+            for gram in self._entry_trigrams(entry):
+                postings[gram].append(doc)
+        self._next_doc = len(self._docs)
+        self._postings = {gram: array('i', docs) for gram, docs in postings.items()}
+    
+    def estimate(self, query):
+        """Return an upper bound on the entries a search for query has to verify"""
+        query = query.lower()
+        if len(query) < 3:
+            return len(self._docs)
+        return min(len(self._postings.get(gram, ())) for gram in trigrams(query))
+    
+    def search(self, query):
+        """Return the entries whose name or message contains the query"""
+        query = query.lower()
+        
+        if len(query) < 3:
+            # Too short to use trigrams, scan every entry
+            candidates = self._docs.values()
+        else:
+            # Intersect the posting lists, smallest first
+            grams = trigrams(query)
+            posting_lists = []
+            for gram in grams:
+                docs = self._postings.get(gram)
+                if not docs:
+                    return []
+                posting_lists.append(docs)
+            posting_lists.sort(key=len)
+            
+            matches = set(posting_lists[0])
+            for docs in posting_lists[1:]:
+                matches.intersection_update(docs)
+                if not matches:
+                    return []
+            candidates = [self._docs[doc] for doc in sorted(matches)]
+        
+        # Trigrams only narrow the candidates, the substring check decides;
+        # the matches keep their lowercased texts for the next keystroke
+        tally("data.entries_scanned", len(candidates))
+        return refine_search(candidates, query)
+    
+    def save(self, path, fingerprint):
+        """Write the index to a sidecar file tagged with the data fingerprint
+        
+        Document numbers are stored as positions in insertion order, so the
+        sidecar can be attached to the same entries after a reload.
+        """
+        if self._next_doc == len(self._docs):
+            postings = {gram: docs.tobytes() for gram, docs in self._postings.items()}
+        else:
+            # Close the gaps left by removed entries
+            positions = {doc: position for position, doc in enumerate(self._docs)}
+            postings = {
+                gram: array('i', [positions[doc] for doc in docs]).tobytes()
+                for gram, docs in self._postings.items()
+            }
+        
+        tmp_path = path + ".tmp"
+        try:
+            with open(tmp_path, 'wb') as file:
+                marshal.dump((SIDECAR_VERSION, array('i').itemsize, fingerprint, postings), file)
+            os.replace(tmp_path, path)
+            return True
+        except (IOError, ValueError) as e:
+            print(f"Error saving search index: {e}")
+            return False
+    
+    def load(self, path, fingerprint, entries):
+        """Load a sidecar written for these entries, return False if stale"""
+        try:
+            with open(path, 'rb') as file:
+                version, itemsize, stored_fingerprint, postings = marshal.load(file)
+        except (IOError, EOFError, ValueError, TypeError):
+            return False
+        
+        if (version != SIDECAR_VERSION or itemsize != array('i').itemsize or
+                stored_fingerprint != fingerprint):
+            return False
+        
+        self.merge_postings(entries, [postings])
+        return True
+    
+    def merge_postings(self, entries, chunks):
+        """Replace the index contents with posting lists worked out elsewhere
+        
+        Each chunk maps trigrams to array bytes of document numbers, which
+        are positions in entries. Chunks come in entry order, as from a
+        sidecar or from worker processes, so appending keeps every posting
+        list sorted.
+        """
+        self.clear()
+        for entry in entries:
+            self._docs[self._next_doc] = entry
+            self._doc_numbers[id(entry)] = self._next_doc
+            self._next_doc += 1
+        
+        postings = self._postings
+        for chunk in chunks:
+            for gram, data in chunk.items():
+                docs = postings.get(gram)
+                if docs is None:
+                    docs = postings[gram] = array('i')
+                docs.frombytes(data)
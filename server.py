@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+# Guest Book Application - HTTP Server
+# This file contains the headless JSON API for collecting entries without the GUI.
+
+import argparse
+import datetime
+import json
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from data_handler import open_data_handler
+from date_index import parse_bound, parse_timestamp
+from entry import entry_to_json
+from exporter import iter_export_chunks
+
+# Largest page a client can ask for and the page size when it does not ask
+MAX_PAGE_SIZE = 1000
+DEFAULT_PAGE_SIZE = 100
+
+# Largest request body accepted, which bounds a batch of new entries
+MAX_BODY_SIZE = 16 * 1024 * 1024
+
+# Entries encoded per chunk of a streamed export
+EXPORT_CHUNK_SIZE = 1000
+
+
+class RequestError(Exception):
+    """A request that cannot be served, with the HTTP status to answer it with"""
+    
+    def __init__(self, status, message):
+        """Store the status along with the message"""
+        super().__init__(message)
+        self.status = status
+
+
+def entry_fields(data):
+    """Return (name, message, date) from a posted entry, or raise RequestError
+    
+    Dates can be given as "YYYY-MM-DD" (the current time of day is added,
+    as in the GUI) or "YYYY-MM-DD HH:MM:SS"; without a date the entry gets
+    the current date and time.
+    """
+    if not isinstance(data, dict):
+        raise RequestError(HTTPStatus.BAD_REQUEST, "Entries must be JSON objects")
+    name, message, date = data.get('name'), data.get('message'), data.get('date')
+    if not isinstance(name, str) or not name.strip():
+        raise RequestError(HTTPStatus.BAD_REQUEST, "Name cannot be empty")
+    if not isinstance(message, str) or not message.strip():
+        raise RequestError(HTTPStatus.BAD_REQUEST, "Message cannot be empty")
+    
+    if date is None or date == "":
+        return name.strip(), message.strip(), None
+    if not isinstance(date, str) or parse_timestamp(date) is None:
+        raise RequestError(HTTPStatus.BAD_REQUEST, "Invalid date format. Please use YYYY-MM-DD")
+    date = date.strip()
+    if len(date) == 10:
+        date = f"{date} {datetime.datetime.now().strftime('%H:%M:%S')}"
+    return name.strip(), message.strip(), date
+
+
+class GuestBookRequestHandler(BaseHTTPRequestHandler):
+    """Serves the guest book API
+    
+    GET    /entries              list entries, optionally searched (q) and
+                                 filtered by date (start, end), one page
+                                 (offset, limit) at a time
+    GET    /entries/<id>         a single entry
+    POST   /entries              add an entry, or a list of entries
+    DELETE /entries/<id>         delete an entry
+    POST   /entries/delete       delete the entries listed in {"ids": [...]}
+    GET    /export               every matching entry, streamed as CSV or
+                                 JSON Lines (format=csv or format=jsonl)
+    GET    /stats                entry count and query cache statistics
+    """
+    
+    protocol_version = "HTTP/1.1"
+    server_version = "GuestBook/1.0"
+    
+    # Headers and body are written separately, which Nagle's algorithm
+    # would hold back on keep-alive connections until the client's ACK
+    disable_nagle_algorithm = True
+    
+    def do_GET(self):
+        """Serve reads, after picking up what other processes wrote to the book"""
+        # A stat of the book files when nothing changed, so every read
+        # sees entries added by the GUI or the command line
+        self.data_handler.reload_changes()
+        self._dispatch({
+            ("entries",): self.list_entries,
+            ("entries", None): self.get_entry,
+            ("export",): self.export_entries,
+            ("stats",): self.get_stats
+        })
+    
+    def do_POST(self):
+        """Serve additions and batch deletions"""
+        self._dispatch({
+            ("entries",): self.add_entries,
+            ("entries", "delete"): self.delete_entries
+        })
+    
+    def do_DELETE(self):
+        """Serve single deletions"""
+        self._dispatch({("entries", None): self.delete_entry})
+    
+    def _dispatch(self, routes):
+        """Find the route for the request path and answer errors as JSON
+        
+        A None in a route matches any path segment, which is passed on
+        to the route as an argument.
+        """
+        url = urlsplit(self.path)
+        self.params = parse_qs(url.query)
+        self.streaming = False
+        parts = tuple(part for part in url.path.split("/") if part)
+        
+        try:
+            for pattern, route in routes.items():
+                if len(pattern) == len(parts) and all(p is None or p == part for p, part in zip(pattern, parts)):
+                    route(*[part for p, part in zip(pattern, parts) if p is None])
+                    return
+            raise RequestError(HTTPStatus.NOT_FOUND, f"No such resource: {url.path}")
+        except RequestError as e:
+            self.send_json({"error": str(e)}, e.status)
+        except Exception as e:
+            print(f"Error serving {self.command} {self.path}: {e}")
+            if self.streaming:
+                # The status line is gone already, so cut the stream short
+                self.close_connection = True
+            else:
+                self.send_json({"error": "Internal server error"}, HTTPStatus.INTERNAL_SERVER_ERROR)
+    
+    @property
+    def data_handler(self):
+        """The guest book this server works on"""
+        return self.server.data_handler
+    
+    def log_message(self, format, *args):
+        """Log requests unless the server runs quietly"""
+        if not self.server.quiet:
+            super().log_message(format, *args)
+    
+    # Request and response helpers
+    
+    def param(self, name, default=None):
+        """Return the first value of a query parameter"""
+        values = self.params.get(name)
+        return values[0] if values else default
+    
+    def int_param(self, name, default, minimum=0, maximum=None):
+        """Return an integer query parameter, clamped to the allowed range"""
+        value = self.param(name)
+        if value is None:
+            return default
+        try:
+            value = max(minimum, int(value))
+        except ValueError:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"{name} must be a number")
+        return value if maximum is None else min(value, maximum)
+    
+    def read_json(self):
+        """Return the decoded JSON body of the request"""
+        try:
+            length = int(self.headers["Content-Length"])
+        except (TypeError, ValueError):
+            self.close_connection = True
+            raise RequestError(HTTPStatus.LENGTH_REQUIRED, "Content-Length is required")
+        if length > MAX_BODY_SIZE:
+            # The body is left unread, so the connection cannot be reused
+            self.close_connection = True
+            raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body is too large")
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Request body is not valid JSON")
+    
+    def send_json(self, data, status=HTTPStatus.OK):
+        """Send a complete JSON response"""
+        body = json.dumps(data, default=entry_to_json).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def send_stream(self, content_type, chunks):
+        """Send a response of unknown length with chunked transfer encoding"""
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self.streaming = True
+        for chunk in chunks:
+            if chunk:
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+        self.wfile.write(b"0\r\n\r\n")
+    
+    def matching_entries(self):
+        """Return the entries selected by the q, start and end parameters"""
+        query = self.param("q", "").strip()
+        start, end = self.param("start"), self.param("end")
+        if end and not start:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "end needs a start date")
+        
+        bounds = None
+        if start:
+            try:
+                # A missing end bound means now, as in filter_by_datetime
+                bounds = (parse_bound(start),
+                          parse_bound(end, end_of_day=True) if end else parse_bound(datetime.datetime.now()))
+            except ValueError:
+                raise RequestError(HTTPStatus.BAD_REQUEST, "Invalid date format. Please use YYYY-MM-DD")
+        
+        if not query:
+            if bounds:
+                return self.data_handler.filter_by_datetime(start, end)
+            return self.data_handler.get_all_entries()
+        
+        entries = self.data_handler.search_entries(query)
+        if bounds:
+            low, high = bounds
+            entries = [
+                entry for entry in entries
+                if low <= (parse_timestamp(entry['date']) or -1) <= high
+            ]
+        return entries
+    
+    def entry_id(self, text):
+        """Turn an ID from the path into the ID the guest book uses"""
+        try:
+            return int(text)
+        except ValueError:
+            raise RequestError(HTTPStatus.NOT_FOUND, f"No entry with ID {text}")
+    
+    # Routes
+    
+    def list_entries(self):
+        """Send one page of the matching entries"""
+        offset = self.int_param("offset", 0)
+        limit = self.int_param("limit", DEFAULT_PAGE_SIZE, minimum=1, maximum=MAX_PAGE_SIZE)
+        entries = self.matching_entries()
+        total = len(entries)
+        
+        # A deletion on another thread can leave a gap in the live list
+        page = [entry for entry in entries[offset:offset + limit] if entry is not None]
+        self.send_json({
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "next": offset + limit if offset + limit < total else None,
+            "entries": page
+        })
+    
+    def get_entry(self, entry_id):
+        """Send a single entry"""
+        entry = self.data_handler.get_entry(self.entry_id(entry_id))
+        if entry is None:
+            raise RequestError(HTTPStatus.NOT_FOUND, f"No entry with ID {entry_id}")
+        self.send_json(entry)
+    
+    def add_entries(self):
+        """Add the posted entry or list of entries and save them"""
+        data = self.read_json()
+        items = data if isinstance(data, list) else [data]
+        entries = []
+        for item in items:
+            name, message, date = entry_fields(item)
+            entries.append({"name": name, "message": message, "date": date})
+        
+        if not entries:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "No entries to add")
+        if not self.data_handler.add_entries(entries) or not self.data_handler.flush():
+            raise RequestError(HTTPStatus.INTERNAL_SERVER_ERROR, "Failed to add entries")
+        self.send_json({"added": len(entries)}, HTTPStatus.CREATED)
+    
+    def delete_entry(self, entry_id):
+        """Delete a single entry and save the change"""
+        if not self.data_handler.delete_entry(self.entry_id(entry_id)):
+            raise RequestError(HTTPStatus.NOT_FOUND, f"No entry with ID {entry_id}")
+        if not self.data_handler.flush():
+            raise RequestError(HTTPStatus.INTERNAL_SERVER_ERROR, "Failed to save the deletion")
+        self.send_json({"deleted": 1})
+    
+    def delete_entries(self):
+        """Delete a batch of entries and save the change in one write"""
+        data = self.read_json()
+        entry_ids = data.get("ids") if isinstance(data, dict) else None
+        if not isinstance(entry_ids, list) or not all(type(entry_id) is int for entry_id in entry_ids):
+            raise RequestError(HTTPStatus.BAD_REQUEST, 'Expected {"ids": [...]} with numeric IDs')
+        
+        existing = [entry_id for entry_id in entry_ids if self.data_handler.get_entry(entry_id) is not None]
+        if existing and not (self.data_handler.delete_entries(existing) and self.data_handler.flush()):
+            raise RequestError(HTTPStatus.INTERNAL_SERVER_ERROR, "Failed to delete entries")
+        self.send_json({"deleted": len(existing)})
+    
+    def get_stats(self):
+        """Send the number of entries and the query cache statistics"""
+        stats = self.data_handler.cache_stats()
+        self.send_json({
+            "entries": len(self.data_handler.get_all_entries()),
+            "cache": stats._asdict() if stats is not None else None
+        })
+    
+    def export_entries(self):
+        """Stream every matching entry as CSV or JSON Lines"""
+        export_format = self.param("format", "csv")
+        if export_format not in ("csv", "jsonl"):
+            raise RequestError(HTTPStatus.BAD_REQUEST, "format must be csv or jsonl")
+        
+        entries = self.matching_entries()
+        if isinstance(entries, list):
+            # Deletions while streaming must not change the list under us
+            entries = list(entries)
+        content_type = "text/csv; charset=utf-8" if export_format == "csv" else "application/x-ndjson"
+        chunks = iter_export_chunks(entries, export_format, EXPORT_CHUNK_SIZE)
+        self.send_stream(content_type, (text.encode() for text, done in chunks))
+
+
+class GuestBookServer(ThreadingHTTPServer):
+    """Threaded HTTP server that answers API requests from one guest book
+    
+    Each request runs on its own thread. The data handler keeps its
+    entries consistent under its own locks; changes are queued and then
+    flushed, so writes that arrive together are saved in a single append.
+    """
+    
+    daemon_threads = True
+    
+    def __init__(self, address, data_handler, quiet=False):
+        """Bind to address and serve the given data handler"""
+        super().__init__(address, GuestBookRequestHandler)
+        self.data_handler = data_handler
+        self.quiet = quiet
+
+
+def open_server(file_path, host="127.0.0.1", port=8080, quiet=False):
+    """Open a guest book and return a server for it that is ready to start"""
+    data_handler = open_data_handler(file_path, journal=True, auto_save=False,
+                                     compact_entries=True, shared=True)
+    return GuestBookServer((host, port), data_handler, quiet=quiet)
+
+def main(argv=None):
+    """Run the API server until it is interrupted"""
+    parser = argparse.ArgumentParser(prog="main.py serve", description="Serve a guest book over HTTP")
+    parser.add_argument("--file", default="guestbook_data.json", help="guest book file (.json or .db)")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="port to listen on")
+    parser.add_argument("--quiet", action="store_true", help="do not log every request")
+    args = parser.parse_args(argv)
+    
+    server = open_server(args.file, args.host, args.port, args.quiet)
+    print(f"Serving {args.file} on http://{args.host}:{server.server_port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.data_handler.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# Guest Book Application - Sort Index
+# This file contains the column sort indexes and the top-k queries behind the sortable entry list.
+
+import heapq
+from bisect import bisect_left, insort
+from collections import Counter
+from collections.abc import Sequence
+from operator import itemgetter
+from query_cache import entry_timestamp
+
+def id_order(entry_id):
+    """Sort key of an entry ID; numeric IDs come before any others"""
+    return (0, entry_id) if type(entry_id) is int else (1, str(entry_id))
+
+def id_key(entry):
+    """Sort key of the entry ID"""
+    return id_order(entry['id'])
+
+def name_key(entry):
+    """Sort key of the visitor name, ignoring case"""
+    return entry['name'].casefold()
+
+def date_key(entry):
+    """Sort key of the entry date; entries without a readable date come first"""
+    timestamp = entry_timestamp(entry)
+    return -1 if timestamp is None else timestamp
+
+# The columns the entry list can be sorted by
+SORT_KEYS = {"id": id_key, "name": name_key, "date": date_key}
+
+def top_entries(entries, column, count, descending=True):
+    """Return the count first entries in a column order with a heap, without sorting them all"""
+    pick = heapq.nlargest if descending else heapq.nsmallest
+    return pick(count, entries, key=SORT_KEYS[column])
+
+def top_visitors(entries, count=10):
+    """Return (name, number of entries) for the visitors who signed most often"""
+    counts = Counter(entry['name'] for entry in entries)
+    return heapq.nlargest(count, counts.items(), key=itemgetter(1))
+
+
+class SortedEntries(Sequence):
+    """Read-only entries in the order of a sort index
+    
+    The view holds a copy of the index taken when it was made, so later
+    changes do not move rows under a reader. Slices only look up the
+    entries they contain, which is all the virtual list asks for.
+    """
+    
+    def __init__(self, items, descending=False):
+        """Wrap a sorted list of (key, seq, entry) items"""
+        self._items = items
+        self._descending = descending
+    
+    def __len__(self):
+        """Return the number of entries"""
+        return len(self._items)
+    
+    def __getitem__(self, index):
+        """Return one entry or a list of entries"""
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self._items)))]
+        
+        if index < 0:
+            index += len(self._items)
+        if not 0 <= index < len(self._items):
+            raise IndexError("entry index out of range")
+        if self._descending:
+            index = len(self._items) - 1 - index
+        return self._items[index][2]
+    
+    def __iter__(self):
+        """Iterate over the entries in order"""
+        items = reversed(self._items) if self._descending else self._items
+        return (item[2] for item in items)
+
+
+class SortIndex:
+    """Entries kept sorted by the value of one column
+    
+    Items are (key, seq, entry) tuples; the insertion sequence number
+    breaks ties, so equal keys keep insertion order and entries are never
+    compared themselves. Like the date index it is updated as entries are
+    added and removed, so an ordered view never needs a full sort.
+    """
+    
+    def __init__(self, column):
+        """Create an empty index of a column in SORT_KEYS"""
+        self.column = column
+        self.key = SORT_KEYS[column]
+        self.clear()
+    
+    def clear(self):
+        """Remove every entry from the index"""
+        self._items = []         # sorted (key, seq, entry) items
+        self._seqs = {}          # id(entry) -> (key, seq)
+        self._next_seq = 0
+    
+    def __len__(self):
+        """Return the number of indexed entries"""
+        return len(self._items)
+    
+    def add_many(self, entries):
+        """Index several entries, merging them in with at most one sort"""
+        items = []
+        for entry in entries:
+            key = self.key(entry)
+            seq = self._next_seq
+            self._next_seq += 1
+            self._seqs[id(entry)] = (key, seq)
+            items.append((key, seq, entry))
+        
+        if not items:
+            return
+        items.sort()
+        if not self._items or items[0] > self._items[-1]:
+            self._items.extend(items)
+        elif len(items) <= 8:
+            for item in items:
+                insort(self._items, item)
+        else:
+            # Both runs are sorted, which timsort merges in linear time
+            self._items.extend(items)
+            self._items.sort()
+    
+    def remove_many(self, entries):
+        """Remove several entries, rewriting the item list at most once"""
+        found = [self._seqs.pop(id(entry), None) for entry in entries]
+        found = [key for key in found if key is not None]
+        if len(found) * 64 < len(self._items):
+            for key in found:
+                # (key, seq) sorts just before the (key, seq, entry) item
+                i = bisect_left(self._items, key)
+                if i < len(self._items) and self._items[i][1] == key[1]:
+                    del self._items[i]
+        elif found:
+            dropped = {seq for key, seq in found}
+            self._items = [item for item in self._items if item[1] not in dropped]
+    
+    def build(self, entries):
+        """Replace the index contents with the given entries"""
+        self.clear()
+        self.add_many(entries)
+    
+    def ordered(self, descending=False):
+        """Return every indexed entry in order as a SortedEntries view"""
+        return SortedEntries(list(self._items), descending)
+    
+    def select(self, entries, descending=False):
+        """Return the given entries, such as a search result, in index order
+        
+        Small results are ordered by the keys the index already holds for
+        them; large ones are picked out of the index in a single pass.
+        Entries that are not indexed are left out.
+        """
+        if len(entries) * 16 < len(self._items):
+            seqs = self._seqs
+            items = [seqs[id(entry)] + (entry,) for entry in entries if id(entry) in seqs]
+            items.sort(reverse=descending)
+            return [item[2] for item in items]
+        
+        members = {id(entry) for entry in entries}
+        rows = [item[2] for item in self._items if id(item[2]) in members]
+        if descending:
+            rows.reverse()
+        return rows
+    
+    def top(self, count, descending=True):
+        """Return the count first entries in descending or ascending order"""
+        if count <= 0:
+            return []
+        if descending:
+            return [item[2] for item in reversed(self._items[-count:])]
+        return [item[2] for item in self._items[:count]]
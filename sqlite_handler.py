@@ -0,0 +1,556 @@
+#!/usr/bin/env python3
+# Guest Book Application - SQLite Data Handler
+# This file contains a SQLite storage engine with the same interface as DataHandler.
+
+import sqlite3
+import datetime
+import threading
+from collections.abc import Sequence
+from date_index import parse_bound, unpack_timestamp
+from exporter import export_entries
+from instrumentation import tally, timed
+from change_events import ChangeEvents, REMOVED, CLEARED, RELOADED
+from sort_index import SORT_KEYS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    message TEXT NOT NULL,
+    date TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_date ON entries (date);
+CREATE INDEX IF NOT EXISTS entries_name ON entries (name COLLATE NOCASE);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
+    name, message, content='entries', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN
+    INSERT INTO entries_fts (rowid, name, message) VALUES (new.id, new.name, new.message);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN
+    INSERT INTO entries_fts (entries_fts, rowid, name, message)
+    VALUES ('delete', old.id, old.name, old.message);
+END;
+"""
+
+# The trigram tokenizer cannot match queries shorter than this
+FTS_MIN_QUERY = 3
+
+# ORDER BY terms of the sortable columns, each backed by an index; the ID
+# breaks ties between equal values
+SORT_ORDERS = {"id": "id", "name": "name COLLATE NOCASE", "date": "date"}
+
+# File extensions that are treated as SQLite guest books
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+
+def _dict_row(cursor, row):
+    """Row factory that returns entries in the same shape as the JSON file"""
+    return {"id": row[0], "name": row[1], "message": row[2], "date": row[3]}
+
+def _contains_folded(text, query):
+    """SQL function: whether text contains the lowercased query, ignoring case
+    
+    LIKE only folds ASCII letters, so short queries use this to match the
+    same entries as DataHandler, which lowercases with str.lower().
+    """
+    return text is not None and query in text.lower()
+
+
+class QueryResult(Sequence):
+    """Lazy, read-only sequence of entries backed by a SQL query
+    
+    Only the row count is fetched up front; rows are read from the
+    database when they are indexed, sliced or iterated.
+    """
+    
+    def __init__(self, handler, where="", params=(), order="id"):
+        """Store the query; nothing is read until the rows are needed"""
+        self._handler = handler
+        self._where = where
+        self._params = tuple(params)
+        self._order = order
+        self._count = None
+    
+    def ordered(self, order):
+        """Return the same query with a different ORDER BY clause"""
+        return QueryResult(self._handler, self._where, self._params, order)
+    
+    def _select(self, suffix="", params=()):
+        """Run the result query with an extra suffix such as LIMIT/OFFSET"""
+        sql = "SELECT id, name, message, date FROM entries " + self._where
+        sql += " ORDER BY " + self._order + " " + suffix
+        return self._handler._execute(sql, self._params + tuple(params))
+    
+    def __len__(self):
+        """Return the number of rows without fetching them"""
+        if self._count is None:
+            sql = "SELECT COUNT(*) FROM entries " + self._where
+            cursor = self._handler._execute(sql, self._params, row_factory=None)
+            self._count = cursor.fetchone()[0]
+        return self._count
+    
+    def __getitem__(self, index):
+        """Fetch a single row or a slice of rows"""
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if start >= stop:
+                return []
+            rows = self._select("LIMIT ? OFFSET ?", (stop - start, start)).fetchall()
+            return rows[::step]
+        
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("entry index out of range")
+        return self._select("LIMIT 1 OFFSET ?", (index,)).fetchone()
+    
+    def __iter__(self):
+        """Stream the rows in batches"""
+        cursor = self._select()
+        while True:
+            rows = cursor.fetchmany(1000)
+            if not rows:
+                return
+            yield from rows
+    
+    def __bool__(self):
+        """Check for rows without counting all of them"""
+        return bool(self._count) if self._count is not None else bool(self[:1])
+
+
+class SQLiteDataHandler:
+    """Stores guest book entries in a SQLite database"""
+    
+    def __init__(self, file_path="guestbook_data.db", load=True, **options):
+        """Open (or create) the database at the specified file path
+        
+        Options meant for the JSON DataHandler (such as journal) are accepted
+        and ignored, since every change is committed as it is made.
+        """
+        self.file_path = file_path
+        self._lock = threading.RLock()
+        self.connection = None
+        self.has_fts = False
+        self._data_version = None
+        self.changes = ChangeEvents()
+        if load:
+            self.load_data()
+    
+    @timed("data.load_data")
+    def load_data(self, progress=None):
+        """Open the database and make sure the schema exists
+        
+        Rows are read on demand, so there is no loading progress to report.
+        """
+        with self._lock:
+            if self.connection is not None:
+                self.connection.close()
+            self.connection = sqlite3.connect(self.file_path, check_same_thread=False)
+            self.connection.row_factory = _dict_row
+            self.connection.create_function("contains_folded", 2, _contains_folded, deterministic=True)
+            self.connection.executescript(SCHEMA)
+            try:
+                self.connection.executescript(FTS_SCHEMA)
+                self.has_fts = True
+            except sqlite3.OperationalError as e:
+                # SQLite builds without FTS5 or the trigram tokenizer fall
+                # back to scanning every row
+                print(f"Full-text search unavailable: {e}")
+                self.has_fts = False
+            self.connection.commit()
+            self._data_version = self._read_data_version()
+            self.changes.emit(RELOADED)
+    
+    def subscribe(self, callback):
+        """Call callback(event, items) after every change, as DataHandler does
+        
+        Rows are read on demand and new rows only get their IDs from the
+        database, so additions are announced as "reloaded".
+        """
+        self.changes.subscribe(callback)
+    
+    def unsubscribe(self, callback):
+        """Stop calling a callback passed to subscribe()"""
+        self.changes.unsubscribe(callback)
+    
+    def _read_data_version(self):
+        """Return the counter SQLite bumps when another connection commits"""
+        return self._execute("PRAGMA data_version", row_factory=None).fetchone()[0]
+    
+    def has_disk_changes(self):
+        """Return True if another process changed the database since the last check"""
+        try:
+            return self._read_data_version() != self._data_version
+        except sqlite3.Error as e:
+            print(f"Error checking for changes: {e}")
+            return False
+    
+    @timed("data.reload_changes")
+    def reload_changes(self):
+        """Note changes made by other processes
+        
+        Rows are read on demand, so nothing has to be reloaded. Returns
+        True if the entries changed since the last call.
+        """
+        with self._lock:
+            if not self.has_disk_changes():
+                return False
+            self._data_version = self._read_data_version()
+            self.changes.emit(RELOADED)
+            return True
+    
+    def _execute(self, sql, params=(), row_factory=_dict_row):
+        """Execute a query on the shared connection"""
+        with self._lock:
+            cursor = self.connection.cursor()
+            cursor.row_factory = row_factory
+            return cursor.execute(sql, params)
+    
+    @timed("data.save_data")
+    def save_data(self):
+        """Commit outstanding changes (every write is committed already)"""
+        try:
+            with self._lock:
+                self.connection.commit()
+            return True
+        except sqlite3.Error as e:
+            print(f"Error saving data: {e}")
+            return False
+    
+    @timed("data.flush")
+    def flush(self):
+        """Write unsaved changes (every change is committed immediately)"""
+        return self.save_data()
+    
+    def has_unsaved_changes(self):
+        """Return True if changes are waiting for flush()"""
+        return False
+    
+    @timed("data.save_as")
+    def save_as(self, file_path):
+        """Copy the guest book to a new file
+        
+        Database targets become the file this handler works on. Any other
+        target receives a copy in the JSON guest book format, and the
+        handler stays on its database; callers that want to go on with
+        the copy open it themselves.
+        """
+        try:
+            if not file_path.lower().endswith(SQLITE_EXTENSIONS):
+                from data_handler import DataHandler
+                handler = DataHandler(file_path, auto_save=False, load=False)
+                try:
+                    handler.put_entries(self.get_all_entries())
+                    return handler.save_data()
+                finally:
+                    handler.close()
+            
+            with self._lock:
+                target = sqlite3.connect(file_path)
+                self.connection.backup(target)
+                target.close()
+                self.file_path = file_path
+            self.load_data()
+            return True
+        except (sqlite3.Error, IOError) as e:
+            print(f"Error saving data: {e}")
+            return False
+    
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+    
+    @timed("data.add_entry")
+    def add_entry(self, name, message, date=None):
+        """Add a new guest book entry"""
+        if not date:
+            date = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        
+        try:
+            with self._lock:
+                self.connection.execute(
+                    "INSERT INTO entries (name, message, date) VALUES (?, ?, ?)",
+                    (name, message, date)
+                )
+                self.connection.commit()
+                self.changes.emit(RELOADED)
+            tally("data.entries_added")
+            return True
+        except sqlite3.Error as e:
+            print(f"Error adding entry: {e}")
+            return False
+    
+    @timed("data.add_entries")
+    def add_entries(self, entries):
+        """Add several entries in a single transaction"""
+        now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        try:
+            with self._lock:
+                with self.connection:
+                    cursor = self.connection.executemany(
+                        "INSERT INTO entries (name, message, date) VALUES (?, ?, ?)",
+                        ((data['name'], data['message'], data.get('date') or now) for data in entries)
+                    )
+                self.changes.emit(RELOADED)
+            tally("data.entries_added", cursor.rowcount)
+            return True
+        except sqlite3.Error as e:
+            print(f"Error adding entries: {e}")
+            return False
+    
+    def get_all_entries(self):
+        """Return all guest book entries as a lazily loaded sequence"""
+        return QueryResult(self)
+    
+    def get_entry(self, entry_id):
+        """Return the entry with the given ID, or None"""
+        return self._execute("SELECT id, name, message, date FROM entries WHERE id = ?", (entry_id,)).fetchone()
+    
+    @timed("data.search_entries")
+    def search_entries(self, query):
+        """Search for entries containing the query in name or message"""
+        if self.has_fts and len(query) >= FTS_MIN_QUERY:
+            phrase = '"' + query.replace('"', '""') + '"'
+            return QueryResult(
+                self,
+                "WHERE id IN (SELECT rowid FROM entries_fts WHERE entries_fts MATCH ?)",
+                (phrase,)
+            )
+        
+        # Short queries scan every row, folding case as str.lower() does
+        query = query.lower()
+        return QueryResult(
+            self,
+            "WHERE contains_folded(name, ?) OR contains_folded(message, ?)",
+            (query, query)
+        )
+    
+    @timed("data.filter_by_date")
+    def filter_by_date(self, start_date, end_date=None):
+        """Filter entries by date range using the date index"""
+        try:
+            start = datetime.datetime.strptime(start_date, "%Y-%m-%d")
+            
+            if end_date:
+                end = datetime.datetime.strptime(end_date, "%Y-%m-%d")
+            else:
+                end = datetime.datetime.now()
+            
+            # Dates are stored as "YYYY-MM-DD HH:MM:SS", so text order is
+            # date order and the range covers the whole end day
+            end = end.date() + datetime.timedelta(days=1)
+            return QueryResult(
+                self,
+                "WHERE date >= ? AND date < ?",
+                (start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"))
+            )
+        except ValueError as e:
+            print(f"Date format error: {e}")
+            return []
+    
+    @timed("data.filter_by_datetime")
+    def filter_by_datetime(self, start, end=None):
+        """Filter entries by a range that can include the time of day"""
+        try:
+            start = unpack_timestamp(parse_bound(start))
+            end = unpack_timestamp(parse_bound(end, end_of_day=True)) if end else datetime.datetime.now()
+            return QueryResult(
+                self,
+                "WHERE date >= ? AND date <= ?",
+                (start.strftime("%Y-%m-%d %H:%M:%S"), end.strftime("%Y-%m-%d %H:%M:%S"))
+            )
+        except ValueError as e:
+            print(f"Date format error: {e}")
+            return []
+    
+    def cache_stats(self):
+        """Return None, since SQLite queries are answered from its own page cache"""
+        return None
+    
+    @timed("data.latest_entries")
+    def latest_entries(self, count=50):
+        """Return the most recent entries by date, newest first"""
+        cursor = self._execute(
+            "SELECT id, name, message, date FROM entries ORDER BY date DESC, id DESC LIMIT ?",
+            (count,)
+        )
+        return cursor.fetchall()
+    
+    @staticmethod
+    def _order_by(column, descending):
+        """Return the ORDER BY clause of a sortable column"""
+        direction = " DESC" if descending else ""
+        if column == "id":
+            return "id" + direction
+        return f"{SORT_ORDERS[column]}{direction}, id{direction}"
+    
+    @timed("data.sort_entries")
+    def sort_entries(self, column, descending=False, entries=None):
+        """Return entries ordered by "id", "name" or "date"
+        
+        Every entry, or a search or filter result, is returned as the same
+        query with another ORDER BY, which SQLite answers from the column
+        index. Other lists are sorted in memory.
+        """
+        order = self._order_by(column, descending)
+        if entries is None:
+            return QueryResult(self, order=order)
+        if isinstance(entries, QueryResult):
+            return entries.ordered(order)
+        return sorted(entries, key=SORT_KEYS[column], reverse=descending)
+    
+    @timed("data.top_entries")
+    def top_entries(self, column, count=50, descending=True):
+        """Return the count entries with the highest (or lowest) values in a column"""
+        cursor = self._execute(
+            "SELECT id, name, message, date FROM entries ORDER BY " +
+            self._order_by(column, descending) + " LIMIT ?",
+            (count,)
+        )
+        return cursor.fetchall()
+    
+    @timed("data.top_visitors")
+    def top_visitors(self, count=10):
+        """Return (name, number of entries) for the most frequent visitors, most first"""
+        cursor = self._execute(
+            "SELECT name, COUNT(*) AS visits FROM entries GROUP BY name "
+            "ORDER BY visits DESC, MIN(id) LIMIT ?",
+            (count,),
+            row_factory=None
+        )
+        return cursor.fetchall()
+    
+    @timed("data.count_by_day")
+    def count_by_day(self, start_date=None, end_date=None):
+        """Return (YYYY-MM-DD, count) pairs for every day that has entries"""
+        conditions = []
+        params = []
+        if start_date:
+            conditions.append("date >= ?")
+            params.append(start_date)
+        if end_date:
+            conditions.append("date < ?")
+            params.append(end_date + "~")  # sorts after any time of that day
+        where = "WHERE " + " AND ".join(conditions) if conditions else ""
+        cursor = self._execute(
+            "SELECT substr(date, 1, 10) AS day, COUNT(*) FROM entries " + where +
+            " GROUP BY day ORDER BY day",
+            params,
+            row_factory=None
+        )
+        return cursor.fetchall()
+    
+    @timed("data.delete_entry")
+    def delete_entry(self, entry_id):
+        """Delete an entry by its ID"""
+        try:
+            with self._lock:
+                cursor = self.connection.execute("DELETE FROM entries WHERE id = ?", (entry_id,))
+                self.connection.commit()
+                if cursor.rowcount:
+                    self.changes.emit(REMOVED, [entry_id])
+            tally("data.entries_deleted", cursor.rowcount)
+            return cursor.rowcount > 0
+        except sqlite3.Error as e:
+            print(f"Error deleting entry: {e}")
+            return False
+    
+    @timed("data.delete_entries")
+    def delete_entries(self, entry_ids):
+        """Delete several entries by ID in a single transaction"""
+        try:
+            with self._lock:
+                with self.connection:
+                    deleted = [
+                        entry_id for entry_id in entry_ids
+                        if self.connection.execute("DELETE FROM entries WHERE id = ?", (entry_id,)).rowcount
+                    ]
+                if deleted:
+                    self.changes.emit(REMOVED, deleted)
+            tally("data.entries_deleted", len(deleted))
+            return bool(deleted)
+        except sqlite3.Error as e:
+            print(f"Error deleting entries: {e}")
+            return False
+    
+    @timed("data.clear_all")
+    def clear_all(self):
+        """Delete every entry in the guest book"""
+        try:
+            with self._lock:
+                self.connection.execute("DELETE FROM entries")
+                self.connection.commit()
+                self.changes.emit(CLEARED)
+            return True
+        except sqlite3.Error as e:
+            print(f"Error clearing entries: {e}")
+            return False
+    
+    @timed("data.export_to_csv")
+    def export_to_csv(self, file_path):
+        """Export all entries to a CSV file, streaming the rows from the database"""
+        return export_entries(self.get_all_entries(), file_path, "csv") is not None
+
+
+def migrate_json_to_sqlite(json_path, db_path):
+    """Copy every entry of a JSON guest book into a new SQLite database
+    
+    The JSON book is read through DataHandler, so a pending journal is
+    included. Entry IDs are kept and the copy runs in one transaction.
+    Returns the number of migrated entries, or None if the database
+    already holds entries or the copy failed.
+    """
+    from data_handler import DataHandler
+    
+    entries = DataHandler(json_path).get_all_entries()
+    
+    # Older books can contain repeated or non-numeric IDs; those rows get
+    # fresh IDs above every numeric one so they cannot collide with a
+    # later entry
+    next_id = max((entry['id'] for entry in entries if type(entry['id']) is int), default=0) + 1
+    seen = set()
+    def rows():
+        nonlocal next_id
+        for entry in entries:
+            entry_id = entry['id']
+            if type(entry_id) is not int or entry_id in seen:
+                entry_id = next_id
+                next_id += 1
+            seen.add(entry_id)
+            yield (entry_id, entry['name'], entry['message'], entry['date'])
+    
+    handler = SQLiteDataHandler(db_path)
+    try:
+        with handler._lock:
+            if handler._execute("SELECT EXISTS (SELECT 1 FROM entries)", row_factory=None).fetchone()[0]:
+                print(f"Error migrating to {db_path}: the database already contains entries")
+                return None
+            with handler.connection:
+                handler.connection.executemany(
+                    "INSERT INTO entries (id, name, message, date) VALUES (?, ?, ?, ?)",
+                    rows()
+                )
+    except sqlite3.Error as e:
+        print(f"Error migrating to {db_path}: {e}")
+        return None
+    finally:
+        handler.close()
+    return len(entries)
+
+if __name__ == "__main__":
+    import sys
+    
+    if len(sys.argv) != 3:
+        print("Usage: python sqlite_handler.py <guestbook.json> <guestbook.db>")
+        sys.exit(1)
+    
+    count = migrate_json_to_sqlite(sys.argv[1], sys.argv[2])
+    if count is None:
+        sys.exit(1)
+    print(f"Migrated {count} entries to {sys.argv[2]}")
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# Guest Book Application - Virtual List
+# This file contains a Treeview wrapper that only materializes the visible rows.
+
+from tkinter import ttk, font
+from instrumentation import tally, timed
+
+class VirtualTreeview:
+    """Shows a large sequence of rows in a Treeview without inserting them all
+    
+    The Treeview only ever holds as many items as fit in the viewport. When
+    the view scrolls, those items are given the values of the rows now in
+    view. Rows are fetched in one slice that includes an overscan margin,
+    so short scrolls are served from memory and lazily loaded sequences
+    (such as SQLite query results) are not queried row by row.
+    
+    Rows shown from a list can also be appended and removed in place,
+    which keeps the scroll position and selection and only redraws the
+    viewport when the change is in view.
+    """
+    
+    def __init__(self, parent, columns, row_values, row_key, overscan=20, on_change=None):
+        """Create the Treeview and its vertical scrollbar inside the parent
+        
+        row_values turns a row into the tuple shown in the columns and
+        row_key returns the value used to remember the selection.
+        on_change is called whenever the visible window or row count changes.
+        """
+        self.row_values = row_values
+        self.row_key = row_key
+        self.overscan = overscan
+        self.on_change = on_change
+        
+        self.tree = ttk.Treeview(parent, columns=columns, show="headings")
+        self.scrollbar = ttk.Scrollbar(parent, orient="vertical", command=self.yview)
+        
+        self.rows = []
+        self._keys = None        # keys of every row, built by the first append or removal
+        self.offset = 0
+        self.visible = 1
+        self.selected = set()
+        self._pool = []          # Treeview items, top to bottom
+        self._pool_keys = {}     # item -> key of the row it shows
+        self._window = (0, 0)    # row range held in _window_values
+        self._window_values = []
+        
+        # Until a row has been drawn the geometry can only be estimated
+        style_height = ttk.Style().lookup("Treeview", "rowheight")
+        self._row_height = int(style_height) if style_height else (
+            font.nametofont("TkDefaultFont").metrics("linespace") + 4)
+        self._header_height = self._row_height + 4
+        self._measured = False
+        
+        self.tree.bind("<Configure>", lambda event: self._resize())
+        self.tree.bind("<<TreeviewSelect>>", lambda event: self._sync_selection())
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda event: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda event: self.scroll(3))
+        self.tree.bind("<Up>", lambda event: self._move_focus(-1))
+        self.tree.bind("<Down>", lambda event: self._move_focus(1))
+        self.tree.bind("<Prior>", lambda event: self._move_focus(-self.visible))
+        self.tree.bind("<Next>", lambda event: self._move_focus(self.visible))
+        self.tree.bind("<Home>", lambda event: self._move_focus(-len(self.rows)))
+        self.tree.bind("<End>", lambda event: self._move_focus(len(self.rows)))
+    
+    def set_rows(self, rows, keep_position=False):
+        """Display a new sequence of rows"""
+        self.rows = rows
+        self._keys = None
+        self._window = (0, 0)
+        self._window_values = []
+        if not keep_position:
+            self.offset = 0
+            self.selected.clear()
+        self.render()
+    
+    def _row_keys(self):
+        """Return the set of keys of the rows, building it on first use"""
+        if self._keys is None:
+            self._keys = set(map(self.row_key, self.rows))
+        return self._keys
+    
+    def unique_keys(self):
+        """Return True if no two of the displayed rows share a key"""
+        return len(self._row_keys()) == len(self.rows)
+    
+    def append_rows(self, rows):
+        """Add rows after the last one, skipping rows whose key is shown already
+        
+        The displayed rows must be a list. Rows appended below the viewport
+        only move the scrollbar. Returns the number of rows added.
+        """
+        keys = self._row_keys()
+        new_rows = []
+        for row in rows:
+            key = self.row_key(row)
+            if key not in keys:
+                keys.add(key)
+                new_rows.append(row)
+        if not new_rows:
+            return 0
+        
+        start = len(self.rows)
+        self.rows.extend(new_rows)
+        if start < self.offset + self.visible:
+            self.render()
+        else:
+            self._show_position()
+        return len(new_rows)
+    
+    def remove_keys(self, keys):
+        """Remove the rows with the given keys from a displayed list
+        
+        Rows removed above the viewport move the offset along, so the same
+        rows stay in view. Returns the number of rows removed.
+        """
+        shown = self._row_keys()
+        keys = shown.intersection(keys)
+        if not keys:
+            return 0
+        
+        kept = []
+        above = 0
+        row_key = self.row_key
+        for index, row in enumerate(self.rows):
+            if row_key(row) in keys:
+                if index < self.offset:
+                    above += 1
+            else:
+                kept.append(row)
+        shown -= keys
+        self.selected -= keys
+        self.offset -= above
+        self.set_rows(kept, keep_position=True)
+        self._keys = shown
+        return len(keys)
+    
+    def total(self):
+        """Return the number of rows in the displayed sequence"""
+        return len(self.rows)
+    
+    def last_offset(self):
+        """Return the offset that shows the final page of rows"""
+        return max(0, self.total() - self.visible)
+    
+    def scroll_to(self, offset):
+        """Make the row at offset the first visible row"""
+        offset = max(0, min(int(offset), self.last_offset()))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+    
+    def scroll(self, rows):
+        """Scroll the view by a number of rows"""
+        self.scroll_to(self.offset + rows)
+        return "break"
+    
+    def page(self, pages):
+        """Scroll the view by whole pages"""
+        self.scroll(pages * self.visible)
+    
+    def yview(self, *args):
+        """Scrollbar command: handles "moveto" and "scroll" requests"""
+        if not args:
+            return
+        if args[0] == "moveto":
+            self.scroll_to(float(args[1]) * self.total())
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            if args[2] == "pages":
+                self.page(amount)
+            else:
+                self.scroll(amount)
+    
+    def _on_mousewheel(self, event):
+        """Scroll three rows per wheel notch"""
+        return self.scroll(-3 if event.delta > 0 else 3)
+    
+    def _move_focus(self, rows):
+        """Move the keyboard selection, scrolling when it leaves the viewport"""
+        total = self.total()
+        if not total:
+            return "break"
+        
+        focus = self.tree.focus()
+        current = self.offset + self._pool.index(focus) if focus in self._pool else self.offset
+        target = max(0, min(current + rows, total - 1))
+        
+        if target < self.offset:
+            self.scroll_to(target)
+        elif target >= self.offset + self.visible:
+            self.scroll_to(target - self.visible + 1)
+        
+        item = self._pool[target - self.offset]
+        self.select_only(item)
+        self.tree.focus(item)
+        return "break"
+    
+    def select_only(self, item):
+        """Make the row shown by a Treeview item the only selected row"""
+        self.selected = {self._pool_keys[item]}
+        self.tree.selection_set(item)
+    
+    def _resize(self):
+        """Recompute how many rows fit after the widget changed size"""
+        if self._pool:
+            bbox = self.tree.bbox(self._pool[0])
+            if bbox:
+                self._header_height, self._row_height = bbox[1], bbox[3]
+                self._measured = True
+        
+        visible = max(1, (self.tree.winfo_height() - self._header_height) // self._row_height)
+        if visible != self.visible:
+            self.visible = visible
+            self.offset = min(self.offset, self.last_offset())
+            self.render()
+    
+    def _window_rows(self, start, stop):
+        """Return the display values for rows start..stop from the overscan window"""
+        window_start, window_stop = self._window
+        if start < window_start or stop > window_stop:
+            window_start = max(0, start - self.overscan)
+            window_stop = min(self.total(), stop + self.overscan)
+            self._window = (window_start, window_stop)
+            self._window_values = [
+                (self.row_key(row), self.row_values(row))
+                for row in self.rows[window_start:window_stop]
+            ]
+        return self._window_values[start - window_start:stop - window_start]
+    
+    @timed("gui.render")
+    def render(self):
+        """Bring the Treeview items in line with the rows in view"""
+        total = self.total()
+        self.offset = max(0, min(self.offset, self.last_offset()))
+        stop = min(total, self.offset + self.visible)
+        rows = self._window_rows(self.offset, stop)
+        
+        # Grow or shrink the item pool to the number of rows in view
+        while len(self._pool) < len(rows):
+            self._pool.append(self.tree.insert("", "end"))
+            tally("gui.treeview_items_inserted")
+        while len(self._pool) > len(rows):
+            item = self._pool.pop()
+            self._pool_keys.pop(item, None)
+            self.tree.delete(item)
+        
+        tally("gui.treeview_rows_drawn", len(rows))
+        selection = []
+        for item, (key, values) in zip(self._pool, rows):
+            self.tree.item(item, values=values)
+            self._pool_keys[item] = key
+            if key in self.selected:
+                selection.append(item)
+        self.tree.selection_set(selection)
+        
+        # Replace the estimated geometry once a real row can be measured
+        if self._pool and not self._measured:
+            self.tree.after_idle(self._resize)
+        
+        self._show_position()
+    
+    def _show_position(self):
+        """Update the scrollbar and tell on_change about the visible window"""
+        total = self.total()
+        if total:
+            self.scrollbar.set(self.offset / total, self.last_visible() / total)
+        else:
+            self.scrollbar.set(0, 1)
+        
+        if self.on_change:
+            self.on_change()
+    
+    def _sync_selection(self):
+        """Remember the selection by key so it survives scrolling"""
+        shown = set(self._pool_keys.values())
+        chosen = {self._pool_keys[item] for item in self.tree.selection() if item in self._pool_keys}
+        self.selected = (self.selected - shown) | chosen
+    
+    def first_visible(self):
+        """Return the index of the first visible row"""
+        return self.offset
+    
+    def last_visible(self):
+        """Return the index after the last visible row"""
+        return min(self.total(), self.offset + self.visible)